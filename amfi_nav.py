@@ -0,0 +1,174 @@
+"""
+AMFI NAVAll.txt loader: scheme code / ISIN -> latest NAV.
+
+The file (https://www.amfiindia.com/spages/NAVAll.txt, downloaded to
+AMFI_NAV_FILE) is memory-mapped and walked line by line, so it is never
+read into one string. Data lines look like
+
+    Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date
+    119551;INF209KA12Z1;INF209KA13Z9;Aditya Birla Sun Life Banking & PSU Debt Fund - DIRECT - IDCW;105.8453;17-Oct-2025
+
+and everything else (category / AMC headings, blank lines) is skipped.
+Each NAV is indexed under its scheme code and both ISINs, since HDFC
+reports AMFI codes and Kite reports ISINs as scheme_code.
+
+The index is three sorted fixed-width NumPy arrays (keys, NAVs, dates),
+looked up with searchsorted. It is saved next to the file
+(AMFI_INDEX_PATH) with the source size / mtime, so later runs load it in
+milliseconds and only re-parse after the file changes.
+
+    revaluation.revalue(user_id, kind=MUTUAL_FUND, provider=AmfiNavProvider())
+"""
+import logging
+import mmap
+import os
+import threading
+import time
+
+import numpy as np
+
+from holdings_columns import MUTUAL_FUND
+from revaluation import PriceProvider
+
+logger = logging.getLogger(__name__)
+
+AMFI_NAV_FILE = os.getenv("AMFI_NAV_FILE", "NAVAll.txt")
+AMFI_INDEX_PATH = os.getenv("AMFI_INDEX_PATH", "")
+
+# Scheme codes are ~6 digits, ISINs 12 characters
+KEY_DTYPE = "S12"
+DATE_DTYPE = "S11"
+
+
+class NavIndex:
+    """Sorted keys -> NAV / NAV date, plus the source file signature."""
+
+    def __init__(self, keys, navs, dates, source_size, source_mtime_ns):
+        self.keys = keys
+        self.navs = navs
+        self.dates = dates
+        self.source_size = source_size
+        self.source_mtime_ns = source_mtime_ns
+
+    def __len__(self):
+        return len(self.keys)
+
+    def matches(self, stat):
+        return self.source_size == stat.st_size and self.source_mtime_ns == stat.st_mtime_ns
+
+    def lookup(self, keys):
+        """NAVs for keys as a float64 array, NaN where the key is unknown."""
+        # Keys that can't be a scheme code / ISIN become b"", which never matches
+        encoded = (k.strip().upper().encode("ascii", "replace") for k in keys)
+        wanted = np.array([k if len(k) <= 12 else b"" for k in encoded], dtype=KEY_DTYPE)
+        if not len(self.keys) or not len(wanted):
+            return np.full(len(wanted), np.nan)
+        pos = np.searchsorted(self.keys, wanted)
+        pos = np.minimum(pos, len(self.keys) - 1)
+        found = self.keys[pos] == wanted
+        return np.where(found, self.navs[pos], np.nan)
+
+    def save(self, path):
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, keys=self.keys, navs=self.navs, dates=self.dates,
+                 source=np.array([self.source_size, self.source_mtime_ns], dtype=np.int64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            size, mtime_ns = data["source"].tolist()
+            return cls(data["keys"], data["navs"], data["dates"], size, mtime_ns)
+
+
+def _index_path(nav_path):
+    return AMFI_INDEX_PATH or f"{nav_path}.idx.npz"
+
+
+def parse_nav_file(path):
+    """Stream-parse a NAVAll file into a NavIndex."""
+    stat = os.stat(path)
+    keys, navs, dates = [], [], []
+    with open(path, "rb") as f:
+        if stat.st_size == 0:
+            return NavIndex(np.array([], dtype=KEY_DTYPE), np.array([]),
+                            np.array([], dtype=DATE_DTYPE), stat.st_size, stat.st_mtime_ns)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                fields = line.rstrip(b"\r\n").split(b";")
+                if len(fields) != 6 or not fields[0].strip().isdigit():
+                    continue
+                try:
+                    nav = float(fields[4])
+                except ValueError:
+                    continue  # "N.A." and friends
+                date = fields[5].strip()
+                for key in (fields[0], fields[1], fields[2]):
+                    key = key.strip().upper()
+                    if key and key != b"-":
+                        keys.append(key)
+                        navs.append(nav)
+                        dates.append(date)
+
+    keys = np.array(keys, dtype=KEY_DTYPE)
+    order = np.argsort(keys, kind="stable")
+    return NavIndex(keys[order], np.array(navs, dtype=np.float64)[order],
+                    np.array(dates, dtype=DATE_DTYPE)[order], stat.st_size, stat.st_mtime_ns)
+
+
+def load_index(path=None):
+    """
+    NavIndex for the NAV file at path: the persisted index when it still
+    matches the file, otherwise a fresh parse that is then persisted.
+    """
+    path = path or AMFI_NAV_FILE
+    stat = os.stat(path)
+    index_path = _index_path(path)
+    start = time.perf_counter()
+    try:
+        index = NavIndex.load(index_path)
+        if index.matches(stat):
+            logger.info("📂 AMFI NAV index loaded: %d keys in %.1f ms",
+                        len(index), (time.perf_counter() - start) * 1000)
+            return index
+    except (OSError, KeyError, ValueError):
+        pass
+
+    index = parse_nav_file(path)
+    try:
+        index.save(index_path)
+    except OSError as e:
+        logger.warning("⚠️ Could not persist AMFI NAV index to %s: %s", index_path, e)
+    logger.info("📄 AMFI NAV file parsed: %d keys in %.1f ms",
+                len(index), (time.perf_counter() - start) * 1000)
+    return index
+
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_index(path=None):
+    """Process-wide NavIndex for path, reloaded when the NAV file changes."""
+    path = path or AMFI_NAV_FILE
+    stat = os.stat(path)
+    with _index_lock:
+        index = _indexes.get(path)
+        if index is None or not index.matches(stat):
+            index = _indexes[path] = load_index(path)
+        return index
+
+
+class AmfiNavProvider(PriceProvider):
+    """Mutual fund NAVs from the AMFI file; knows nothing about equity."""
+
+    name = "amfi"
+
+    def __init__(self, path=None):
+        self.path = path or AMFI_NAV_FILE
+
+    def get_prices(self, kind, keys):
+        if kind != MUTUAL_FUND or not keys:
+            return {}
+        navs = get_index(self.path).lookup(keys)
+        return {k: float(nav) for k, nav in zip(keys, navs.tolist()) if nav == nav}
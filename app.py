@@ -4,18 +4,35 @@
 #  - Fixed callback flow (redirects to frontend home on success)
 #  - Robust token handling (request token -> access token -> fallback)
 #  - Keeps Zerodha endpoints intact (assumes your Zerodha integration file handles its own logic)
-#  - Uses session securely via FLASK_SECRET_KEY environment var
+#  - Uses session securely via FLASK_SECRET_KEY environment var; the cookie
+#    only holds an opaque session id, tokens live server-side (token_store)
 #  - Defensive programming & detailed logging for Render logs
 
-from flask import Flask, request, render_template, jsonify, session, redirect, url_for
+from flask import Flask, Response, g, request, render_template, jsonify, session, redirect, url_for, stream_with_context
 from flask_cors import CORS
 import traceback
+import hashlib
 import os
-from datetime import datetime
+import time
+import secrets
+from datetime import datetime, timedelta
 import logging
 
 # Import helper module (corrected version provided separately)
+import circuit_breaker
 import hdfc_investright
+import holdings_cache
+import holdings_export
+import holdings_index
+import import_jobs
+import import_journal
+import metrics
+import networth_series
+import portfolio_returns
+import portfolio_summary
+import revaluation
+import token_store
+import zerodha_integration
 
 # configure logging
 logging.basicConfig(level=logging.INFO)
@@ -32,7 +49,8 @@ CORS(app, resources={
     r"/api/hdfc/*": {
         "origins": ["https://pradeepkumarv.github.io", "http://localhost:5000"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+        "expose_headers": ["ETag", "X-Cache"],
         "supports_credentials": True
     },
     r"/api/callback": {
@@ -41,6 +59,13 @@ CORS(app, resources={
         "allow_headers": ["Content-Type", "Authorization"],
         "supports_credentials": True
     },
+    r"/api/portfolio/*": {
+        "origins": ["https://pradeepkumarv.github.io", "http://localhost:5000"],
+        "methods": ["GET", "POST", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Authorization"],
+        "expose_headers": ["X-Cache", "Content-Disposition"],
+        "supports_credentials": True
+    },
     r"/api/zerodha/*": {
         "origins": ["https://pradeepkumarv.github.io", "http://localhost:5000"],
         "methods": ["GET", "POST", "OPTIONS"],
@@ -55,6 +80,83 @@ FRONTEND_HOME = os.getenv("FRONTEND_URL", "https://pradeepkumarv.github.io/famil
 # Default user id (optional)
 DEFAULT_USER_ID = os.getenv("DEFAULT_USER_ID", "5f2db789-657d-48cf-a84d-8d3395f5b01d")
 
+# -------------------------------------------------------
+# Server-side session state - the cookie only carries an opaque "sid";
+# tokens and login-flow state live in token_store
+# -------------------------------------------------------
+LOGIN_STATE_TTL = int(os.getenv("LOGIN_STATE_TTL", "1800"))
+HDFC_ACCESS_TOKEN_TTL = int(os.getenv("HDFC_ACCESS_TOKEN_TTL", str(8 * 3600)))
+LAST_SYNC_TTL = 30 * 24 * 3600
+
+def _sid():
+    sid = session.get("sid")
+    if not sid:
+        sid = secrets.token_urlsafe(32)
+        session["sid"] = sid
+    return sid
+
+def state_get(name):
+    return token_store.get_store().get(token_store.session_key(_sid(), name))
+
+def state_set(name, value):
+    token_store.get_store().set(token_store.session_key(_sid(), name), value, LOGIN_STATE_TTL)
+
+def current_user_id():
+    return state_get("user_id") or DEFAULT_USER_ID
+
+# Access tokens are keyed on this browser session, never on the shared
+# DEFAULT_USER_ID, so one visitor can't use another's broker login
+def get_access_token():
+    return token_store.get_session_token(_sid(), "hdfc_access_token")
+
+def save_access_token(user_id, access_token):
+    token_store.save_session_token(
+        _sid(), "hdfc_access_token", access_token, user_id, HDFC_ACCESS_TOKEN_TTL)
+
+def delete_access_token():
+    token_store.delete_session_token(_sid(), "hdfc_access_token")
+
+def set_last_sync(user_id, last_sync=None):
+    token_store.get_store().set(
+        token_store.user_key(user_id, "hdfc_last_sync"),
+        last_sync or datetime.utcnow().isoformat(), LAST_SYNC_TTL)
+
+def get_last_sync(user_id):
+    return token_store.get_store().get(token_store.user_key(user_id, "hdfc_last_sync"))
+
+def circuit_open_response(e):
+    """Fast 503 for a call refused by an open HDFC circuit breaker."""
+    logger.warning("HDFC call refused: %s", e)
+    resp = jsonify({"error": "upstream_unavailable", "message": str(e),
+                    "endpoint": e.name, "retry_after": round(e.retry_after, 1)})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(max(1, int(e.retry_after + 0.5)))
+    return resp
+
+# -------------------------------------------------------
+# Route timing -> http_request_seconds (see /api/metrics)
+# -------------------------------------------------------
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _record_timing(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=route, method=request.method, status=str(response.status_code))
+    return response
+
+# -------------------------------------------------------
+# METRICS - Prometheus text format
+# -------------------------------------------------------
+@app.route("/api/metrics", methods=["GET"])
+def metrics_view():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # -------------------------------------------------------
 # Simple health endpoint
 # -------------------------------------------------------
@@ -77,7 +179,7 @@ def get_auth_url():
     try:
         # Get token_id from HDFC
         token_id = hdfc_investright.get_token_id()
-        logger.info(f"✅ Got token_id: {token_id[:20]}...")
+        logger.info("✅ Got token_id")
         
         # ✅ FIX: Include api_key in the authorization URL
         api_key = os.getenv("HDFC_API_KEY")
@@ -87,13 +189,15 @@ def get_auth_url():
         # Build the authorization URL with BOTH api_key and token_id
         auth_url = f"https://developer.hdfcsec.com/oapi/v1/login?api_key={api_key}&token_id={token_id}"
         
-        logger.info(f"🔐 Generated auth URL: {auth_url[:80]}...")
+        logger.info("🔐 Generated auth URL: %s", metrics.redact(auth_url))
         
         return {
             "auth_url": auth_url,
             "token_id": token_id
         }, 200
         
+    except circuit_breaker.CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.error(f"❌ Error in get_auth_url: {e}")
         logger.exception("Full traceback:")
@@ -107,12 +211,10 @@ def get_auth_url():
 # -------------------------------------------------------
 @app.route("/api/hdfc/status", methods=["GET"])
 def status():
-    token = session.get("access_token")
-    last_sync = session.get("last_sync")
+    user_id = current_user_id()
     return jsonify({
-        "connected": token is not None,
-        "accessToken": token,
-        "lastSync": last_sync
+        "connected": get_access_token() is not None,
+        "lastSync": get_last_sync(user_id)
     }), 200
 
 # -------------------------------------------------------
@@ -121,23 +223,80 @@ def status():
 @app.route("/api/hdfc/holdings", methods=["POST"])
 def api_holdings():
     data = request.get_json() or {}
-    access_token = data.get("accesstoken") or session.get("access_token")
+    user_id = current_user_id()
+    stored_access_token = get_access_token()
+    access_token = data.get("accesstoken") or stored_access_token
 
     if not access_token:
         return jsonify({"error": "Missing access token"}), 400
 
     try:
-        raw_holdings = hdfc_investright.get_holdings(access_token)
-        mapped = hdfc_investright.map_holdings_for_frontend(raw_holdings)
-
-        session["last_sync"] = datetime.utcnow().isoformat()
-        session["access_token"] = access_token
-
-        return jsonify({"data": mapped}), 200
+        # Served from the in-process cache when fresh; stale entries are
+        # returned while one background refresh runs.
+        entry, cache_state = holdings_cache.get_cache().get(
+            holdings_cache.token_key(access_token),
+            lambda: hdfc_investright.map_holdings_for_frontend(
+                hdfc_investright.get_holdings(access_token)
+            )
+        )
+
+        if access_token != stored_access_token:
+            save_access_token(user_id, access_token)
+        set_last_sync(user_id, datetime.utcfromtimestamp(entry.fetched_at).isoformat())
+
+        if request.if_none_match.contains(entry.etag):
+            resp = app.response_class(status=304)
+        else:
+            resp = jsonify({"data": entry.value})
+        resp.set_etag(entry.etag)
+        resp.headers["X-Cache"] = cache_state
+        return resp
+    except circuit_breaker.CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.error("Error in /api/hdfc/holdings: %s", traceback.format_exc())
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
+@app.route("/api/hdfc/holdings/cache-stats", methods=["GET"])
+def holdings_cache_stats():
+    return jsonify(holdings_cache.get_cache().stats()), 200
+
+# -------------------------------------------------------
+# IMPORT JOB STATUS - poll a queued HDFC import
+# -------------------------------------------------------
+@app.route("/api/hdfc/import/<job_id>", methods=["GET"])
+def import_status(job_id):
+    if import_journal.IMPORT_JOURNAL_ENABLED:
+        journal = import_journal.get_journal(create=False)
+        job = journal.get(job_id) if journal is not None else None
+        if job is not None:
+            return jsonify(job), 200
+    job = import_jobs.get_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown import job", "job_id": job_id}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route("/api/hdfc/import-journal/stats", methods=["GET"])
+def import_journal_stats():
+    if not import_journal.IMPORT_JOURNAL_ENABLED:
+        return jsonify({"enabled": False}), 200
+    journal = import_journal.get_journal(create=False)
+    return jsonify({"enabled": True, "batches": journal.stats() if journal is not None else {}}), 200
+
+# -------------------------------------------------------
+# STRATEGY STATS - which holdings strategies win the callback race
+# -------------------------------------------------------
+@app.route("/api/hdfc/strategy-stats", methods=["GET"])
+def strategy_stats():
+    return jsonify(hdfc_investright.strategy_stats()), 200
+
+# -------------------------------------------------------
+# CIRCUIT BREAKERS - per-endpoint state and trip counts
+# -------------------------------------------------------
+@app.route("/api/hdfc/breakers", methods=["GET"])
+def breakers():
+    return jsonify(circuit_breaker.breaker_stats()), 200
+
 # -------------------------------------------------------
 # Landing page (used if you host backend UI templates)
 # -------------------------------------------------------
@@ -159,9 +318,10 @@ def request_otp():
 
     try:
         token_id = hdfc_investright.get_token_id()
-        session["token_id"] = token_id
-        session["username"] = username
-        session["password"] = password
+        # Only non-secret login state is kept (server-side); the password
+        # is used for login_validate and never stored.
+        state_set("token_id", token_id)
+        state_set("username", username)
 
         # login_validate returns intermediate payload (twofa question) but not the final request token
         login_payload = hdfc_investright.login_validate(token_id, username, password)
@@ -169,6 +329,8 @@ def request_otp():
         # return minimal response; frontend will display OTP form and include token_id
         return jsonify({"status": "ok", "token_id": token_id, "twofa": login_payload.get("twofa")}), 200
 
+    except circuit_breaker.CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.exception("request_otp failed")
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
@@ -179,7 +341,7 @@ def request_otp():
 @app.route("/validate-otp", methods=["POST"])
 def validate_otp():
     otp = request.form.get("otp") or (request.json or {}).get("otp")
-    token_id = request.form.get("tokenid") or session.get("token_id")
+    token_id = request.form.get("tokenid") or state_get("token_id")
 
     if not token_id:
         return jsonify({"error": "Session expired. Please login again."}), 401
@@ -191,7 +353,7 @@ def validate_otp():
             return jsonify({"error": "OTP validation failed!"}), 400
 
         request_token = otp_result.get("requestToken")
-        session["request_token"] = request_token
+        state_set("request_token", request_token)
 
         # redirect_url that HDFC will redirect to after user authorizes on their side
         # Include token_id as query parameter since session won't persist across HDFC redirect
@@ -205,6 +367,8 @@ def validate_otp():
             "request_token": request_token
         }), 200
 
+    except circuit_breaker.CircuitOpenError as e:
+        return circuit_open_response(e)
     except Exception as e:
         logger.exception("validate_otp failed")
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
@@ -218,87 +382,56 @@ def callback_redirect():
     HDFC redirects to /api/callback, so we forward directly to callback handler
     This preserves session and passes query parameters
     """
-    logger.info("Forwarding /api/callback to callback handler with args: %s", dict(request.args))
+    logger.info("Forwarding /api/callback to callback handler with args: %s", metrics.redact(dict(request.args)))
     return callback()
 
 # -------------------------------------------------------
 # CALLBACK (Final step after HDFC authorization)
 # -------------------------------------------------------
+# Repeats of one callback within a browser session (same request_token, or
+# the same Idempotency-Key header) share a single strategy race and import
+# job: concurrent ones via single-flight, later ones via the redirect
+# remembered in token_store
+CALLBACK_IDEMPOTENCY_TTL = int(os.getenv("CALLBACK_IDEMPOTENCY_TTL", str(LOGIN_STATE_TTL)))
+_callback_flights = hdfc_investright.SingleFlight()
+
 @app.route("/api/hdfc/callback", methods=["GET", "POST"])
 def callback():
     """
     HDFC callback handling:
-      - attempts multiple strategies to obtain holdings:
+      - races multiple strategies concurrently to obtain holdings:
           1) direct request_token -> holdings
           2) exchange request_token for access_token then holdings
-          3) fallback helper (if available)
-      - inserts holdings into Supabase using process_holdings_success
-      - finally redirects to frontend home (option A)
+          3) each fallback auth variant
+        and keeps the first valid payload within HDFC_HOLDINGS_DEADLINE
+      - queues process_holdings_success as a background import job
+      - redirects to frontend home (option A) without waiting for the import
+      - a duplicate of a callback (same Idempotency-Key header, else same
+        request_token) gets the original's redirect and import job
     """
     try:
-        request_token = session.get("request_token") or request.args.get("request_token") or request.args.get("requestToken")
-        token_id = session.get("token_id") or request.args.get("token_id")
-
-        user_id = session.get("user_id") or DEFAULT_USER_ID
-
-        logger.info("HDFC callback invoked: token_id=%s request_token=%s user=%s", token_id, request_token, user_id)
-
-        hdfc_member_ids = {
-            "equity": "bef9db5e-2f21-4038-8f3f-f78ce1bbfb49",
-            "mutualFunds": "d3a4fc84-a94b-494d-915f-60901f16d973"
-        }
-
-        holdings_data = None
-
-        # Step 1: Try direct (some APIs accept request_token as bearer)
-        if request_token:
-            try:
-                holdings_data = hdfc_investright.get_holdings(request_token)
-                logger.info("Fetched holdings using request_token (direct).")
-            except Exception:
-                logger.debug("Direct request_token holdings fetch failed.", exc_info=True)
-
-        # Step 2: Exchange request_token for access token and fetch holdings
-        if not holdings_data and token_id and request_token:
-            try:
-                access_token = hdfc_investright.fetch_access_token(token_id, request_token)
-                if access_token:
-                    session["access_token"] = access_token
-                    session["last_sync"] = datetime.utcnow().isoformat()
-                    holdings_data = hdfc_investright.get_holdings(access_token)
-                    logger.info("Fetched holdings using exchanged access_token.")
-            except Exception:
-                logger.debug("Exchange for access token failed.", exc_info=True)
-
-        # Step 3: Fallback helper inside the module
-        if not holdings_data:
-            try:
-                holdings_data = hdfc_investright.get_holdings_with_fallback(request_token, token_id)
-                if holdings_data:
-                    logger.info("Fetched holdings via fallback helper.")
-            except Exception:
-                logger.debug("Fallback holdings fetch failed.", exc_info=True)
-
-        # Save holdings into DB via helper
-        if holdings_data and isinstance(holdings_data, dict) and "data" in holdings_data:
-            try:
-                # holdings_data["data"] expected to be list
-                hdfc_investright.process_holdings_success(
-                    holdings_data["data"],
-                    user_id,
-                    hdfc_member_ids
-                )
-                logger.info("Holdings processed and inserted into Supabase for user %s", user_id)
-            except Exception:
-                logger.exception("process_holdings_success failed")
-
-            # Option A: redirect to frontend HOME page after successful import
-            # append a query param so frontend can show a toast if desired
-            redirect_url = FRONTEND_HOME.rstrip("/") + "/?hdfc_import=success"
+        request_token = state_get("request_token") or request.args.get("request_token") or request.args.get("requestToken")
+        token_id = state_get("token_id") or request.args.get("token_id")
+
+        user_id = current_user_id()
+
+        idempotency_key = request.headers.get("Idempotency-Key") or request_token
+        if not idempotency_key:
+            return redirect(_hdfc_callback(user_id, request_token, token_id)[0])
+
+        key_hash = hashlib.sha256(idempotency_key.encode()).hexdigest()[:32]
+        done_key = token_store.session_key(_sid(), f"hdfc_callback:{key_hash}")
+        redirect_url = token_store.get_store().get(done_key)
+        if redirect_url:
+            logger.info("Repeated HDFC callback in this session for user %s; reusing its import", user_id)
             return redirect(redirect_url)
 
-        # If no holdings found, redirect with error flag
-        redirect_url = FRONTEND_HOME.rstrip("/") + "/?hdfc_import=error"
+        redirect_url, queued = _callback_flights.do(
+            (_sid(), key_hash),
+            lambda: _hdfc_callback(user_id, request_token, token_id, key_hash),
+        )
+        if queued:
+            token_store.get_store().set(done_key, redirect_url, CALLBACK_IDEMPOTENCY_TTL)
         return redirect(redirect_url)
 
     except Exception as e:
@@ -307,23 +440,270 @@ def callback():
         redirect_url = FRONTEND_HOME.rstrip("/") + "/?hdfc_import=error"
         return redirect(redirect_url)
 
+def _hdfc_callback(user_id, request_token, token_id, idempotency_key=None):
+    """Fetch holdings and queue their import; returns (redirect_url, queued)."""
+    stored_access_token = get_access_token()
+
+    logger.info("HDFC callback invoked: token_id=%s request_token=%s user=%s",
+                bool(token_id), bool(request_token), user_id)
+
+    hdfc_member_ids = {
+        "equity": "bef9db5e-2f21-4038-8f3f-f78ce1bbfb49",
+        "mutualFunds": "d3a4fc84-a94b-494d-915f-60901f16d973"
+    }
+
+    # Race all strategies (a live stored access token, direct
+    # request_token, token exchange, and the fallback auth variants) and
+    # keep the first valid holdings payload.
+    holdings_data, winner, context = hdfc_investright.race_holdings_strategies(
+        request_token, token_id, access_token=stored_access_token
+    )
+    if winner:
+        logger.info("Fetched holdings via strategy %s.", winner)
+
+    if context.get("stored_token_rejected"):
+        delete_access_token()
+    if context.get("access_token"):
+        save_access_token(user_id, context["access_token"])
+    if winner:
+        set_last_sync(user_id)
+
+    # Queue the Supabase import and redirect straight away; the frontend
+    # polls /api/hdfc/import/<job_id> for the outcome.
+    if holdings_data and isinstance(holdings_data, dict) and "data" in holdings_data:
+        if import_journal.IMPORT_JOURNAL_ENABLED:
+            # Durable on local disk before we redirect; the journal flusher
+            # writes it to Supabase, retrying while Supabase is unavailable
+            job, created = hdfc_investright.journal_import(
+                holdings_data["data"], user_id, hdfc_member_ids, idempotency_key=idempotency_key)
+            job_id, status = job["job_id"], job["status"]
+        else:
+            job, created = import_jobs.get_queue().submit(
+                user_id,
+                hdfc_investright.BROKER,
+                hdfc_investright.process_holdings_success,
+                holdings_data["data"],
+                user_id,
+                hdfc_member_ids,
+                idempotency_key=idempotency_key
+            )
+            job_id, status = job.id, job.status
+        if created:
+            logger.info("Queued HDFC import job %s for user %s", job_id, user_id)
+        else:
+            logger.info("HDFC import job %s already %s for user %s; not re-importing", job_id, status, user_id)
+
+        # Option A: redirect to frontend HOME page
+        # append query params so frontend can show a toast / poll the job
+        return FRONTEND_HOME.rstrip("/") + f"/?hdfc_import=queued&import_job={job_id}", True
+
+    # If no holdings found, redirect with error flag; "unavailable"
+    # when HDFC calls were refused by an open circuit breaker
+    flag = "unavailable" if context.get("circuit_open") else "error"
+    return FRONTEND_HOME.rstrip("/") + f"/?hdfc_import={flag}", False
+
 # -------------------------------------------------------
-# ZERODHA endpoints (stub delegations)
+# PORTFOLIO SUMMARY - server-side rollups by member / asset table / broker
 # -------------------------------------------------------
-# If your zerodha integration runs through separate module files (JS or py),
-# keep those routes intact or re-add them here. Below are example placeholders.
-@app.route("/api/zerodha/holdings", methods=["GET"])
-def zerodha_get_holdings():
-    # If you have a zerodha python module (similar pattern), call it
+@app.route("/api/portfolio/summary", methods=["GET"])
+def portfolio_summary_view():
+    user_id = current_user_id()
     try:
-        # Example - your actual code may differ
-        from zerodha_integration import get_holdings as z_get_holdings
-        user_id = session.get("user_id") or DEFAULT_USER_ID
-        holdings = z_get_holdings(user_id)
-        return jsonify({"data": holdings}), 200
+        summary, cached = portfolio_summary.get_summary(user_id)
+        resp = jsonify(summary)
+        resp.headers["X-Cache"] = "hit" if cached else "miss"
+        return resp
     except Exception as e:
-        logger.debug("No zerodha_integration module or error: %s", e)
-        return jsonify({"error": "Zerodha endpoint not implemented on server."}), 501
+        logger.exception("portfolio summary failed")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/portfolio/networth", methods=["GET"])
+def portfolio_networth_view():
+    """
+    Net worth series from daily snapshots.
+    Query: from, to (YYYY-MM-DD; default last 365 days), interval
+    (daily|weekly|monthly, default daily), member_id.
+    """
+    user_id = current_user_id()
+    try:
+        end = request.args.get("to") or datetime.utcnow().date().isoformat()
+        start = request.args.get("from") or (
+            datetime.strptime(end, "%Y-%m-%d") - timedelta(days=365)).date().isoformat()
+        series, cached = networth_series.get_series(
+            user_id, start, end,
+            interval=request.args.get("interval", "daily"),
+            member_id=request.args.get("member_id"),
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("net worth series failed")
+        return jsonify({"error": str(e)}), 500
+    resp = jsonify(series)
+    resp.headers["X-Cache"] = "hit" if cached else "miss"
+    return resp
+
+@app.route("/api/portfolio/exposure", methods=["GET"])
+def portfolio_exposure_view():
+    """
+    Family-wide exposure per security, merged across brokers and members.
+    Query: kind (equity|mutual_fund, default both), member_id (narrows
+    positions, their legs and the totals to one member), limit (default 100).
+    """
+    user_id = current_user_id()
+    kind = request.args.get("kind") or None
+    if kind and kind not in holdings_index.KIND_TABLES:
+        return jsonify({"error": f"Unknown kind: {kind}"}), 400
+    try:
+        limit = int(request.args.get("limit", "100"))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    try:
+        index, cached = holdings_index.get_index(user_id)
+    except Exception as e:
+        logger.exception("exposure index failed")
+        return jsonify({"error": str(e)}), 500
+    # With member_id, positions and totals cover that member's holdings only
+    member_id = request.args.get("member_id")
+    positions = index.positions(kind, member_id=member_id)
+    resp = jsonify({
+        "user_id": user_id,
+        "member_id": member_id,
+        "totals": index.totals(kind, member_id=member_id),
+        "positions": [p.to_dict() for p in positions[:max(0, limit)]],
+    })
+    resp.headers["X-Cache"] = "hit" if cached else "miss"
+    return resp
+
+@app.route("/api/portfolio/returns", methods=["GET"])
+def portfolio_returns_view():
+    """
+    XIRR, CAGR and absolute returns per holding, member and asset class,
+    valued today. Query: member_id, holdings (0 to omit the per-holding
+    list); as_of (YYYY-MM-DD) is accepted only for today, since holdings
+    keep no past values.
+    """
+    user_id = current_user_id()
+    try:
+        as_of = request.args.get("as_of")
+        as_of = datetime.strptime(as_of, "%Y-%m-%d").date() if as_of else None
+    except ValueError:
+        return jsonify({"error": "as_of must be YYYY-MM-DD"}), 400
+    if as_of is not None and as_of != datetime.utcnow().date():
+        return jsonify({"error": "as_of must be today; past returns are not available"}), 400
+    try:
+        report, cached = portfolio_returns.get_returns(
+            user_id, as_of,
+            member_id=request.args.get("member_id"),
+            include_holdings=request.args.get("holdings", "1") not in ("0", "false"),
+        )
+    except Exception as e:
+        logger.exception("portfolio returns failed")
+        return jsonify({"error": str(e)}), 500
+    resp = jsonify(report)
+    resp.headers["X-Cache"] = "hit" if cached else "miss"
+    return resp
+
+@app.route("/api/portfolio/revalue", methods=["POST"])
+def portfolio_revalue_view():
+    """
+    Reprice holdings from the configured price provider without a broker
+    import. Body: {"kind": "equity"|"mutual_fund" (default equity),
+    "provider": name (default REVALUE_PRICE_PROVIDER, or the AMFI NAV
+    file for mutual funds)}.
+    """
+    data = request.get_json(silent=True) or {}
+    user_id = current_user_id()
+    kind = data.get("kind") or revaluation.EQUITY
+    if kind not in revaluation.REVALUE_TABLES:
+        return jsonify({"error": f"Unknown kind: {kind}"}), 400
+    try:
+        provider = revaluation.get_provider(data.get("provider"), kind=kind)
+        return jsonify(revaluation.revalue(user_id, kind=kind, provider=provider)), 200
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("revaluation failed")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/portfolio/export/<table>", methods=["GET"])
+def portfolio_export_view(table):
+    """
+    Stream an asset table as CSV or JSON.
+    Query: format (csv|json, default csv), member_id, broker, from, to
+    (import_date range), gzip=1. <table> is a table name or a
+    reports.js category (equity, mutualFunds, ...).
+    """
+    user_id = current_user_id()
+    fmt = request.args.get("format", "csv")
+    gzip = request.args.get("gzip") in ("1", "true")
+    try:
+        table = holdings_export.resolve_table(table)
+        chunks = holdings_export.export_chunks(
+            table, user_id, fmt,
+            member_id=request.args.get("member_id"),
+            broker=request.args.get("broker"),
+            start=request.args.get("from"),
+            end=request.args.get("to"),
+            gzip=gzip,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("export of %s failed", table)
+        return jsonify({"error": str(e)}), 500
+
+    filename = holdings_export.export_filename(table, fmt, gzip)
+    resp = Response(
+        stream_with_context(chunks),
+        mimetype="application/gzip" if gzip else holdings_export.CONTENT_TYPES[fmt],
+    )
+    resp.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+# -------------------------------------------------------
+# ZERODHA - server-side Kite holdings (zerodha_integration)
+# -------------------------------------------------------
+def _zerodha_error(e, user_id, access_token):
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status in (401, 403):
+        # Kite rejected the token (expired at 6 AM or revoked)
+        if access_token == zerodha_integration.get_access_token(_sid()):
+            zerodha_integration.delete_access_token(_sid())
+        return jsonify({"error": "zerodha_token_invalid", "message": "Reconnect Zerodha"}), 401
+    logger.error("Zerodha request failed: %s", traceback.format_exc())
+    return jsonify({"error": str(e)}), 502 if status else 500
+
+@app.route("/api/zerodha/holdings", methods=["GET", "POST"])
+def zerodha_holdings():
+    """
+    GET:  live Kite equity + MF holdings, normalized, for the stored token.
+    POST: {"access_token", "api_key"?, "mode"?} fetches both lists
+          concurrently and imports them into Supabase; returns counts and
+          fetch / import timings. The token is kept for later syncs.
+    """
+    user_id = current_user_id()
+    data = request.get_json(silent=True) or {}
+    access_token = data.get("access_token") or zerodha_integration.get_access_token(_sid())
+    if not access_token:
+        return jsonify({"error": "Missing Zerodha access token"}), 400
+
+    try:
+        if request.method == "GET":
+            return jsonify({"data": zerodha_integration.get_holdings(user_id, access_token)}), 200
+
+        result = zerodha_integration.import_holdings(
+            user_id, access_token, api_key=data.get("api_key"), mode=data.get("mode"))
+        if data.get("access_token"):
+            zerodha_integration.save_access_token(_sid(), user_id, access_token)
+        token_store.get_store().set(
+            token_store.user_key(user_id, "zerodha_last_sync"), datetime.utcnow().isoformat(), LAST_SYNC_TTL)
+        return jsonify(result), 200
+    except circuit_breaker.CircuitOpenError as e:
+        return circuit_open_response(e)
+    except Exception as e:
+        return _zerodha_error(e, user_id, access_token)
 
 # -------------------------------------------------------
 # Error handlers
@@ -332,6 +712,10 @@ def zerodha_get_holdings():
 def not_found(e):
     return jsonify({"error": "not_found", "msg": str(e)}), 404
 
+@app.errorhandler(circuit_breaker.CircuitOpenError)
+def circuit_open(e):
+    return circuit_open_response(e)
+
 @app.errorhandler(500)
 def server_error(e):
     logger.exception("Internal server error")
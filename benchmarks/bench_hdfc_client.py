@@ -0,0 +1,113 @@
+"""
+Benchmark: per-call requests.get vs the pooled HdfcClient.
+
+Runs a local keep-alive stub of the HDFC API and replays the
+login -> login/validate -> twofa/validate -> access-token -> holdings flow
+both ways. The stub sleeps --handshake-ms on every *new* connection to
+model the TCP+TLS setup cost to developer.hdfcsec.com, so the saving shows
+up in wall time as well as in the connection count.
+
+    python benchmarks/bench_hdfc_client.py --flows 20 --handshake-ms 40
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hdfc_investright  # noqa: E402
+
+RESPONSES = {
+    "/oapi/v1/login": {"tokenId": "tok-123"},
+    "/oapi/v1/login/validate": {"twofa": {"questions": []}},
+    "/oapi/v1/twofa/validate": {"authorised": True, "requestToken": "req-123"},
+    "/oapi/v1/access-token": {"accessToken": "acc-123"},
+    "/oapi/v1/portfolio/holdings": {"data": [{"tradingsymbol": "INFY", "quantity": 1}]},
+}
+FLOW = [
+    ("GET", "login"),
+    ("POST", "login/validate"),
+    ("POST", "twofa/validate"),
+    ("POST", "access-token"),
+    ("GET", "portfolio/holdings"),
+]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    handshake_delay = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+        time.sleep(self.handshake_delay)
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        body = json.dumps(RESPONSES.get(self.path.split("?")[0], {})).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def run_flows(call, flows):
+    start = time.perf_counter()
+    for _ in range(flows):
+        for method, endpoint in FLOW:
+            call(method, endpoint).raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--flows", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=40.0)
+    args = parser.parse_args()
+
+    StubHandler.handshake_delay = args.handshake_ms / 1000.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/oapi/v1"
+
+    def per_call(method, endpoint):
+        return requests.request(method, f"{base}/{endpoint}", timeout=10)
+
+    client = hdfc_investright.HdfcClient(base=base)
+
+    results = []
+    for label, call in (("requests.<verb> per call", per_call), ("HdfcClient (pooled)", client.request)):
+        StubHandler.connections = 0
+        elapsed = run_flows(call, args.flows)
+        results.append((label, elapsed, StubHandler.connections))
+
+    calls = args.flows * len(FLOW)
+    print(f"{calls} calls ({args.flows} flows x {len(FLOW)}), handshake={args.handshake_ms}ms")
+    for label, elapsed, conns in results:
+        print(f"  {label:<26} {elapsed * 1000:9.1f} ms total  {elapsed * 1000 / calls:7.2f} ms/call  {conns:4d} connections")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
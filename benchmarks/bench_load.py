@@ -0,0 +1,236 @@
+"""
+Benchmark: request latency and throughput of the HDFC routes, end to end.
+
+Starts the local HDFC and Supabase stand-ins from benchmarks/fakes.py,
+points the app at them (HDFC_BASE_URL, SUPABASE_URL) and drives the real
+Flask `app` through its test client from N threads:
+
+    auth-url   GET  /api/hdfc/auth-url
+    holdings   POST /api/hdfc/holdings   (a new access token per request,
+                                          i.e. cache misses; --cached reuses one)
+    callback   GET  /api/hdfc/callback   (a new user per request, so every
+                                          call races the strategies and queues
+                                          an import; the run waits for them)
+
+For each scenario and concurrency level it prints p50/p95/p99 latency,
+requests per second and errors; for callback also the import time and the
+Supabase requests / rows written per import. Compare runs before deploying:
+
+    python benchmarks/bench_load.py --concurrency 1 8 32 --requests 200 \\
+        --hdfc-latency-ms 80 --error-rate 0.01 --holdings 300
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fakes import FakeHdfc, FakeSupabase  # noqa: E402
+
+SCENARIOS = ("auth-url", "holdings", "callback")
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def configure_env(hdfc, supabase, args):
+    os.environ.update(
+        HDFC_BASE_URL=hdfc.url,
+        HDFC_API_KEY="bench-api-key",
+        HDFC_API_SECRET="bench-api-secret",
+        HDFC_USERNAME="bench-user",
+        SUPABASE_URL=supabase.url,
+        SUPABASE_KEY="bench-anon-key",
+        TOKEN_STORE="memory",
+        # Callbacks journal their imports; keep the journal out of the repo
+        IMPORT_JOURNAL_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-journal-"),
+                                         "import_journal.sqlite3"),
+        PAYLOAD_LOG_SAMPLE="0",
+        GUNICORN_THREADS=str(max(args.concurrency)),
+    )
+
+
+class Driver:
+    def __init__(self, app_module, token_store, import_jobs, import_journal, cached):
+        self.app = app_module.app
+        self.token_store = token_store
+        self.import_jobs = import_jobs
+        self.import_journal = import_journal
+        self.cached = cached
+        self.job_ids = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client
+
+    def auth_url(self):
+        return self.client().get("/api/hdfc/auth-url").status_code == 200
+
+    def holdings(self):
+        token = "acc-bench" if self.cached else f"acc-{uuid.uuid4().hex[:12]}"
+        resp = self.client().post("/api/hdfc/holdings", json={"accesstoken": token})
+        return resp.status_code == 200
+
+    def callback(self):
+        # A fresh session per call, logged in as a fresh user
+        client = self.app.test_client()
+        sid = uuid.uuid4().hex
+        with client.session_transaction() as sess:
+            sess["sid"] = sid
+        self.token_store.get_store().set(
+            self.token_store.session_key(sid, "user_id"), str(uuid.uuid4()), 600)
+        resp = client.get(f"/api/hdfc/callback?token_id=tok-{sid[:8]}&request_token=req-{sid[:8]}")
+        job_id = parse_qs(urlsplit(resp.headers.get("Location", "")).query).get("import_job")
+        if not job_id:
+            return False
+        with self._lock:
+            self.job_ids.append(job_id[0])
+        return True
+
+    def job_status(self, job_id):
+        """An import's status dict, from the journal or else the in-memory queue."""
+        if self.import_journal.IMPORT_JOURNAL_ENABLED:
+            journal = self.import_journal.get_journal(create=False)
+            job = journal.get(job_id) if journal is not None else None
+            if job is not None:
+                return job
+        job = self.import_jobs.get_queue().get(job_id)
+        return job.to_dict() if job is not None else None
+
+    def wait_for_jobs(self, timeout=300):
+        """Block until every queued import finished; return (done, failed, run_ms list)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            jobs = [j for j in map(self.job_status, self.job_ids) if j is not None]
+            pending = [j for j in jobs if j["status"] in ("queued", "running")]
+            if not pending or time.monotonic() > deadline:
+                break
+            time.sleep(0.02)
+        done = [j for j in jobs if j["status"] == "done"]
+        failed = [j for j in jobs if j["status"] == "failed"]
+        run_ms = [j["timings"]["run_ms"] for j in done]
+        return done, failed, run_ms
+
+
+def run_scenario(driver, name, concurrency, requests):
+    call = {"auth-url": driver.auth_url, "holdings": driver.holdings, "callback": driver.callback}[name]
+    latencies = []
+    errors = Counter()
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            ok = call()
+            error = None if ok else "bad status"
+        except Exception as e:
+            ok, error = False, type(e).__name__
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors[error] += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "rps": requests / wall if wall else float("nan"),
+        "errors": sum(errors.values()),
+        "error_kinds": dict(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario and level")
+    parser.add_argument("--hdfc-latency-ms", type=float, default=50.0)
+    parser.add_argument("--hdfc-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of HDFC calls answered 503")
+    parser.add_argument("--holdings", type=int, default=100, help="holdings in the HDFC payload")
+    parser.add_argument("--supabase-latency-ms", type=float, default=5.0)
+    parser.add_argument("--cached", action="store_true", help="reuse one access token for holdings")
+    args = parser.parse_args()
+
+    hdfc = FakeHdfc(args.hdfc_latency_ms, args.hdfc_jitter_ms, args.error_rate, args.holdings).start()
+    supabase = FakeSupabase(args.supabase_latency_ms).start()
+    configure_env(hdfc, supabase, args)
+
+    # Imported after the env points at the fakes
+    import app as app_module  # noqa: E402
+    import import_jobs  # noqa: E402
+    import import_journal  # noqa: E402
+    import token_store  # noqa: E402
+
+    driver = Driver(app_module, token_store, import_jobs, import_journal, args.cached)
+    print(f"HDFC stub {args.hdfc_latency_ms:.0f}±{args.hdfc_jitter_ms:.0f} ms, "
+          f"error rate {args.error_rate:.1%}, {args.holdings} holdings; "
+          f"Supabase stub {args.supabase_latency_ms:.0f} ms; {args.requests} requests per row")
+    print(f"{'scenario':<10} {'conc':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'errors':>7}")
+
+    import_reports = []
+    for name in args.scenarios:
+        for concurrency in args.concurrency:
+            # Silence the app's per-call progress logs and prints while timing
+            with open(os.devnull, "w") as devnull:
+                stdout, sys.stdout = sys.stdout, devnull
+                logging.disable(logging.WARNING)
+                try:
+                    supabase.reset_counts()
+                    driver.job_ids = []
+                    result = run_scenario(driver, name, concurrency, args.requests)
+                    imports = driver.wait_for_jobs() if name == "callback" else None
+                finally:
+                    logging.disable(logging.NOTSET)
+                    sys.stdout = stdout
+            print(f"{name:<10} {concurrency:>5} {result['p50']:>9.1f} {result['p95']:>9.1f} "
+                  f"{result['p99']:>9.1f} {result['rps']:>8.1f} {result['errors']:>7}"
+                  + (f"  {result['error_kinds']}" if result["errors"] else ""))
+            if imports is not None:
+                import_reports.append((concurrency, imports, Counter(supabase.requests),
+                                       Counter(supabase.rows_written)))
+
+    for concurrency, (done, failed, run_ms), requests, rows in import_reports:
+        n = len(done) or 1
+        writes = {k: v for k, v in requests.items() if k[1] != "GET"}
+        run_ms = sorted(run_ms)
+        print(f"\nimports at concurrency {concurrency}: {len(done)} done, {len(failed)} failed, "
+              f"import p50 {percentile(run_ms, 50):.1f} ms, p95 {percentile(run_ms, 95):.1f} ms")
+        print(f"  per import: {sum(requests.values()) / n:.1f} Supabase requests "
+              f"({sum(writes.values()) / n:.1f} writes), {sum(rows.values()) / n:.1f} rows written")
+        for (table, method), count in sorted(writes.items()):
+            print(f"    {method:<6} {table:<24} {count / n:6.1f} requests  "
+                  f"{rows[(table, method)] / n:8.1f} rows")
+
+    print("\nHDFC calls:", dict(hdfc.calls))
+    hdfc.stop()
+    supabase.stop()
+
+
+if __name__ == "__main__":
+    main()
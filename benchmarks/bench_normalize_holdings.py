@@ -0,0 +1,140 @@
+"""
+Benchmark: per-row dict loop vs columnar normalization of HDFC holdings.
+
+The "loop" variant is the body process_holdings_success used before
+holdings_columns existed; "columnar" is holdings_columns.hdfc_records, and
+"columns" stops after normalize_hdfc_holdings (parse + vector math, no
+per-row dicts) to show how much of the cost is record materialization.
+Time and peak traced memory are measured in separate runs, since
+tracemalloc itself slows allocation-heavy code down.
+
+    python benchmarks/bench_normalize_holdings.py --sizes 1000 100000 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from holdings_columns import hdfc_records, normalize_hdfc_holdings  # noqa: E402
+
+MEMBER_IDS = {"equity": "member-equity", "mutualFunds": "member-mf"}
+IMPORT_DATE = "2025-01-01"
+
+
+def synthetic_holdings(n, seed=42):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        if i % 3:
+            rows.append({
+                "investment_type": "equity",
+                "tradingsymbol": f"SYM{i}",
+                "quantity": str(rng.randint(1, 500)),
+                "averageprice": f"{rng.uniform(10, 5000):.2f}",
+                "lastprice": f"{rng.uniform(10, 5000):.2f}",
+            })
+        else:
+            rows.append({
+                "investment_type": "mutualfunds",
+                "schemename": f"Scheme {i}",
+                "schemecode": f"SC{i}",
+                "folionumber": f"F{i}",
+                "fundhouse": "AMC",
+                "units": f"{rng.uniform(1, 1000):.3f}",
+                "averagenav": f"{rng.uniform(10, 500):.4f}",
+                "nav": f"{rng.uniform(10, 500):.4f}",
+            })
+    return rows
+
+
+def loop_records(holdings, user_id, hdfc_member_ids, import_date):
+    equity_records = []
+    mf_records = []
+    for h in holdings:
+        try:
+            investment_type = h.get("investment_type", "").lower()
+            if investment_type == "equity":
+                equity_records.append({
+                    "user_id": user_id,
+                    "member_id": hdfc_member_ids["equity"],
+                    "broker_platform": "HDFC Securities",
+                    "symbol": h.get("tradingsymbol") or h.get("symbol") or "UNKNOWN",
+                    "company_name": h.get("tradingsymbol") or h.get("symbol") or "UNKNOWN",
+                    "quantity": float(h.get("quantity") or 0),
+                    "average_price": float(h.get("averageprice") or 0),
+                    "current_price": float(h.get("lastprice") or 0),
+                    "invested_amount": (float(h.get("quantity") or 0) *
+                                        float(h.get("averageprice") or 0)),
+                    "current_value": (float(h.get("quantity") or 0) *
+                                      float(h.get("lastprice") or 0)),
+                    "import_date": import_date,
+                })
+            elif investment_type == "mutualfunds":
+                mf_records.append({
+                    "user_id": user_id,
+                    "member_id": hdfc_member_ids["mutualFunds"],
+                    "broker_platform": "HDFC Securities",
+                    "scheme_name": h.get("schemename") or "Unknown",
+                    "scheme_code": h.get("schemecode") or "",
+                    "folio_number": h.get("folionumber") or "",
+                    "fund_house": h.get("fundhouse") or "Unknown",
+                    "units": float(h.get("units") or 0),
+                    "average_nav": float(h.get("averagenav") or 0),
+                    "current_nav": float(h.get("nav") or 0),
+                    "invested_amount": (float(h.get("units") or 0) *
+                                        float(h.get("averagenav") or 0)),
+                    "current_value": (float(h.get("units") or 0) *
+                                      float(h.get("nav") or 0)),
+                    "import_date": import_date,
+                })
+        except Exception:
+            continue
+    return equity_records, mf_records
+
+
+def columns_only(holdings, user_id, hdfc_member_ids, import_date):
+    return normalize_hdfc_holdings(holdings)
+
+
+VARIANTS = (("loop", loop_records), ("columnar", hdfc_records), ("columns", columns_only))
+
+
+def measure(fn, holdings):
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(holdings, "user", MEMBER_IDS, IMPORT_DATE)
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = fn(holdings, "user", MEMBER_IDS, IMPORT_DATE)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'variant':>9} {'time ms':>10} {'peak MiB':>9}")
+    for n in args.sizes:
+        holdings = synthetic_holdings(n)
+        baseline = loop_records(holdings, "user", MEMBER_IDS, IMPORT_DATE)
+        assert hdfc_records(holdings, "user", MEMBER_IDS, IMPORT_DATE) == baseline
+        del baseline
+        for label, fn in VARIANTS:
+            elapsed, peak = measure(fn, holdings)
+            print(f"{n:>10} {label:>9} {elapsed * 1000:>10.1f} {peak / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: cold import cost of the Flask app (what a gunicorn worker pays
+on boot, e.g. on a Render free-tier spin-up).
+
+Each run starts a fresh interpreter with `python -X importtime -c "import
+app"` and no SUPABASE_* / HDFC_* env vars, so it also checks that the app
+imports without them. Reports the median cumulative import time of `app`
+and the slowest modules by self time; --deferred additionally times the
+imports that are now postponed until first use (supabase, numpy, requests).
+
+    python benchmarks/bench_startup.py --runs 5 --deferred
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+DEFERRED = ("supabase", "numpy", "requests")
+
+
+def clean_env():
+    env = {k: v for k, v in os.environ.items()
+           if not k.startswith(("SUPABASE_", "HDFC_", "PYTHON"))}
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def importtime(statement):
+    """Return {module: (self_us, cumulative_us)} for one fresh interpreter."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, env=clean_env(), capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"`{statement}` failed:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            modules[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--deferred", action="store_true",
+                        help="also time the imports deferred to first use")
+    args = parser.parse_args()
+
+    runs = [importtime("import app") for _ in range(args.runs)]
+    totals = [r["app"][1] / 1000 for r in runs]
+    print(f"import app: median {statistics.median(totals):.1f} ms "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}, {args.runs} runs)")
+
+    loaded = [name for name in DEFERRED if name in runs[-1]]
+    if loaded:
+        print(f"  WARNING: eagerly imported: {', '.join(loaded)}")
+
+    print(f"  slowest {args.top} modules by self time (last run):")
+    slowest = sorted(runs[-1].items(), key=lambda kv: kv[1][0], reverse=True)[:args.top]
+    for name, (self_us, cum_us) in slowest:
+        print(f"    {self_us / 1000:8.1f} ms self {cum_us / 1000:8.1f} ms cumulative  {name}")
+
+    if args.deferred:
+        print("  deferred until first use:")
+        for name in DEFERRED:
+            cum = statistics.median(importtime(f"import {name}")[name][1] / 1000 for _ in range(args.runs))
+            print(f"    {cum:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Benchmark: concurrent HDFC callbacks / imports one instance absorbs per
+gunicorn worker mode.
+
+For each mode (sync, gthread, and gevent when installed) a real gunicorn
+is started with gunicorn.conf.py, pointed at the local HDFC and Supabase
+fakes from benchmarks/fakes.py. Then C callbacks are fired at once, each
+as a different logged-in user, for every level C. Reported per mode and
+level: callback p50 / p95 / max latency, errors (incl. client timeouts),
+callbacks per second, and how long until all C imports had written their
+holdings to the Supabase fake.
+
+    python benchmarks/bench_workers.py --modes sync gthread --levels 4 16 64 \\
+        --workers 2 --threads 16 --hdfc-latency-ms 150
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from flask import Flask
+from flask.sessions import SecureCookieSessionInterface
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import token_store  # noqa: E402
+from fakes import FakeHdfc, FakeSupabase  # noqa: E402
+
+SECRET = "bench-secret"
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def session_cookie(sid):
+    """A Flask session cookie carrying sid, signed like the app's own."""
+    signer = Flask("bench")
+    signer.secret_key = SECRET
+    return SecureCookieSessionInterface().get_signing_serializer(signer).dumps({"sid": sid})
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))]
+
+
+def start_gunicorn(mode, args, hdfc, supabase, store_path):
+    port = free_port()
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=mode,
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_WORKER_CONNECTIONS=str(args.connections),
+        HDFC_BASE_URL=hdfc.url,
+        HDFC_API_KEY="bench-api-key",
+        HDFC_API_SECRET="bench-api-secret",
+        HDFC_USERNAME="bench-user",
+        SUPABASE_URL=supabase.url,
+        SUPABASE_KEY="bench-anon-key",
+        TOKEN_STORE="sqlite",
+        TOKEN_STORE_PATH=store_path,
+        FLASK_SECRET_KEY=SECRET,
+        PAYLOAD_LOG_SAMPLE="0",
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+         "--bind", f"127.0.0.1:{port}", "app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base}/api/health", timeout=1).ok:
+                return proc, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise SystemExit(f"gunicorn ({mode}) did not come up")
+
+
+def fire_callbacks(base, store, level, timeout):
+    sessions = []
+    for _ in range(level):
+        sid = uuid.uuid4().hex
+        store.set(token_store.session_key(sid, "user_id"), str(uuid.uuid4()), 600)
+        sessions.append(sid)
+
+    def one(sid):
+        start = time.perf_counter()
+        try:
+            resp = requests.get(
+                f"{base}/api/hdfc/callback",
+                params={"token_id": f"tok-{sid[:8]}", "request_token": f"req-{sid[:8]}"},
+                cookies={"session": session_cookie(sid)},
+                allow_redirects=False, timeout=timeout,
+            )
+            ok = resp.status_code == 302 and "hdfc_import=queued" in resp.headers.get("Location", "")
+        except requests.RequestException:
+            ok = False
+        return ok, (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=level) as pool:
+        results = list(pool.map(one, sessions))
+    return results, time.perf_counter() - start
+
+
+def wait_for_imports(supabase, before, expected, timeout):
+    """Seconds until `expected` new equity inserts landed, or None on timeout."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if supabase.requests[("equity_holdings", "POST")] - before >= expected:
+            return time.perf_counter() - start
+        time.sleep(0.02)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["sync", "gthread", "gevent"])
+    parser.add_argument("--levels", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--hdfc-latency-ms", type=float, default=150.0)
+    parser.add_argument("--holdings", type=int, default=100)
+    parser.add_argument("--supabase-latency-ms", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=30.0, help="client timeout per callback")
+    args = parser.parse_args()
+
+    modes = []
+    for mode in args.modes:
+        if mode == "gevent":
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                print("gevent not installed; skipping gevent mode")
+                continue
+        modes.append(mode)
+
+    hdfc = FakeHdfc(args.hdfc_latency_ms, args.hdfc_latency_ms / 10, 0.0, args.holdings).start()
+    supabase = FakeSupabase(args.supabase_latency_ms).start()
+
+    print(f"{args.workers} workers, {args.threads} threads (gthread), {args.connections} connections "
+          f"(gevent); HDFC stub {args.hdfc_latency_ms:.0f} ms, {args.holdings} holdings")
+    print(f"{'mode':<8} {'level':>5} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>7} "
+          f"{'cb/s':>7} {'imports':>8} {'all imported':>13}")
+
+    for mode in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store_path = os.path.join(tmp, "tokens.sqlite3")
+            store = token_store.SqliteTokenStore(store_path)
+            proc, base = start_gunicorn(mode, args, hdfc, supabase, store_path)
+            try:
+                # Warm-up: first request pays for lazy imports / clients
+                before = supabase.requests[("equity_holdings", "POST")]
+                fire_callbacks(base, store, args.workers, args.timeout)
+                wait_for_imports(supabase, before, args.workers, timeout=args.timeout)
+                for level in args.levels:
+                    before = supabase.requests[("equity_holdings", "POST")]
+                    results, wall = fire_callbacks(base, store, level, args.timeout)
+                    ok = sum(1 for good, _ in results if good)
+                    imported_in = wait_for_imports(supabase, before, ok, timeout=args.timeout * 2)
+                    imported = supabase.requests[("equity_holdings", "POST")] - before
+                    latencies = sorted(ms for _, ms in results)
+                    print(f"{mode:<8} {level:>5} {percentile(latencies, 50):>9.0f} "
+                          f"{percentile(latencies, 95):>9.0f} {latencies[-1]:>9.0f} "
+                          f"{level - ok:>7} {level / wall:>7.1f} {imported:>8} "
+                          + (f"{wall + imported_in:>11.2f} s" if imported_in is not None else f"{'timeout':>13}"))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+    hdfc.stop()
+    supabase.stop()
+
+
+if __name__ == "__main__":
+    main()
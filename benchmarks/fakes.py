@@ -0,0 +1,239 @@
+"""
+Local stand-ins for the HDFC InvestRight API and Supabase's REST API,
+for benchmarks that drive the real Flask app without leaving the machine.
+
+FakeHdfc serves the login -> access-token -> holdings endpoints with a
+configurable latency (plus jitter), error rate and holdings payload size.
+
+FakeSupabase is a small in-memory PostgREST: enough of /rest/v1/<table>
+(select with eq/neq/gt/gte/lt/lte/in filters, order, offset/limit; insert;
+upsert with on_conflict; update; delete) for the supabase-py client to run
+against it unchanged. Every request is counted per (table, method), with
+the number of rows written.
+
+    hdfc = FakeHdfc(latency_ms=80, error_rate=0.01, holdings=300).start()
+    supabase = FakeSupabase().start()
+    os.environ.update(HDFC_BASE_URL=hdfc.url, SUPABASE_URL=supabase.url,
+                      SUPABASE_KEY="bench")
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+class _Server:
+    def __init__(self):
+        self.server = None
+        self.url = None
+
+    def start(self):
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, payload = owner.handle(self.command, self.path, self.headers, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}" + self.base_path
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    base_path = ""
+
+    def handle(self, method, path, headers, body):
+        raise NotImplementedError
+
+
+# -----------------------------
+# HDFC InvestRight
+# -----------------------------
+
+def synthetic_holdings(n, seed=7):
+    """n raw HDFC holdings, two equity rows for every mutual fund row."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        if i % 3:
+            rows.append({
+                "investment_type": "equity",
+                "tradingsymbol": f"SYM{i}",
+                "quantity": str(rng.randint(1, 500)),
+                "averageprice": f"{rng.uniform(10, 5000):.2f}",
+                "lastprice": f"{rng.uniform(10, 5000):.2f}",
+            })
+        else:
+            rows.append({
+                "investment_type": "mutualfunds",
+                "schemename": f"Scheme {i}",
+                "schemecode": f"SC{i}",
+                "folionumber": f"F{i}",
+                "fundhouse": "AMC",
+                "units": f"{rng.uniform(1, 1000):.3f}",
+                "averagenav": f"{rng.uniform(10, 500):.4f}",
+                "nav": f"{rng.uniform(10, 500):.4f}",
+            })
+    return rows
+
+
+class FakeHdfc(_Server):
+    base_path = "/oapi/v1"
+
+    def __init__(self, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0, holdings=100):
+        super().__init__()
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.error_rate = error_rate
+        self.holdings = {"data": synthetic_holdings(holdings)}
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def handle(self, method, path, headers, body):
+        endpoint = urlsplit(path).path[len(self.base_path) + 1:]
+        with self._lock:
+            self.calls[endpoint] += 1
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            return 503, {"error": "injected failure"}
+
+        if endpoint == "login":
+            return 200, {"tokenId": f"tok-{uuid.uuid4().hex[:12]}"}
+        if endpoint == "login/validate":
+            return 200, {"twofa": {"questions": [{"question": "OTP"}]}}
+        if endpoint == "twofa/validate":
+            return 200, {"authorised": True, "requestToken": f"req-{uuid.uuid4().hex[:12]}"}
+        if endpoint == "access-token":
+            return 200, {"accessToken": f"acc-{uuid.uuid4().hex[:12]}"}
+        if endpoint == "portfolio/holdings":
+            auth = headers.get("Authorization", "")
+            if not auth.startswith("Bearer acc-"):
+                return 401, {"error": "invalid token"}
+            return 200, self.holdings
+        return 404, {"error": f"unknown endpoint {endpoint}"}
+
+
+# -----------------------------
+# Supabase (PostgREST subset)
+# -----------------------------
+
+_RESERVED = {"select", "order", "offset", "limit", "on_conflict", "columns"}
+
+
+def _matches(row, column, expr):
+    op, _, value = expr.partition(".")
+    current = row.get(column)
+    if op == "in":
+        return str(current) in value.strip("()").split(",")
+    if current is None:
+        return False
+    current = str(current)
+    return {
+        "eq": current == value,
+        "neq": current != value,
+        "gt": current > value,
+        "gte": current >= value,
+        "lt": current < value,
+        "lte": current <= value,
+    }.get(op, False)
+
+
+class FakeSupabase(_Server):
+    def __init__(self, latency_ms=0.0):
+        super().__init__()
+        self.latency = latency_ms / 1000.0
+        self.tables = {}
+        self.requests = Counter()      # (table, method) -> requests
+        self.rows_written = Counter()  # (table, method) -> rows
+        self._lock = threading.Lock()
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+            self.rows_written.clear()
+
+    def handle(self, method, path, headers, body):
+        parts = urlsplit(path)
+        table = parts.path.rsplit("/", 1)[-1]
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        params = {k: v for k, v in query if k in _RESERVED}
+        filters = [(k, v) for k, v in query if k not in _RESERVED]
+        payload = json.loads(body) if body else None
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            rows = self.tables.setdefault(table, [])
+            selected = [r for r in rows if all(_matches(r, c, e) for c, e in filters)]
+            self.requests[(table, method)] += 1
+
+            if method == "GET":
+                for spec in reversed([s for s in params.get("order", "").split(",") if s]):
+                    column, _, direction = spec.partition(".")
+                    selected.sort(key=lambda r: str(r.get(column)), reverse=direction.startswith("desc"))
+                offset = int(params.get("offset", 0))
+                limit = int(params["limit"]) if "limit" in params else None
+                selected = selected[offset:offset + limit if limit is not None else None]
+                columns = params.get("select", "*")
+                if columns != "*":
+                    names = columns.split(",")
+                    selected = [{n: r.get(n) for n in names} for r in selected]
+                return 200, selected
+
+            if method == "POST":
+                records = payload if isinstance(payload, list) else [payload]
+                self.rows_written[(table, method)] += len(records)
+                upsert = "merge-duplicates" in (headers.get("Prefer") or "")
+                keys = params.get("on_conflict", "id").split(",")
+                out = []
+                for record in records:
+                    existing = None
+                    if upsert and all(record.get(k) is not None for k in keys):
+                        existing = next((r for r in rows if all(r.get(k) == record.get(k) for k in keys)), None)
+                    if existing is not None:
+                        existing.update(record)
+                        out.append(existing)
+                    else:
+                        row = dict(record)
+                        row.setdefault("id", str(uuid.uuid4()))
+                        rows.append(row)
+                        out.append(row)
+                return 201, out
+
+            if method == "PATCH":
+                for row in selected:
+                    row.update(payload or {})
+                self.rows_written[(table, method)] += len(selected)
+                return 200, selected
+
+            if method == "DELETE":
+                doomed = {id(r) for r in selected}
+                self.tables[table] = [r for r in rows if id(r) not in doomed]
+                self.rows_written[(table, method)] += len(selected)
+                return 200, selected
+
+        return 405, {"error": f"unsupported method {method}"}
@@ -0,0 +1,121 @@
+"""
+Pooled keep-alive HTTP client shared by the broker integrations.
+
+HdfcClient (hdfc_investright) and KiteClient (zerodha_integration) both
+subclass PooledClient, which owns the parts that don't depend on the
+broker:
+
+- one requests.Session per process, so the TCP+TLS handshake is paid once
+  per pooled connection instead of once per call; cookies are disabled
+  because the session is shared across users
+- a circuit breaker per endpoint ("<name>:<endpoint>"): while it is open,
+  calls raise CircuitOpenError without touching the network
+- retries of connection errors and RETRYABLE_STATUS with exponential
+  backoff plus jitter, capped at max_delay and stretched to a Retry-After.
+  Only GETs are retried once a request was sent; other methods only when
+  the connection was never established, so a login / OTP is never sent
+  twice. Read timeouts are never retried: each already used the full read
+  timeout.
+
+    client = PooledClient("https://api.example.com", name="example",
+                          request_metric=metrics.HDFC_REQUEST_SECONDS)
+    resp = client.get("portfolio/holdings", headers=...)
+"""
+import logging
+import random
+import time
+
+import metrics
+from circuit_breaker import CircuitOpenError, get_breaker
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class PooledClient:
+    def __init__(self, base, name, request_metric, pool_size=4, timeouts=None,
+                 default_timeout=(5, 30), retries=2, backoff=0.3, max_delay=5.0,
+                 rejected_metric=None):
+        # requests is imported on first client construction, not at boot
+        import requests
+        from http.cookiejar import DefaultCookiePolicy
+        from requests.adapters import HTTPAdapter
+
+        self.base = base.rstrip("/")
+        self.name = name
+        self.request_metric = request_metric
+        self.rejected_metric = rejected_metric
+        self.pool_size = pool_size
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+        self.session = requests.Session()
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url(self, endpoint):
+        return f"{self.base}/{endpoint}"
+
+    def request(self, method, endpoint, **kwargs):
+        import requests
+
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, self.default_timeout))
+        breaker = get_breaker(f"{self.name}:{endpoint}")
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                if self.rejected_metric is not None:
+                    self.rejected_metric.inc(endpoint=endpoint)
+                raise
+            try:
+                with metrics.span(self.request_metric, endpoint=endpoint, method=method) as sp:
+                    resp = self.session.request(method, self.url(endpoint), **kwargs)
+                    sp["outcome"] = str(resp.status_code)
+            except requests.RequestException as e:
+                breaker.record_failure(type(e).__name__)
+                # A read timeout already waited out the whole read budget;
+                # retrying it would hold the caller for retries x that again
+                retryable = isinstance(e, requests.ConnectTimeout) or (
+                    method == "GET" and not isinstance(e, requests.ReadTimeout))
+                if not retryable or attempt > self.retries:
+                    raise
+                logger.warning("🔁 %s %s %s failed (%s), retry %d/%d",
+                               self.name, method, endpoint, type(e).__name__, attempt, self.retries)
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if resp.status_code not in RETRYABLE_STATUS:
+                # Any other answer, 4xx included, means the upstream is up
+                breaker.record_success()
+                return resp
+            breaker.record_failure(f"HTTP {resp.status_code}")
+            if method != "GET" or attempt > self.retries:
+                return resp
+            logger.warning("🔁 %s %s %s returned %d, retry %d/%d",
+                           self.name, method, endpoint, resp.status_code, attempt, self.retries)
+            time.sleep(self._retry_delay(attempt, resp.headers.get("Retry-After")))
+
+    def _retry_delay(self, attempt, retry_after=None):
+        delay = self.backoff * (2 ** (attempt - 1))
+        delay += random.uniform(0, delay)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return min(delay, self.max_delay)
+
+    def get(self, endpoint, **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint, **kwargs):
+        return self.request("POST", endpoint, **kwargs)
+
+    def close(self):
+        self.session.close()
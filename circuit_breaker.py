@@ -0,0 +1,126 @@
+"""
+Per-endpoint circuit breakers for upstream broker APIs.
+
+A breaker starts closed. After CIRCUIT_FAILURE_THRESHOLD consecutive
+failures (connection errors, timeouts, 429/5xx) it opens, and every call
+fails at once with CircuitOpenError for CIRCUIT_RESET_TIMEOUT seconds. It
+then goes half-open and lets one probe call through: success closes it,
+failure opens it again. State and trip counts are reported by
+breaker_stats() for /api/hdfc/breakers.
+
+    breaker = get_breaker("hdfc:portfolio/holdings")
+    breaker.before_call()          # raises CircuitOpenError when open
+    ... make the call ...
+    breaker.record_success() / breaker.record_failure(reason)
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream endpoint whose breaker is open."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(
+            f"{name} is unavailable (circuit open after repeated failures); "
+            f"retry in {retry_after:.0f}s"
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or CIRCUIT_FAILURE_THRESHOLD
+        self.reset_timeout = CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "trips": 0}
+        self._last_failure = None
+
+    def before_call(self):
+        """Admit a call, or raise CircuitOpenError."""
+        with self._lock:
+            if self._state == OPEN:
+                waited = time.monotonic() - self._opened_at
+                if waited < self.reset_timeout:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, self.reset_timeout - waited)
+                self._state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(self.name, self.reset_timeout)
+                self._probe_in_flight = True
+            self._stats["calls"] += 1
+
+    def record_success(self):
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("🟢 Circuit %s closed", self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, reason=None):
+        with self._lock:
+            self._failures += 1
+            self._stats["failures"] += 1
+            self._last_failure = reason
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats["trips"] += 1
+                    logger.warning("🔴 Circuit %s opened after %d failures: %s", self.name, self._failures, reason)
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self):
+        with self._lock:
+            out = dict(self._stats)
+            out.update(
+                state=self._state,
+                consecutive_failures=self._failures,
+                last_failure=self._last_failure,
+            )
+            if self._state == OPEN:
+                out["retry_after"] = round(
+                    max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            return out
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Return the process-wide breaker for name, creating it on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(name)
+    return breaker
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
@@ -0,0 +1,59 @@
+"""
+Gunicorn settings for the web process (Procfile: gunicorn -c gunicorn.conf.py app:app).
+
+Every HDFC / Supabase route spends nearly all its time waiting on the
+network, so a sync worker (one request at a time) is pinned by a single
+slow callback. Two concurrent modes are supported, picked with
+GUNICORN_WORKER_CLASS:
+
+    gthread  (default) WEB_CONCURRENCY workers x GUNICORN_THREADS threads.
+             No extra dependency; the HDFC client, single-flight layer,
+             caches and token store are all thread-safe.
+    gevent   cooperative greenlets, up to GUNICORN_WORKER_CONNECTIONS open
+             requests per worker. Needs `pip install gevent`. Gunicorn
+             monkey-patches the worker before the app is imported, so
+             requests / threading / sqlite3 calls yield instead of block.
+    sync     the old behaviour, one request per worker.
+
+hdfc_investright sizes its connection pool and strategy executor from
+GUNICORN_THREADS, so it is exported here as the per-worker concurrency;
+the background import pool (IMPORT_WORKERS) and the Supabase chunk writer
+(SUPABASE_WRITE_CONCURRENCY) scale with it unless set.
+"""
+import os
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+# The callback races HDFC strategies for up to HDFC_HOLDINGS_DEADLINE (20s)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+# Must stay off for gevent: the app would be imported (and threading / ssl
+# bound) in the master before the worker gets patched.
+preload_app = False
+
+if worker_class == "gevent":
+    # Upstream calls per worker are bounded by the HDFC pool, not by greenlets
+    per_worker = min(worker_connections, int(os.getenv("HDFC_POOL_SIZE") or 32))
+elif worker_class == "gthread":
+    per_worker = threads
+else:
+    per_worker = 1
+os.environ["GUNICORN_THREADS"] = str(per_worker)
+# Imports are Supabase-bound too; two per worker can't keep up with a
+# burst of callbacks served concurrently
+os.environ.setdefault("IMPORT_WORKERS", str(max(2, per_worker // 2)))
+# ...and every import shares one chunk-writer pool per worker
+os.environ.setdefault("SUPABASE_WRITE_CONCURRENCY", str(max(4, per_worker)))
+
+
+def post_worker_init(worker):
+    # Replay import batches journaled before a restart without waiting for
+    # the next callback. Runs after the app is loaded (and gevent patching),
+    # and never creates the journal file.
+    import import_journal
+    import_journal.resume()
@@ -1,12 +1,25 @@
-from supabase import create_client
+import hashlib
+import logging
 import os
-import requests
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 
+import metrics
+from broker_client import PooledClient
+from circuit_breaker import CircuitOpenError
+from holdings_sync import (EQUITY_KEY_FIELDS, MF_KEY_FIELDS, record_networth_snapshot,
+                           sync_holdings_incremental)
+from supabase_client import get_supabase
+from supabase_writer import BulkWriter, notify_write
+
+logger = logging.getLogger(__name__)
+
 # ============================================================
 # Config - CORRECTED TO MATCH YOUR RENDER ENV VARIABLES
 # ============================================================
-BASE = "https://developer.hdfcsec.com/oapi/v1"
+BASE = os.getenv("HDFC_BASE_URL", "https://developer.hdfcsec.com/oapi/v1")
 API_KEY = os.getenv("HDFC_API_KEY")
 API_SECRET = os.getenv("HDFC_API_SECRET")
 USERNAME = os.getenv("HDFC_USERNAME")
@@ -15,214 +28,202 @@ HEADERS_JSON = {
     "Content-Type": "application/json",
     "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
 }
-# Initialize Supabase client
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
-supabase = create_client(url, key)
+
+# Connection pool size per process. One gunicorn worker serves at most
+# GUNICORN_THREADS requests at a time, and the callback can fan out a few
+# upstream calls per request, so default to twice the thread count.
+HDFC_POOL_SIZE = int(os.getenv("HDFC_POOL_SIZE") or max(4, 2 * int(os.getenv("GUNICORN_THREADS", "1"))))
+
+# (connect, read) timeouts in seconds, keyed by endpoint path under BASE
+DEFAULT_TIMEOUT = (5, 30)
+ENDPOINT_TIMEOUTS = {
+    "login": (5, 30),
+    "login/validate": (5, 20),
+    "twofa/validate": (5, 20),
+    "twofa/resend": (5, 15),
+    "authorise": (5, 20),
+    "access-token": (5, 20),
+    "portfolio/holdings": (5, 30),
+}
+
+# Retries per call for connection errors and retryable statuses (see
+# broker_client.PooledClient); POSTs only when the connection was never made
+HDFC_RETRIES = int(os.getenv("HDFC_RETRIES", "2"))
+HDFC_RETRY_BACKOFF = float(os.getenv("HDFC_RETRY_BACKOFF", "0.3"))
+HDFC_RETRY_MAX_DELAY = float(os.getenv("HDFC_RETRY_MAX_DELAY", "5"))
+
+BROKER = "HDFC Securities"
 
 MEMBERS = {
     "equity": "bef9db5e-2f21-4038-8f3f-f78ce1bbfb49",
     "mutualFunds": "d3a4fc84-a94b-494d-915f-60901f16d973"
 }
 
-# ============================================================
-# Helper Functions
-# ============================================================
+# -----------------------------
+# Pooled HTTP client
+# -----------------------------
 
-def get_token_id():
-    """Request a token_id from HDFC (initial step)."""
-    if not API_KEY:
-        raise RuntimeError("API_KEY not set")
-    
-    url = f"{BASE}/login"
-    params = {"api_key": API_KEY}
-    
-    print(f"🔄 Requesting token_id from: {url}")
-    print(f"🔐 Using API Key: {API_KEY[:8]}...")
-    
-    try:
-        r = requests.get(url, params=params, timeout=30)
-        print(f"   Status: {r.status_code}")
-        print(f"   Response: {r.text[:200]}")
-        
-        r.raise_for_status()
-        data = r.json()
-        token_id = data.get("tokenId") or data.get("token_id")
-        
-        if not token_id:
-            raise ValueError(f"Could not extract token_id from response: {data}")
-        
-        print(f"✅ Got token_id: {token_id[:10]}...")
-        return token_id
-        
-    except requests.exceptions.Timeout:
-        raise RuntimeError("HDFC API timeout - server not responding")
-    except requests.exceptions.ConnectionError as e:
-        raise RuntimeError(f"Failed to connect to HDFC: {str(e)}")
-    except Exception as e:
-        raise RuntimeError(f"Failed to get token_id: {str(e)}")
+class HdfcClient(PooledClient):
+    """
+    Keep-alive HTTP client for the HDFC InvestRight API, shared by every
+    thread in the process. HDFC auth travels in params/headers, never
+    cookies. Each endpoint has its own circuit breaker ("hdfc:<endpoint>").
+    """
 
-def login_validate(token_id, username, password):
-    url = f"{BASE}/login/validate"
-    params = {"api_key": API_KEY, "token_id": token_id}
-    payload = {"username": username, "password": password}
-    
-    print(f"🔐 Calling login_validate")
-    print(f"   URL: {url}")
-    
-    r = requests.post(url, params=params, json=payload, headers=HEADERS_JSON)
-    print(f"   Status: {r.status_code}")
-    print(f"   Response: {r.text[:200]}")
-    
-    r.raise_for_status()
-    
-    if not r.text or r.text.strip() == "":
-        return {"status": "success", "message": "Login validated"}
-    
-    try:
-        return r.json()
-    except ValueError:
-        if r.status_code == 200:
-            return {"status": "success", "message": "Login validated"}
-        raise ValueError(f"Invalid JSON response from HDFC: {r.text[:200]}")
+    def __init__(self, base=None, pool_size=None, timeouts=None):
+        super().__init__(
+            base or BASE, "hdfc", metrics.HDFC_REQUEST_SECONDS,
+            pool_size=pool_size or HDFC_POOL_SIZE,
+            timeouts={**ENDPOINT_TIMEOUTS, **(timeouts or {})},
+            default_timeout=DEFAULT_TIMEOUT,
+            retries=HDFC_RETRIES, backoff=HDFC_RETRY_BACKOFF, max_delay=HDFC_RETRY_MAX_DELAY,
+            rejected_metric=metrics.HDFC_CIRCUIT_REJECTED,
+        )
 
-def validate_otp(token_id, otp):
-    url = f"{BASE}/twofa/validate"
-    params = {"api_key": API_KEY, "token_id": token_id}
-    payload = {"answer": otp}
-    
-    print(f"📲 Validating OTP")
-    print(f"   URL: {url}")
-    
-    try:
-        resp = requests.post(url, params=params, json=payload, headers=HEADERS_JSON)
-    except Exception as e:
-        print(f"❌ Request failed: {e}")
-        return {"error": "network_failure", "details": str(e)}
-    
-    print(f"   Status: {resp.status_code}")
-    print(f"   Response: {resp.text[:200]}")
-    
-    if resp.status_code >= 400:
-        return {"error": "http_error", "status": resp.status_code, "details": resp.text}
-    
-    try:
-        data = resp.json()
-    except Exception as e:
-        print(f"❌ JSON parse failed: {e}")
-        return {"error": "invalid_json", "status": resp.status_code, "raw": resp.text}
-    
-    return data
 
-def fetch_access_token(token_id, request_token):
-    """Exchange request_token for access_token."""
-    url = HDFC_TOKEN_EXCHANGE_URL
-    params = {"api_key": API_KEY, "request_token": request_token}
-    payload = {"apiSecret": API_SECRET}
-    
-    print(f"🔑 Fetching access token")
-    print(f"   URL: {url}")
-    print(f"   Using: {API_KEY[:8]}... / {API_SECRET[:8]}...")
-    
-    resp = requests.post(url, params=params, json=payload, headers=HEADERS_JSON)
-    print(f"   Status: {resp.status_code}")
-    print(f"   Response: {resp.text[:200]}")
-    
-    resp.raise_for_status()
-    data = resp.json()
-    access_token = data.get("accessToken")
-    
-    if not access_token:
-        raise ValueError(f"Could not extract accessToken from response: {data}")
-    
-    print(f"✅ Got access token: {access_token[:10]}...")
-    return access_token
+_client = None
+_client_lock = threading.Lock()
 
-def get_holdings(access_token):
-    """Fetch holdings using access token."""
-    url = HDFC_HOLDINGS_URL
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-    }
-    
-    print(f"📊 Fetching holdings")
-    print(f"   URL: {url}")
-    
-    resp = requests.get(
-        url,
-        params={"api_key": API_KEY, "login_id": USERNAME},
-        headers=headers
-    )
-    
-    print(f"   Status: {resp.status_code}")
-    print(f"   Response: {resp.text[:200]}")
-    
-    resp.raise_for_status()
-    return resp.json()
+
+def get_client():
+    """Return the process-wide HdfcClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HdfcClient()
+    return _client
+
+# -----------------------------
+# Single-flight request coalescing
+# -----------------------------
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight block and receive the same result object, or the same
+    exception. Results are shared, so callers must not mutate them, and only
+    idempotent reads (holdings) go through it: a login's token_id starts one
+    user's OTP flow and must never be handed to another.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            self._stats["calls"] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["in_flight"] = len(self._flights)
+        return out
+
+
+_inflight = SingleFlight()
+
+
+def _token_hash(token):
+    return hashlib.sha256((token or "").encode()).hexdigest()
+
+
+def singleflight_stats():
+    """Total upstream calls requested and how many were coalesced."""
+    return _inflight.stats()
 
 # -----------------------------
 # Helper Functions
 # -----------------------------
 
 def get_token_id():
-    url = f"{BASE}/login"
+    """Request a fresh token_id for one login flow (never coalesced)."""
     params = {"api_key": API_KEY}
-    print(f"➡️ Requesting token_id: {url} params={params}")
-    r = requests.get(url, params=params)
-    print("  Status:", r.status_code, "Body:", r.text)
+    logger.debug("➡️ Requesting token_id")
+    r = get_client().get("login", params=params)
+    metrics.log_payload("hdfc login", {"params": params, "status": r.status_code, "body": r.text})
     r.raise_for_status()
     data = r.json()
     token_id = data.get("tokenId") or data.get("token_id")
-    print("  Parsed token_id:", token_id)
     if not token_id:
         raise ValueError(f"Could not extract token_id from response: {data}")
     return token_id
 
 def login_validate(token_id, username, password):
-    url = f"{BASE}/login/validate"
     params = {"api_key": API_KEY, "token_id": token_id}
     payload = {"username": username, "password": password}
-    safe_password = "*" * len(password) if password else None
-    print("🔐 Calling login_validate")
-    print("  URL:", url)
-    print("  Params:", params)
-    print("  Payload:", {"username": username, "password": safe_password})
-    r = requests.post(url, params=params, json=payload, headers=HEADERS_JSON)
-    print("  Response:", r.status_code, r.text)
+    logger.debug("🔐 Calling login_validate")
+    r = get_client().post("login/validate", params=params, json=payload, headers=HEADERS_JSON)
+    metrics.log_payload("hdfc login/validate", {
+        "params": params, "payload": payload, "status": r.status_code, "body": r.text})
     r.raise_for_status()
 
     # Handle empty or non-JSON responses
     if not r.text or r.text.strip() == "":
-        print("  ⚠️ Empty response from HDFC API")
+        logger.warning("⚠️ Empty response from login/validate")
         return {"status": "success", "message": "Login validated, awaiting OTP"}
 
     try:
         return r.json()
     except ValueError as e:
-        print(f"  ⚠️ Non-JSON response: {r.text[:200]}")
+        logger.warning("⚠️ Non-JSON response from login/validate (%d chars)", len(r.text))
         # Return a success indicator if status is 200
         if r.status_code == 200:
             return {"status": "success", "message": "Login validated"}
         raise ValueError(f"Invalid JSON response from HDFC: {r.text[:200]}")
 
 def validate_otp(token_id, otp):
-    url = f"{BASE}/twofa/validate"
     params = {"api_key": API_KEY, "token_id": token_id}
     payload = {"answer": otp}
 
-    print("📲 Validating OTP (twofa)")
-    print("  URL:", url)
-    print("  Params:", params)
-    print("  Payload:", payload)
+    logger.debug("📲 Validating OTP (twofa)")
 
     try:
-        resp = requests.post(url, params=params, json=payload, headers=HEADERS_JSON)
+        resp = get_client().post("twofa/validate", params=params, json=payload, headers=HEADERS_JSON)
+    except CircuitOpenError:
+        raise
     except Exception as e:
-        print("❌ Request failed:", e)
+        logger.error("❌ twofa/validate request failed: %s", e)
         return {"error": "network_failure", "details": str(e)}
 
-    print("🔍 RAW RESPONSE:", resp.status_code, resp.text)
+    metrics.log_payload("hdfc twofa/validate", {
+        "params": params, "payload": payload, "status": resp.status_code, "body": resp.text})
 
     # Handle HTTP errors gracefully
     if resp.status_code >= 400:
@@ -232,7 +233,7 @@ def validate_otp(token_id, otp):
     try:
         data = resp.json()
     except Exception as e:
-        print("❌ JSON PARSE FAILED:", e)
+        logger.error("❌ twofa/validate returned non-JSON: %s", e)
         return {
             "error": "invalid_json",
             "status": resp.status_code,
@@ -243,25 +244,20 @@ def validate_otp(token_id, otp):
 
 
 def authorise(token_id, request_token, consent="Y"):
-    url = f"{BASE}/authorise"
     params = {
         "api_key": API_KEY,
         "token_id": token_id,
         "request_token": request_token,
         "consent": consent
     }
-    print("🔑 Authorising session")
-    print("  URL:", url)
-    print("  Params:", params)
-    resp = requests.post(url, params=params, headers=HEADERS_JSON)
-    print("  Response:", resp.status_code, resp.text)
+    logger.debug("🔑 Authorising session")
+    resp = get_client().post("authorise", params=params, headers=HEADERS_JSON)
+    metrics.log_payload("hdfc authorise", {"params": params, "status": resp.status_code, "body": resp.text})
     resp.raise_for_status()
     return resp.json()
 
 def fetch_access_token(token_id, request_token):
     # CORRECT URL: access-token (with hyphen)
-    url = f"{BASE}/access-token"
-    
     # Use query parameters as shown in curl
     params = {
         "api_key": API_KEY,
@@ -273,35 +269,33 @@ def fetch_access_token(token_id, request_token):
         "apiSecret": API_SECRET
     }
     
-    print("🔑 Fetching access token")
-    print("  URL:", url)
-    print("  Params:", params)
-    print("  Payload:", payload)
-    
-    resp = requests.post(url, params=params, json=payload, headers=HEADERS_JSON)
-    print("  Response:", resp.status_code, resp.text)
+    logger.debug("🔑 Fetching access token")
+    resp = get_client().post("access-token", params=params, json=payload, headers=HEADERS_JSON)
+    metrics.log_payload("hdfc access-token", {
+        "params": params, "payload": payload, "status": resp.status_code, "body": resp.text})
     resp.raise_for_status()
     
     data = resp.json()
     # Response key is "accessToken" (camelCase)
     access_token = data.get("accessToken")
-    print("  Parsed access_token:", access_token)
     if not access_token:
-        raise ValueError(f"Could not extract accessToken from response: {data}")
+        raise ValueError(f"Could not extract accessToken from response keys: {sorted(data)}")
     return access_token
 
 def get_holdings(access_token):
-    url = f"{BASE}/portfolio/holdings"
+    """Fetch holdings; concurrent callers with the same token share one call."""
+    key = ("portfolio/holdings", _token_hash(access_token), API_KEY, USERNAME)
+    return _inflight.do(key, lambda: _request_holdings(access_token))
+
+def _request_holdings(access_token):
     headers = {
         "Authorization": f"Bearer {access_token}",
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36"
     }
-    print("📊 Fetching holdings")
-    print("  URL:", url)
-    print("  Headers:", headers)
+    logger.debug("📊 Fetching holdings")
    # resp = requests.get(url, params={"api_key": API_KEY}, headers=headers)
-    resp = requests.get(
-    url,
+    resp = get_client().get(
+    "portfolio/holdings",
     params={
         "api_key": API_KEY,
         "login_id": USERNAME   # <-- REQUIRED BY HDFC
@@ -309,18 +303,20 @@ def get_holdings(access_token):
     headers=headers
 )
 
-    print("  Response:", resp.status_code, resp.text)
+    metrics.log_payload("hdfc portfolio/holdings", {
+        "headers": headers, "status": resp.status_code, "body": resp.text})
     resp.raise_for_status()
     return resp.json()
 
-def get_holdings_with_fallback(request_token, token_id):
-    """
-    Try different ways to authenticate with holdings API
-    """
-    url = f"{BASE}/portfolio/holdings"
-    
-    # Different auth methods to try
-    auth_methods = [
+def map_holdings_for_frontend(raw_holdings):
+    """Unwrap the holdings list from an HDFC {"data": [...]} response."""
+    if isinstance(raw_holdings, dict):
+        return raw_holdings.get("data") or []
+    return raw_holdings or []
+
+def _fallback_auth_methods(request_token, token_id):
+    """The different ways of authenticating with the holdings API."""
+    return [
         # Method 1: Authorization header with request_token
         {
             "headers": {"Authorization": f"Bearer {request_token}"},
@@ -349,128 +345,365 @@ def get_holdings_with_fallback(request_token, token_id):
             "params": {"api_key": API_KEY}
         }
     ]
-    
-    print("📊 Trying multiple holdings authentication methods...")
+
+def _try_auth_method(i, method):
+    """Call holdings with one fallback auth method; raise unless HTTP 200."""
+    resp = get_client().get("portfolio/holdings", headers=method["headers"], params=method["params"])
+    logger.debug("Holdings fallback method %d: HTTP %d", i, resp.status_code)
+    metrics.log_payload(f"hdfc holdings fallback {i}", dict(method, status=resp.status_code, body=resp.text))
+    if resp.status_code != 200:
+        raise RuntimeError(f"Method {i} returned HTTP {resp.status_code}")
+    logger.info("✅ Holdings fallback method %d succeeded", i)
+    return resp.json()
+
+def get_holdings_with_fallback(request_token, token_id):
+    """
+    Try different ways to authenticate with holdings API
+    """
+    auth_methods = _fallback_auth_methods(request_token, token_id)
+
+    logger.debug("📊 Trying %d holdings authentication methods", len(auth_methods))
     
     for i, method in enumerate(auth_methods, 1):
         try:
-            print(f"  Method {i}: {method}")
-            resp = requests.get(url, headers=method["headers"], params=method["params"])
-            print(f"  Response {i}: {resp.status_code} - {resp.text[:100]}")
-            
-            if resp.status_code == 200:
-                print(f"✅ Success with method {i}!")
-                return resp.json()
-                
+            return _try_auth_method(i, method)
+        except CircuitOpenError:
+            # Every variant hits the same endpoint; don't walk the rest
+            raise
         except Exception as e:
-            print(f"  Method {i} error: {e}")
+            logger.info("Holdings fallback method %d failed: %s", i, e)
             continue
     
     # If all methods fail, raise the last error
     raise Exception(f"All {len(auth_methods)} authentication methods failed for holdings")
 
+# -----------------------------
+# Concurrent holdings strategies
+# -----------------------------
+
+# Overall wall-clock budget for racing the holdings strategies (seconds)
+HOLDINGS_DEADLINE = float(os.getenv("HDFC_HOLDINGS_DEADLINE", "20"))
+
+# Comma-separated strategy names to skip, e.g. "fallback_3,fallback_5",
+# once strategy_stats() shows they never win.
+DISABLED_STRATEGIES = {
+    s.strip() for s in os.getenv("HDFC_DISABLED_STRATEGIES", "").split(",") if s.strip()
+}
+
+# The exchange strategy spends the single-use request_token; once it has
+# started, the race waits this long (past a winner or the deadline) for
+# its access token so it can still be stored
+EXCHANGE_SETTLE_TIMEOUT = float(os.getenv("HDFC_EXCHANGE_SETTLE_TIMEOUT", str(sum(DEFAULT_TIMEOUT))))
+
+_strategy_executor = None
+_strategy_stats = {}
+_strategy_lock = threading.Lock()
+
+
+def _get_strategy_executor():
+    global _strategy_executor
+    if _strategy_executor is None:
+        with _strategy_lock:
+            if _strategy_executor is None:
+                _strategy_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("HDFC_STRATEGY_WORKERS") or 2 * HDFC_POOL_SIZE),
+                    thread_name_prefix="hdfc-strategy",
+                )
+    return _strategy_executor
+
+
+def _record_strategy(name, outcome, elapsed_ms=None):
+    with _strategy_lock:
+        stats = _strategy_stats.setdefault(
+            name, {"attempts": 0, "wins": 0, "failures": 0, "win_ms_total": 0.0}
+        )
+        if outcome == "attempt":
+            stats["attempts"] += 1
+        elif outcome == "win":
+            stats["wins"] += 1
+            stats["win_ms_total"] += elapsed_ms
+        elif outcome == "failure":
+            stats["failures"] += 1
+
+
+def strategy_stats():
+    """Per-strategy attempts, wins, failures and mean winning latency."""
+    with _strategy_lock:
+        out = {}
+        for name, s in _strategy_stats.items():
+            out[name] = dict(s)
+            out[name]["avg_win_ms"] = round(s["win_ms_total"] / s["wins"], 1) if s["wins"] else None
+        return out
+
+
+def _is_valid_holdings(data):
+    return isinstance(data, dict) and isinstance(data.get("data"), list)
+
+
+def _holdings_strategies(request_token, token_id, context, access_token=None, exchanged=None):
+    """
+    Independent ways of obtaining holdings, as (name, callable) pairs.
+    exchanged (a threading.Event) is set once the exchange strategy's
+    access-token call has returned or failed.
+    """
+    strategies = []
+    if access_token:
+        # A still-valid access token from the server-side token store
+        def stored_token():
+            try:
+                return get_holdings(access_token)
+            except Exception as e:
+                response = getattr(e, "response", None)
+                if response is not None and response.status_code in (401, 403):
+                    context["stored_token_rejected"] = True
+                raise
+        strategies.append(("stored_token", stored_token))
+
+    if request_token:
+        # Some deployments accept the request_token directly as a bearer
+        strategies.append(("direct", lambda: get_holdings(request_token)))
+
+    if request_token and token_id:
+        def exchange():
+            try:
+                access_token = fetch_access_token(token_id, request_token)
+                context["access_token"] = access_token
+            finally:
+                if exchanged is not None:
+                    exchanged.set()
+            return get_holdings(access_token)
+        strategies.append(("exchange", exchange))
+
+    if request_token:
+        for i, method in enumerate(_fallback_auth_methods(request_token, token_id), 1):
+            strategies.append((f"fallback_{i}", lambda i=i, method=method: _try_auth_method(i, method)))
+
+    return [(name, fn) for name, fn in strategies if name not in DISABLED_STRATEGIES]
+
+
+def race_holdings_strategies(request_token, token_id, deadline=None, access_token=None):
+    """
+    Start every holdings strategy in parallel and return the first valid
+    {"data": [...]} payload.
+
+    Returns (holdings_data, winner, context). holdings_data and winner are
+    None when nothing succeeds before the deadline. context carries side
+    results such as the exchanged "access_token", "stored_token_rejected"
+    when the passed-in access_token got a 401/403, or "circuit_open" (the
+    CircuitOpenError) when an open breaker refused a strategy. Strategies
+    still in flight when a winner arrives are left to finish on their own
+    timeouts and their results are ignored; ones that have not started yet
+    are cancelled. The exception is a started exchange: its request_token
+    is already spent, so the race waits (up to EXCHANGE_SETTLE_TIMEOUT) for
+    the access token and returns it in context whoever won.
+    """
+    deadline = HOLDINGS_DEADLINE if deadline is None else deadline
+    context = {}
+    executor = _get_strategy_executor()
+    started = time.monotonic()
+    exchanged = threading.Event()
+
+    futures = {}
+    exchange_future = None
+    for name, fn in _holdings_strategies(request_token, token_id, context, access_token, exchanged):
+        _record_strategy(name, "attempt")
+        future = executor.submit(fn)
+        futures[future] = name
+        if name == "exchange":
+            exchange_future = future
+
+    logger.info("🏁 Racing %d holdings strategies: %s", len(futures), sorted(futures.values()))
+
+    pending = set(futures)
+    try:
+        while pending:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                logger.warning("⏱️ Holdings strategies hit the %ss deadline", deadline)
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                try:
+                    data = future.result()
+                except Exception as e:
+                    logger.info("Strategy %s failed: %s", name, e)
+                    _record_strategy(name, "failure")
+                    if isinstance(e, CircuitOpenError):
+                        context["circuit_open"] = e
+                    continue
+                if not _is_valid_holdings(data):
+                    logger.info("Strategy %s returned no holdings list", name)
+                    _record_strategy(name, "failure")
+                    continue
+                elapsed_ms = (time.monotonic() - started) * 1000
+                _record_strategy(name, "win", elapsed_ms)
+                logger.info("✅ Strategy %s won in %.0f ms", name, elapsed_ms)
+                return data, name, context
+    finally:
+        for future in pending:
+            future.cancel()
+        if exchange_future is not None and not exchange_future.cancelled():
+            if not exchanged.wait(EXCHANGE_SETTLE_TIMEOUT):
+                logger.warning("⚠️ Token exchange still running after %ss; its access token "
+                               "will not be stored", EXCHANGE_SETTLE_TIMEOUT)
+
+    return None, None, context
+
 def resend_2fa(token_id):
-    url = f"{BASE}/twofa/resend"
     params = {"api_key": API_KEY, "token_id": token_id}
-    print("🔁 Resending 2FA OTP")
-    print("  URL:", url)
-    print("  Params:", params)
-    resp = requests.post(url, params=params, headers=HEADERS_JSON)
-    print("  Response:", resp.status_code, resp.text)
+    logger.debug("🔁 Resending 2FA OTP")
+    resp = get_client().post("twofa/resend", params=params, headers=HEADERS_JSON)
+    metrics.log_payload("hdfc twofa/resend", {"params": params, "status": resp.status_code, "body": resp.text})
     resp.raise_for_status()
     return resp.json()
     
-def process_holdings_success(holdings, user_id, hdfc_member_ids):
+def process_holdings_success(holdings, user_id, hdfc_member_ids, mode=None):
     """
     Process HDFC holdings and insert into:
         - equity_holdings
         - mutual_fund_holdings
+
+    mode "incremental" (default, see HDFC_IMPORT_MODE) writes only inserted,
+    changed and removed rows; "replace" deletes and re-inserts everything.
     """
+    import_date = datetime.utcnow().date().isoformat()
 
-    equity_records = []
-    mf_records = []
+    logger.info("🔄 Processing %d holdings for user %s", len(holdings), user_id)
 
-    import_date = datetime.utcnow().date().isoformat()
+    equity_records, mf_records = normalize_holdings(holdings, user_id, hdfc_member_ids, import_date)
+    return import_records(user_id, hdfc_member_ids, equity_records, mf_records, import_date, mode)
 
-    print(f"🔄 Processing {len(holdings)} holdings for user {user_id}")
+def normalize_holdings(holdings, user_id, hdfc_member_ids, import_date):
+    """(equity_records, mf_records) ready for Supabase from a raw HDFC payload."""
+    # One columnar pass over the payload; see holdings_columns (imported
+    # here so NumPy loads on the first import, not at worker boot)
+    from holdings_columns import hdfc_records
+    return hdfc_records(holdings, user_id, hdfc_member_ids, import_date)
 
-    for h in holdings:
-        try:
-            investment_type = h.get("investment_type", "").lower()
-
-            # ------ EQUITY HOLDINGS ------
-            if investment_type == "equity":
-                equity_records.append({
-                    "user_id": user_id,
-                    "member_id": hdfc_member_ids["equity"],
-                    "broker_platform": "HDFC Securities",
-                    "symbol": h.get("tradingsymbol") or h.get("symbol") or "UNKNOWN",
-                    "company_name": h.get("tradingsymbol") or h.get("symbol") or "UNKNOWN",
-                    "quantity": float(h.get("quantity") or 0),
-                    "average_price": float(h.get("averageprice") or 0),
-                    "current_price": float(h.get("lastprice") or 0),
-                    "invested_amount": (float(h.get("quantity") or 0) *
-                                        float(h.get("averageprice") or 0)),
-                    "current_value": (float(h.get("quantity") or 0) *
-                                      float(h.get("lastprice") or 0)),
-                    "import_date": import_date,
-                })
-
-            # ------ MUTUAL FUND HOLDINGS ------
-            elif investment_type == "mutualfunds":
-                mf_records.append({
-                    "user_id": user_id,
-                    "member_id": hdfc_member_ids["mutualFunds"],
-                    "broker_platform": "HDFC Securities",
-                    "scheme_name": h.get("schemename") or "Unknown",
-                    "scheme_code": h.get("schemecode") or "",
-                    "folio_number": h.get("folionumber") or "",
-                    "fund_house": h.get("fundhouse") or "Unknown",
-                    "units": float(h.get("units") or 0),
-                    "average_nav": float(h.get("averagenav") or 0),
-                    "current_nav": float(h.get("nav") or 0),
-                    "invested_amount": (float(h.get("units") or 0) *
-                                        float(h.get("averagenav") or 0)),
-                    "current_value": (float(h.get("units") or 0) *
-                                      float(h.get("nav") or 0)),
-                    "import_date": import_date,
-                })
+def journal_import(holdings, user_id, hdfc_member_ids, idempotency_key=None):
+    """
+    Normalize holdings and append them to the import journal, which writes
+    them to Supabase in the background. Returns (job, created) once the
+    batch is durable on local disk.
+    """
+    import import_jobs
+    import import_journal
 
-        except Exception as e:
-            print(f"❌ Error processing holding: {e}")
-            continue
+    import_date = datetime.utcnow().date().isoformat()
+    equity_records, mf_records = normalize_holdings(holdings, user_id, hdfc_member_ids, import_date)
+    job_id = import_jobs.job_id_for(user_id, BROKER, idempotency_key or import_date)
+    return import_journal.get_journal().append(job_id, "hdfc", BROKER, user_id, {
+        "user_id": user_id,
+        "member_ids": hdfc_member_ids,
+        "equity": equity_records,
+        "mutualFunds": mf_records,
+        "import_date": import_date,
+    })
 
-    # ----------------------------------------
-    # DELETE OLD HOLDINGS BEFORE INSERTION
-    # ----------------------------------------
-    print("🗑️ Deleting old HDFC holdings...")
+def import_records(user_id, hdfc_member_ids, equity_records, mf_records, import_date, mode=None):
+    """
+    Write normalized HDFC records for the equity / MF members.
 
-    supabase.table("equity_holdings").delete().match({
+    A member whose records hash to the same fingerprint as its last import
+    (see import_fingerprint) is skipped without any Supabase write; its
+    entry reports the previous import's summary instead.
+    """
+    import import_fingerprint
+
+    equity_match = {
         "user_id": user_id,
-        "broker_platform": "HDFC Securities",
+        "broker_platform": BROKER,
         "member_id": hdfc_member_ids["equity"]
-    }).execute()
-
-    supabase.table("mutual_fund_holdings").delete().match({
+    }
+    mf_match = {
         "user_id": user_id,
-        "broker_platform": "HDFC Securities",
+        "broker_platform": BROKER,
         "member_id": hdfc_member_ids["mutualFunds"]
-    }).execute()
+    }
+    members = [
+        ("equity", "equity_holdings", equity_records, equity_match, EQUITY_KEY_FIELDS),
+        ("mutualFunds", "mutual_fund_holdings", mf_records, mf_match, MF_KEY_FIELDS),
+    ]
 
     # ----------------------------------------
-    # INSERT NEW HOLDINGS
+    # SKIP MEMBERS WHOSE PAYLOAD IS UNCHANGED
     # ----------------------------------------
-    if equity_records:
-        print(f"📥 Inserting {len(equity_records)} equity holdings...")
-        supabase.table("equity_holdings").insert(equity_records).execute()
-
-    if mf_records:
-        print(f"📥 Inserting {len(mf_records)} mutual fund holdings...")
-        supabase.table("mutual_fund_holdings").insert(mf_records).execute()
+    fingerprints, skipped = {}, {}
+    for name, table, records, match, _ in members:
+        fp = fingerprints[name] = import_fingerprint.fingerprint(records)
+        previous = import_fingerprint.unchanged(user_id, match["member_id"], BROKER, fp, table, match)
+        if previous is not None:
+            skipped[name] = {
+                "skipped": "unchanged_payload",
+                "previous": previous["summary"],
+                "previous_import_at": previous["at"],
+            }
+            logger.info("⏭️ HDFC %s payload unchanged since %s; no writes", name, previous["at"])
+    pending = [m for m in members if m[0] not in skipped]
+
+    mode = (mode or IMPORT_MODE).lower()
+
+    if mode == "incremental":
+        # ----------------------------------------
+        # DIFF AGAINST EXISTING ROWS, WRITE ONLY CHANGES
+        # ----------------------------------------
+        changes = dict(skipped)
+        for name, table, records, match, key_fields in pending:
+            summary = sync_holdings_incremental(table, records, match, key_fields)
+            changes[name] = summary
+            counts = {k: summary[k] for k in ("inserted", "updated", "deleted", "unchanged")}
+            import_fingerprint.remember(
+                user_id, match["member_id"], BROKER, fingerprints[name], counts,
+                rows=counts["inserted"] + counts["updated"] + counts["unchanged"])
+        logger.info("✅ HDFC holdings synced incrementally: %s", changes)
+        if pending or _snapshot_due(skipped, import_date):
+            record_networth_snapshot(user_id, import_date)
+        return {
+            "equity": len(equity_records),
+            "mutualFunds": len(mf_records),
+            "changes": changes
+        }
 
-    print("✅ HDFC holdings imported successfully")
+    writer = BulkWriter(get_supabase())
+    writes = []
+    for name, table, records, match, _ in pending:
+        # ----------------------------------------
+        # DELETE OLD HOLDINGS BEFORE INSERTION
+        # ----------------------------------------
+        logger.info("🗑️ Deleting old HDFC %s", table)
+        with metrics.span(metrics.SUPABASE_OP_SECONDS, table=table, op="delete"):
+            get_supabase().table(table).delete().match(match).execute()
+        notify_write(table)
+
+        # ----------------------------------------
+        # INSERT NEW HOLDINGS (chunked, concurrent)
+        # ----------------------------------------
+        if records:
+            logger.info("📥 Inserting %d %s", len(records), table)
+            writes.append(writer.insert(table, records).to_dict())
+        import_fingerprint.remember(
+            user_id, match["member_id"], BROKER, fingerprints[name],
+            {"inserted": len(records)}, rows=len(records))
+
+    logger.info("✅ HDFC holdings imported successfully")
+    if pending or _snapshot_due(skipped, import_date):
+        record_networth_snapshot(user_id, import_date)
 
     return {
         "equity": len(equity_records),
-        "mutualFunds": len(mf_records)
+        "mutualFunds": len(mf_records),
+        "writes": writes,
+        "skipped": skipped
     }
+
+def _snapshot_due(skipped, import_date):
+    """A fully skipped import still snapshots when the last real import was on an earlier day."""
+    return any(s["previous_import_at"][:10] != import_date for s in skipped.values())
+
+# -----------------------------
+# Import mode
+# -----------------------------
+
+# "incremental" diffs against existing rows; "replace" deletes and re-inserts
+IMPORT_MODE = os.getenv("HDFC_IMPORT_MODE", "incremental")
@@ -0,0 +1,137 @@
+"""
+In-process TTL + LRU cache for upstream HDFC holdings.
+
+Entries are keyed by a SHA-256 of the access token, never the token itself.
+A fresh entry (younger than the TTL) is served as is. A stale entry (within
+the stale window after the TTL) is still served, while a single background
+refresh per key fetches a new copy. Anything older is a miss and is loaded
+synchronously. Hit / miss / stale / eviction counters are kept so the TTL
+can be tuned from /api/hdfc/holdings/cache-stats.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+HOLDINGS_CACHE_TTL = float(os.getenv("HOLDINGS_CACHE_TTL", "60"))
+HOLDINGS_CACHE_STALE = float(os.getenv("HOLDINGS_CACHE_STALE", "300"))
+HOLDINGS_CACHE_MAX = int(os.getenv("HOLDINGS_CACHE_MAX", "256"))
+
+
+def token_key(token):
+    """Cache key for a token; the raw token is never stored."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def etag_for(value):
+    """Strong ETag over the JSON form of a cached value."""
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()[:32]
+
+
+class CacheEntry:
+    __slots__ = ("value", "etag", "fetched_at", "refreshing")
+
+    def __init__(self, value):
+        self.value = value
+        self.etag = etag_for(value)
+        self.fetched_at = time.time()
+        self.refreshing = False
+
+
+class HoldingsCache:
+    def __init__(self, ttl=None, stale=None, max_entries=None):
+        self.ttl = HOLDINGS_CACHE_TTL if ttl is None else ttl
+        self.stale = HOLDINGS_CACHE_STALE if stale is None else stale
+        self.max_entries = max_entries or HOLDINGS_CACHE_MAX
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="holdings-refresh")
+        self._stats = {
+            "hits": 0, "misses": 0, "stale_hits": 0, "evictions": 0,
+            "refreshes": 0, "refresh_failures": 0,
+        }
+
+    def get(self, key, loader):
+        """
+        Return (entry, state) for key, where state is "hit", "stale" or
+        "miss". loader() fetches a fresh value and is only called on a miss
+        (inline) or for a stale entry (in the background).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.fetched_at
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry, "hit"
+                if age < self.ttl + self.stale:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if not entry.refreshing:
+                        entry.refreshing = True
+                        self._refresher.submit(self._refresh, key, loader)
+                    return entry, "stale"
+            self._stats["misses"] += 1
+
+        entry = CacheEntry(loader())
+        self._store(key, entry)
+        return entry, "miss"
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["entries"] = len(self._entries)
+        out.update(ttl=self.ttl, stale=self.stale, max_entries=self.max_entries)
+        lookups = out["hits"] + out["stale_hits"] + out["misses"]
+        out["hit_ratio"] = round((out["hits"] + out["stale_hits"]) / lookups, 3) if lookups else None
+        return out
+
+    def _refresh(self, key, loader):
+        try:
+            entry = CacheEntry(loader())
+        except Exception as e:
+            logger.warning("⚠️ Background holdings refresh failed: %s", e)
+            with self._lock:
+                self._stats["refresh_failures"] += 1
+                current = self._entries.get(key)
+                if current is not None:
+                    current.refreshing = False
+            return
+        with self._lock:
+            self._stats["refreshes"] += 1
+        self._store(key, entry)
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide HoldingsCache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = HoldingsCache()
+    return _cache
@@ -0,0 +1,311 @@
+"""
+Columnar normalization of broker holdings payloads.
+
+A raw broker payload (HDFC `data`, Kite holdings / MF holdings) is walked
+once and every numeric field is parsed a single time into a column. Derived amounts (invested / current value) are
+computed as NumPy vector operations over whole columns, and insert-ready row
+dicts are only materialized at the very end.
+
+Holding is the compact per-position record of the cross-broker
+consolidation index (holdings_index): fixed __slots__ instead of a dict
+with a dozen repeated string keys per row.
+
+NumPy is imported on first use: app imports this module (via
+holdings_index / revaluation) and must not pay for NumPy at worker boot.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+HDFC_BROKER = "HDFC Securities"
+ZERODHA_BROKER = "Zerodha"
+
+EQUITY = "equity"
+MUTUAL_FUND = "mutual_fund"
+
+# Exchange decorations brokers put around the same NSE / BSE symbol
+_EXCHANGE_PREFIXES = ("NSE:", "BSE:")
+_EXCHANGE_SUFFIXES = ("-EQ", "-BE", "-BZ", ".NS", ".BO")
+
+
+def consolidation_key(kind, symbol, name=""):
+    """
+    Key under which the same security held anywhere is merged. Equity
+    symbols are stripped of exchange prefixes / series suffixes (an ISIN
+    passes through unchanged); mutual funds key on scheme code, or on the
+    scheme name when the broker sent no code.
+    """
+    symbol = (symbol or "").strip().upper()
+    if kind == EQUITY:
+        for prefix in _EXCHANGE_PREFIXES:
+            if symbol.startswith(prefix):
+                symbol = symbol[len(prefix):]
+        for suffix in _EXCHANGE_SUFFIXES:
+            if symbol.endswith(suffix):
+                symbol = symbol[:-len(suffix)]
+        return symbol
+    return symbol or "NAME:" + " ".join((name or "").upper().split())
+
+
+class Holding:
+    """
+    One position of one member at one broker.
+
+    Equity: symbol / name are the trading symbol and company name, quantity
+    and prices are shares and per-share prices. Mutual fund: symbol is the
+    scheme code, name the scheme name, quantity units and prices NAVs.
+    """
+
+    __slots__ = ("kind", "member_id", "broker", "symbol", "name", "folio", "fund_house",
+                 "quantity", "average_price", "current_price", "invested_amount", "current_value")
+
+    def __init__(self, kind, member_id, broker, symbol, name, quantity, average_price,
+                 current_price, invested_amount, current_value, folio="", fund_house=""):
+        self.kind = kind
+        self.member_id = member_id
+        self.broker = broker
+        self.symbol = symbol
+        self.name = name
+        self.folio = folio
+        self.fund_house = fund_house
+        self.quantity = quantity
+        self.average_price = average_price
+        self.current_price = current_price
+        self.invested_amount = invested_amount
+        self.current_value = current_value
+
+    def __repr__(self):
+        return (f"Holding({self.kind}, {self.symbol!r}, member={self.member_id}, "
+                f"broker={self.broker!r}, qty={self.quantity}, value={self.current_value})")
+
+    @property
+    def key(self):
+        """Consolidation key; see consolidation_key."""
+        return consolidation_key(self.kind, self.symbol, self.name)
+
+    @classmethod
+    def from_row(cls, kind, row):
+        """A Holding from an equity_holdings / mutual_fund_holdings row."""
+        def num(column):
+            try:
+                return float(row.get(column) or 0)
+            except (TypeError, ValueError):
+                return 0.0
+
+        if kind == EQUITY:
+            return cls(EQUITY, row.get("member_id"), row.get("broker_platform") or "N/A",
+                       row.get("symbol") or "", row.get("company_name") or row.get("symbol") or "",
+                       num("quantity"), num("average_price"), num("current_price"),
+                       num("invested_amount"), num("current_value"))
+        return cls(MUTUAL_FUND, row.get("member_id"), row.get("broker_platform") or "N/A",
+                   row.get("scheme_code") or "", row.get("scheme_name") or "",
+                   num("units"), num("average_nav"), num("current_nav"),
+                   num("invested_amount"), num("current_value"),
+                   folio=row.get("folio_number") or "", fund_house=row.get("fund_house") or "")
+
+
+class HoldingColumns:
+    """
+    One asset category held as parallel columns.
+
+    `text` maps column name -> list of str, `numeric` maps column name ->
+    float64 ndarray. All columns have the same length.
+    """
+
+    def __init__(self, text, numeric):
+        import numpy as np
+
+        self.text = text
+        self.numeric = {name: np.asarray(col, dtype=np.float64) for name, col in numeric.items()}
+
+    def __len__(self):
+        for column in self.numeric.values():
+            return len(column)
+        return 0
+
+    def derive_amounts(self, units_col, cost_col, price_col):
+        """Add invested_amount / current_value columns as vector products."""
+        units = self.numeric[units_col]
+        self.numeric["invested_amount"] = units * self.numeric[cost_col]
+        self.numeric["current_value"] = units * self.numeric[price_col]
+        return self
+
+    def lists(self, *names):
+        """Columns as plain Python lists, ready to zip into records."""
+        return [self.numeric[n].tolist() if n in self.numeric else self.text[n] for n in names]
+
+
+def normalize_hdfc_holdings(holdings):
+    """
+    Split a raw HDFC holdings list into (equity, mutual_fund) HoldingColumns
+    in one pass. Rows whose numbers don't parse are skipped, as before.
+    """
+    eq_symbol, eq_qty, eq_avg, eq_last = [], [], [], []
+    mf_name, mf_code, mf_folio, mf_house = [], [], [], []
+    mf_units, mf_avg, mf_nav = [], [], []
+
+    for h in holdings:
+        try:
+            investment_type = h.get("investment_type", "").lower()
+
+            # ------ EQUITY HOLDINGS ------
+            if investment_type == "equity":
+                quantity = float(h.get("quantity") or 0)
+                average_price = float(h.get("averageprice") or 0)
+                last_price = float(h.get("lastprice") or 0)
+                eq_symbol.append(h.get("tradingsymbol") or h.get("symbol") or "UNKNOWN")
+                eq_qty.append(quantity)
+                eq_avg.append(average_price)
+                eq_last.append(last_price)
+
+            # ------ MUTUAL FUND HOLDINGS ------
+            elif investment_type == "mutualfunds":
+                units = float(h.get("units") or 0)
+                average_nav = float(h.get("averagenav") or 0)
+                nav = float(h.get("nav") or 0)
+                mf_name.append(h.get("schemename") or "Unknown")
+                mf_code.append(h.get("schemecode") or "")
+                mf_folio.append(h.get("folionumber") or "")
+                mf_house.append(h.get("fundhouse") or "Unknown")
+                mf_units.append(units)
+                mf_avg.append(average_nav)
+                mf_nav.append(nav)
+
+        except Exception as e:
+            logger.warning("❌ Error processing holding: %s", e)
+            continue
+
+    equity = HoldingColumns(
+        {"symbol": eq_symbol},
+        {"quantity": eq_qty, "average_price": eq_avg, "current_price": eq_last},
+    ).derive_amounts("quantity", "average_price", "current_price")
+
+    mutual_funds = HoldingColumns(
+        {"scheme_name": mf_name, "scheme_code": mf_code,
+         "folio_number": mf_folio, "fund_house": mf_house},
+        {"units": mf_units, "average_nav": mf_avg, "current_nav": mf_nav},
+    ).derive_amounts("units", "average_nav", "current_nav")
+
+    return equity, mutual_funds
+
+
+def normalize_zerodha_holdings(equity_rows, mf_rows):
+    """
+    Kite /portfolio/holdings and /mf/holdings lists into (equity,
+    mutual_fund) HoldingColumns. Rows whose numbers don't parse are skipped.
+    """
+    eq_symbol, eq_qty, eq_avg, eq_last = [], [], [], []
+    for h in equity_rows:
+        try:
+            quantity = float(h.get("quantity") or 0)
+            average_price = float(h.get("average_price") or 0)
+            last_price = float(h.get("last_price") or 0)
+        except (TypeError, ValueError) as e:
+            logger.warning("❌ Error processing Zerodha holding: %s", e)
+            continue
+        eq_symbol.append(h.get("tradingsymbol") or "UNKNOWN")
+        eq_qty.append(quantity)
+        eq_avg.append(average_price)
+        eq_last.append(last_price)
+
+    mf_name, mf_code, mf_folio, mf_house = [], [], [], []
+    mf_units, mf_avg, mf_nav = [], [], []
+    for h in mf_rows:
+        try:
+            units = float(h.get("quantity") or 0)
+            average_nav = float(h.get("average_price") or 0)
+            nav = float(h.get("last_price") or 0)
+        except (TypeError, ValueError) as e:
+            logger.warning("❌ Error processing Zerodha MF holding: %s", e)
+            continue
+        # Kite MF holdings carry the scheme ISIN as tradingsymbol
+        mf_name.append(h.get("fund") or h.get("tradingsymbol") or "Unknown")
+        mf_code.append(h.get("tradingsymbol") or "")
+        mf_folio.append(h.get("folio") or "")
+        mf_house.append(h.get("fund_house") or "Unknown")
+        mf_units.append(units)
+        mf_avg.append(average_nav)
+        mf_nav.append(nav)
+
+    equity = HoldingColumns(
+        {"symbol": eq_symbol},
+        {"quantity": eq_qty, "average_price": eq_avg, "current_price": eq_last},
+    ).derive_amounts("quantity", "average_price", "current_price")
+
+    mutual_funds = HoldingColumns(
+        {"scheme_name": mf_name, "scheme_code": mf_code,
+         "folio_number": mf_folio, "fund_house": mf_house},
+        {"units": mf_units, "average_nav": mf_avg, "current_nav": mf_nav},
+    ).derive_amounts("units", "average_nav", "current_nav")
+
+    return equity, mutual_funds
+
+
+def _equity_records(equity, user_id, member_id, broker, import_date):
+    return [
+        {
+            "user_id": user_id,
+            "member_id": member_id,
+            "broker_platform": broker,
+            "symbol": symbol,
+            "company_name": symbol,
+            "quantity": quantity,
+            "average_price": average_price,
+            "current_price": current_price,
+            "invested_amount": invested_amount,
+            "current_value": current_value,
+            "import_date": import_date,
+        }
+        for symbol, quantity, average_price, current_price, invested_amount, current_value
+        in zip(*equity.lists("symbol", "quantity", "average_price", "current_price",
+                             "invested_amount", "current_value"))
+    ]
+
+
+def _mf_records(mutual_funds, user_id, member_id, broker, import_date):
+    return [
+        {
+            "user_id": user_id,
+            "member_id": member_id,
+            "broker_platform": broker,
+            "scheme_name": scheme_name,
+            "scheme_code": scheme_code,
+            "folio_number": folio_number,
+            "fund_house": fund_house,
+            "units": units,
+            "average_nav": average_nav,
+            "current_nav": current_nav,
+            "invested_amount": invested_amount,
+            "current_value": current_value,
+            "import_date": import_date,
+        }
+        for (scheme_name, scheme_code, folio_number, fund_house, units, average_nav,
+             current_nav, invested_amount, current_value)
+        in zip(*mutual_funds.lists("scheme_name", "scheme_code", "folio_number", "fund_house",
+                                   "units", "average_nav", "current_nav",
+                                   "invested_amount", "current_value"))
+    ]
+
+
+def hdfc_records(holdings, user_id, member_ids, import_date):
+    """
+    Normalize a raw HDFC holdings list into insert-ready
+    (equity_records, mf_records) for equity_holdings / mutual_fund_holdings.
+    """
+    equity, mutual_funds = normalize_hdfc_holdings(holdings)
+    return (
+        _equity_records(equity, user_id, member_ids["equity"], HDFC_BROKER, import_date),
+        _mf_records(mutual_funds, user_id, member_ids["mutualFunds"], HDFC_BROKER, import_date),
+    )
+
+
+def zerodha_records(equity_rows, mf_rows, user_id, member_ids, import_date):
+    """
+    Normalize Kite equity and MF holdings into insert-ready
+    (equity_records, mf_records) for equity_holdings / mutual_fund_holdings.
+    """
+    equity, mutual_funds = normalize_zerodha_holdings(equity_rows, mf_rows)
+    return (
+        _equity_records(equity, user_id, member_ids["equity"], ZERODHA_BROKER, import_date),
+        _mf_records(mutual_funds, user_id, member_ids["mutualFunds"], ZERODHA_BROKER, import_date),
+    )
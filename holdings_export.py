@@ -0,0 +1,138 @@
+"""
+Streaming CSV / JSON exports of the asset tables.
+
+Rows are read one page at a time (keyset pagination on id, so deep pages
+cost the same as the first) and encoded as they arrive, so an export of
+years of import_date history runs in constant memory and the download
+starts with the first page. gzip compresses the stream incrementally.
+
+    chunks = export_chunks("equity_holdings", user_id, "csv", member_id=..., gzip=True)
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+
+from supabase_client import get_supabase
+from supabase_writer import ASSET_TABLES, SUPABASE_BATCH_SIZE
+
+EXPORT_FORMATS = ("csv", "json")
+
+# Report category names used by reports.js -> table
+TABLE_ALIASES = {
+    "equity": "equity_holdings",
+    "mutualFunds": "mutual_fund_holdings",
+    "fixedDeposits": "fixed_deposits",
+    "insurance": "insurance_policies",
+    "gold": "gold_holdings",
+    "bankAccounts": "bank_accounts",
+    "others": "other_assets",
+}
+
+# table -> column the "broker" filter applies to
+BROKER_COLUMNS = {
+    "equity_holdings": "broker_platform",
+    "mutual_fund_holdings": "broker_platform",
+    "fixed_deposits": "bank_name",
+    "insurance_policies": "insurance_company",
+    "gold_holdings": "platform",
+    "bank_accounts": "bank_name",
+}
+
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "json": "application/json"}
+
+
+def resolve_table(name):
+    """Map a table or report category name to an asset table, or raise ValueError."""
+    table = TABLE_ALIASES.get(name, name)
+    if table not in ASSET_TABLES:
+        raise ValueError(f"Unknown table: {name}")
+    return table
+
+
+def iter_rows(table, user_id, member_id=None, broker=None, start=None, end=None, columns="*"):
+    """Yield pages (lists of rows) of table for user_id, oldest id first."""
+    broker_col = BROKER_COLUMNS.get(table)
+    if broker and not broker_col:
+        raise ValueError(f"{table} has no broker column to filter on")
+
+    last_id = None
+    while True:
+        query = get_supabase().table(table).select(columns).eq("user_id", user_id)
+        if member_id:
+            query = query.eq("member_id", member_id)
+        if broker:
+            query = query.eq(broker_col, broker)
+        if start:
+            query = query.gte("import_date", start)
+        if end:
+            query = query.lte("import_date", end)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        page = query.order("id").limit(SUPABASE_BATCH_SIZE).execute().data or []
+        if page:
+            yield page
+        if len(page) < SUPABASE_BATCH_SIZE:
+            return
+        last_id = page[-1]["id"]
+
+
+def _csv_chunks(pages):
+    buf = io.StringIO()
+    writer = None
+    for page in pages:
+        if writer is None:
+            writer = csv.DictWriter(buf, fieldnames=list(page[0]), extrasaction="ignore")
+            writer.writeheader()
+        writer.writerows(page)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+
+
+def _json_chunks(pages, table):
+    header = {"table": table, "generated_at": datetime.utcnow().isoformat()}
+    yield json.dumps(header)[:-1] + ', "rows": ['
+    count = 0
+    for page in pages:
+        body = ",\n".join(json.dumps(row, default=str) for row in page)
+        yield ("," if count else "") + "\n" + body
+        count += len(page)
+    yield f'\n], "count": {count}}}'
+
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(table, user_id, fmt, member_id=None, broker=None, start=None, end=None,
+                  gzip=False):
+    """
+    Generator of encoded export chunks (str, or bytes when gzip).
+
+    The first page is fetched before this returns, so a bad filter or a
+    Supabase error surfaces to the caller instead of mid-download.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    pages = iter_rows(table, user_id, member_id, broker, start, end)
+    first = next(pages, None)
+
+    def all_pages():
+        if first is not None:
+            yield first
+            yield from pages
+
+    chunks = _csv_chunks(all_pages()) if fmt == "csv" else _json_chunks(all_pages(), table)
+    return _gzip_chunks(chunks) if gzip else chunks
+
+
+def export_filename(table, fmt, gzip=False):
+    name = f"{table}_{datetime.utcnow().date().isoformat()}.{fmt}"
+    return name + ".gz" if gzip else name
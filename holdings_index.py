@@ -0,0 +1,181 @@
+"""
+Family-wide exposure per security, merged across brokers and members.
+
+Every equity / mutual fund row of a user is read once (keyset-paged) into a
+compact Holding and dropped into a dict keyed by (kind, Holding.key): one
+hash-join pass, so the same stock held through HDFC, Zerodha and ICICI by
+different members lands in a single Position instead of being matched
+pairwise.
+
+    index = build_index(user_id)
+    for position in index.positions(EQUITY)[:10]:
+        print(position.key, position.current_value, position.brokers)
+
+Equity keys are exchange-normalized trading symbols. Mutual funds key on
+scheme code (scheme name when there is none), so two brokers only merge
+when they report the same code space (both AMFI codes, or both ISINs). Cached per user like the portfolio
+summary: dropped on any importer write, bounded by HOLDINGS_INDEX_TTL.
+"""
+import os
+
+from holdings_columns import EQUITY, MUTUAL_FUND, Holding
+from holdings_export import iter_rows
+from result_cache import ResultCache
+
+HOLDINGS_INDEX_TTL = float(os.getenv("HOLDINGS_INDEX_TTL", "300"))
+
+KIND_TABLES = {
+    EQUITY: "equity_holdings",
+    MUTUAL_FUND: "mutual_fund_holdings",
+}
+
+
+class Position:
+    """All holdings of one security, with running totals."""
+
+    __slots__ = ("kind", "key", "name", "quantity", "invested", "current_value", "legs")
+
+    def __init__(self, kind, key, name):
+        self.kind = kind
+        self.key = key
+        self.name = name
+        self.quantity = 0.0
+        self.invested = 0.0
+        self.current_value = 0.0
+        self.legs = []
+
+    def add(self, holding):
+        self.quantity += holding.quantity
+        self.invested += holding.invested_amount
+        self.current_value += holding.current_value
+        self.legs.append(holding)
+
+    def for_member(self, member_id):
+        """This position narrowed to member_id's legs, or None if they hold none of it."""
+        position = Position(self.kind, self.key, self.name)
+        for h in self.legs:
+            if h.member_id == member_id:
+                position.add(h)
+        return position if position.legs else None
+
+    @property
+    def brokers(self):
+        return sorted({h.broker for h in self.legs})
+
+    @property
+    def members(self):
+        return sorted({h.member_id for h in self.legs if h.member_id})
+
+    def to_dict(self):
+        gain = self.current_value - self.invested
+        by_holder = {}
+        for h in self.legs:
+            part = by_holder.setdefault((h.member_id, h.broker), [0.0, 0.0, 0.0])
+            part[0] += h.quantity
+            part[1] += h.invested_amount
+            part[2] += h.current_value
+        return {
+            "kind": self.kind,
+            "key": self.key,
+            "name": self.name,
+            "quantity": round(self.quantity, 4),
+            "invested": round(self.invested, 2),
+            "current_value": round(self.current_value, 2),
+            "gain": round(gain, 2),
+            "gain_percent": round(gain / self.invested * 100, 2) if self.invested else 0.0,
+            "brokers": self.brokers,
+            "members": self.members,
+            "holdings": [
+                {"member_id": member_id, "broker_platform": broker, "quantity": round(q, 4),
+                 "invested": round(inv, 2), "current_value": round(cur, 2)}
+                for (member_id, broker), (q, inv, cur) in by_holder.items()
+            ],
+        }
+
+
+class ConsolidationIndex:
+    """(kind, key) -> Position over any number of Holdings."""
+
+    def __init__(self, holdings=()):
+        self._positions = {}
+        self.holdings = 0
+        self.extend(holdings)
+
+    def add(self, holding):
+        index_key = (holding.kind, holding.key)
+        position = self._positions.get(index_key)
+        if position is None:
+            position = self._positions[index_key] = Position(holding.kind, index_key[1], holding.name)
+        position.add(holding)
+        self.holdings += 1
+
+    def extend(self, holdings):
+        for holding in holdings:
+            self.add(holding)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def get(self, kind, key):
+        return self._positions.get((kind, key))
+
+    def _select(self, kind=None, member_id=None):
+        found = (p for p in self._positions.values() if kind is None or p.kind == kind)
+        if member_id:
+            found = (p.for_member(member_id) for p in found)
+            found = (p for p in found if p is not None)
+        return found
+
+    def positions(self, kind=None, member_id=None):
+        """
+        Positions by current value, largest first; optionally one kind. With
+        member_id, only that member's positions, holding only their legs.
+        """
+        return sorted(self._select(kind, member_id), key=lambda p: p.current_value, reverse=True)
+
+    def totals(self, kind=None, member_id=None):
+        """Rollup of positions(kind, member_id)."""
+        positions = list(self._select(kind, member_id))
+        invested = sum(p.invested for p in positions)
+        current = sum(p.current_value for p in positions)
+        return {
+            "positions": len(positions),
+            "invested": round(invested, 2),
+            "current_value": round(current, 2),
+            "gain": round(current - invested, 2),
+            "multi_broker": sum(1 for p in positions if len(p.brokers) > 1),
+            "multi_member": sum(1 for p in positions if len(p.members) > 1),
+        }
+
+
+def load_holdings(user_id, kinds=None):
+    """Yield a Holding for every equity / mutual fund row of user_id."""
+    for kind in kinds or KIND_TABLES:
+        for page in iter_rows(KIND_TABLES[kind], user_id):
+            for row in page:
+                yield Holding.from_row(kind, row)
+
+
+def build_index(user_id, kinds=None):
+    """ConsolidationIndex over all of user_id's equity / mutual fund holdings (uncached)."""
+    return ConsolidationIndex(load_holdings(user_id, kinds))
+
+
+# -----------------------------
+# Per-user cache
+# -----------------------------
+
+_cache = ResultCache(HOLDINGS_INDEX_TTL, tables=KIND_TABLES.values())
+
+
+def invalidate(user_id=None):
+    _cache.invalidate(user_id)
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def get_index(user_id):
+    """Cached ConsolidationIndex for user_id; returns (index, cached)."""
+    return _cache.get(user_id, lambda: build_index(user_id))
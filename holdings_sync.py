@@ -0,0 +1,153 @@
+"""
+Broker-neutral incremental sync of holdings rows to Supabase.
+
+Every broker import (hdfc_investright, zerodha_integration) builds fresh
+records and hands them to sync_holdings_incremental, which reads the
+existing rows for the (user, broker, member) match, diffs them by natural
+key and writes only what changed through BulkWriter:
+
+    sync_holdings_incremental("equity_holdings", records, match, EQUITY_KEY_FIELDS)
+
+record_networth_snapshot rolls the imported totals into the net worth series.
+"""
+import logging
+import math
+
+import metrics
+from holdings_columns import MUTUAL_FUND, consolidation_key
+from supabase_client import get_supabase
+from supabase_writer import SUPABASE_BATCH_SIZE, BulkWriter
+
+logger = logging.getLogger(__name__)
+
+# Page size for reading existing rows (writes are chunked by BulkWriter)
+BATCH_SIZE = SUPABASE_BATCH_SIZE
+
+# Natural keys identifying a holding within one (user, broker, member). An
+# MF row without a scheme code is keyed on its scheme name instead (see
+# _natural_key), so codeless schemes in one folio stay separate holdings.
+EQUITY_KEY_FIELDS = ("member_id", "broker_platform", "symbol")
+MF_KEY_FIELDS = ("scheme_code", "folio_number")
+
+# Columns that never count as a change on their own
+_DIFF_IGNORED_FIELDS = {"import_date"}
+
+
+def select_all(table, match, columns="*"):
+    """Read every row matching `match`, paging past PostgREST's row cap."""
+    rows = []
+    start = 0
+    while True:
+        with metrics.span(metrics.SUPABASE_OP_SECONDS, table=table, op="select"):
+            resp = (get_supabase().table(table).select(columns).match(match)
+                    .order("id").range(start, start + BATCH_SIZE - 1).execute())
+        page = resp.data or []
+        rows.extend(page)
+        if len(page) < BATCH_SIZE:
+            return rows
+        start += BATCH_SIZE
+
+
+def _natural_key(row, key_fields):
+    key = tuple(str(row.get(f) or "") for f in key_fields)
+    if "scheme_code" in key_fields and not row.get("scheme_code"):
+        i = key_fields.index("scheme_code")
+        key = key[:i] + (consolidation_key(MUTUAL_FUND, "", row.get("scheme_name")),) + key[i + 1:]
+    return key
+
+
+def _same_value(old, new):
+    if old == new:
+        return True
+    try:
+        return math.isclose(float(old), float(new), rel_tol=1e-9, abs_tol=1e-6)
+    except (TypeError, ValueError):
+        return str(old or "") == str(new or "")
+
+
+def _row_changed(existing, record):
+    return any(
+        not _same_value(existing.get(field), value)
+        for field, value in record.items()
+        if field not in _DIFF_IGNORED_FIELDS
+    )
+
+
+def diff_holdings(existing_rows, records, key_fields):
+    """
+    Compare freshly built records against existing rows by natural key.
+
+    Returns (inserts, updates, delete_ids, unchanged_count). Updates carry the
+    existing row "id" so they can be written with an upsert. If the payload
+    repeats a key, the last record wins; duplicate existing rows for one key
+    are all but one deleted.
+    """
+    existing_by_key = {}
+    delete_ids = []
+    for row in existing_rows:
+        key = _natural_key(row, key_fields)
+        if key in existing_by_key:
+            delete_ids.append(row["id"])
+        else:
+            existing_by_key[key] = row
+
+    incoming = {}
+    for record in records:
+        incoming[_natural_key(record, key_fields)] = record
+
+    inserts, updates = [], []
+    unchanged = 0
+    for key, record in incoming.items():
+        existing = existing_by_key.pop(key, None)
+        if existing is None:
+            inserts.append(record)
+        elif _row_changed(existing, record):
+            updates.append({**record, "id": existing["id"]})
+        else:
+            unchanged += 1
+
+    delete_ids.extend(row["id"] for row in existing_by_key.values())
+    return inserts, updates, delete_ids, unchanged
+
+
+def sync_holdings_incremental(table, records, match, key_fields):
+    """
+    Bring `table` rows matching `match` in line with `records`, writing only
+    the rows that changed. Returns inserted/updated/deleted/unchanged counts
+    plus the per-chunk write reports under "writes".
+    """
+    existing = select_all(table, match)
+    inserts, updates, delete_ids, unchanged = diff_holdings(existing, records, key_fields)
+
+    logger.info("🔍 %s: %d new, %d changed, %d removed, %d unchanged",
+                table, len(inserts), len(updates), len(delete_ids), unchanged)
+
+    # Deletes go last so the table never looks emptier than the new state
+    writer = BulkWriter(get_supabase())
+    writes = [
+        writer.upsert(table, updates),
+        writer.insert(table, inserts),
+        writer.delete_ids(table, delete_ids),
+    ]
+
+    return {
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "deleted": len(delete_ids),
+        "unchanged": unchanged,
+        "writes": [w.to_dict() for w in writes if w.rows]
+    }
+
+
+# -----------------------------
+# Net worth snapshot hook
+# -----------------------------
+
+def record_networth_snapshot(user_id, import_date=None,
+                             tables=("equity_holdings", "mutual_fund_holdings")):
+    """Roll the totals of `tables` into import_date's (default today's) net worth snapshot; never raises."""
+    try:
+        from networth_series import record_snapshot
+        record_snapshot(user_id, tables=tables, day=import_date)
+    except Exception as e:
+        logger.warning("⚠️ Net worth snapshot failed for %s: %s", user_id, e)
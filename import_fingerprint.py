@@ -0,0 +1,101 @@
+"""
+Content fingerprints of imported holdings, per (user, member, broker).
+
+A broker callback that fires twice (HDFC redirect replays, browser
+refreshes) usually carries exactly the same holdings. Importers hash the
+normalized records for each member and compare against the hash stored at
+the last successful import; an unchanged member skips its Supabase writes
+and reports the previous import summary instead.
+
+    fp = fingerprint(equity_records)
+    previous = unchanged(user_id, member_id, broker, fp, table, match)
+    if previous is None:
+        summary = sync_holdings_incremental(...)
+        remember(user_id, member_id, broker, fp, summary)
+
+Hashes live in token_store (shared by every worker on the instance) for
+IMPORT_FINGERPRINT_TTL seconds. Before trusting a stored hash the table's
+row count for the member is checked, so rows deleted behind the importer's
+back (frontend, SQL console) still get re-imported.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import metrics
+import token_store
+from supabase_client import get_supabase
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FINGERPRINT_TTL = int(os.getenv("IMPORT_FINGERPRINT_TTL", str(24 * 3600)))
+# Set to 0 to always write
+IMPORT_FINGERPRINT_ENABLED = os.getenv("IMPORT_FINGERPRINT_ENABLED", "1") != "0"
+
+# Per-import bookkeeping that says nothing about the holdings themselves
+_VOLATILE_FIELDS = {"import_date", "id", "created_at"}
+
+
+def fingerprint(records):
+    """Stable SHA-256 of records, independent of record order and import date."""
+    lines = sorted(
+        json.dumps({k: v for k, v in r.items() if k not in _VOLATILE_FIELDS},
+                   sort_keys=True, separators=(",", ":"), default=str)
+        for r in records
+    )
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(line.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def _key(user_id, member_id, broker):
+    return token_store.user_key(user_id, f"import_fingerprint:{broker}:{member_id}")
+
+
+def _row_count(table, match):
+    """Rows matching match, or None when the backend does not report a count."""
+    with metrics.span(metrics.SUPABASE_OP_SECONDS, table=table, op="count"):
+        resp = get_supabase().table(table).select("id", count="exact").match(match).limit(1).execute()
+    return getattr(resp, "count", None)
+
+
+def unchanged(user_id, member_id, broker, fp, table=None, match=None):
+    """
+    The stored entry ({"fingerprint", "summary", "rows", "day", "at"}) when
+    fp matches the last import for (user, member, broker) and the table still
+    holds that import's rows; otherwise None.
+    """
+    if not IMPORT_FINGERPRINT_ENABLED:
+        return None
+    entry = token_store.get_store().get(_key(user_id, member_id, broker))
+    if not entry or entry.get("fingerprint") != fp:
+        return None
+    if table and match is not None:
+        count = _row_count(table, match)
+        if count is not None and count != entry.get("rows"):
+            logger.info("♻️ %s for %s/%s has %d rows, expected %s; re-importing unchanged payload",
+                        table, broker, member_id, count, entry.get("rows"))
+            return None
+    return entry
+
+
+def remember(user_id, member_id, broker, fp, summary, rows):
+    """Record fp as the last successful import for (user, member, broker)."""
+    if not IMPORT_FINGERPRINT_ENABLED:
+        return
+    now = datetime.utcnow()
+    token_store.get_store().set(_key(user_id, member_id, broker), {
+        "fingerprint": fp,
+        "summary": summary,
+        "rows": rows,
+        "day": now.date().isoformat(),
+        "at": now.isoformat(),
+    }, IMPORT_FINGERPRINT_TTL)
+
+
+def forget(user_id, member_id, broker):
+    token_store.get_store().delete(_key(user_id, member_id, broker))
@@ -0,0 +1,195 @@
+"""
+Background import jobs.
+
+The HDFC callback hands the fetched holdings to an ImportJobQueue and
+redirects straight away; a small thread pool runs process_holdings_success
+and the frontend polls /api/hdfc/import/<job_id> for the outcome.
+
+Jobs are idempotent per (user, broker, idempotency key): the job id is
+derived from that triple, so a repeated callback returns the existing
+queued, running or finished job instead of importing again. Only a failed
+job is re-run. Without a key the day stands in for it, allowing one
+import per (user, broker, day).
+
+A job runs in the gunicorn worker that accepted the callback, but every
+state change is also published to token_store (shared by the workers on
+the instance), so a poll answered by another worker still finds it and a
+repeated callback landing on another worker is still deduplicated.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import token_store
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+
+# Finished jobs are forgotten after this long
+JOB_RETENTION = timedelta(days=int(os.getenv("IMPORT_JOB_RETENTION_DAYS", "2")))
+
+
+def job_id_for(user_id, broker, key):
+    """Stable id for the one import allowed per (user, broker, key)."""
+    raw = f"{user_id}|{broker}|{key}".encode()
+    return hashlib.sha256(raw).hexdigest()[:24]
+
+
+def _status_key(job_id):
+    return f"import_job:{job_id}"
+
+
+def _parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+class ImportJob:
+    def __init__(self, job_id, user_id, broker, day):
+        self.id = job_id
+        self.user_id = user_id
+        self.broker = broker
+        self.day = day
+        self.status = QUEUED
+        self.counts = None
+        self.error = None
+        self.queued_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Snapshot of a job published by another worker."""
+        job = cls(data["job_id"], None, data["broker"], data["day"])
+        job.status = data["status"]
+        job.counts = data["counts"]
+        job.error = data["error"]
+        job.queued_at = _parse_time(data["queued_at"])
+        job.started_at = _parse_time(data["started_at"])
+        job.finished_at = _parse_time(data["finished_at"])
+        return job
+
+    def to_dict(self):
+        def ms(start, end):
+            if start and end:
+                return round((end - start).total_seconds() * 1000, 1)
+            return None
+
+        return {
+            "job_id": self.id,
+            "broker": self.broker,
+            "day": self.day,
+            "status": self.status,
+            "counts": self.counts,
+            "error": self.error,
+            "queued_at": self.queued_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "timings": {
+                "queue_ms": ms(self.queued_at, self.started_at),
+                "run_ms": ms(self.started_at, self.finished_at),
+            },
+        }
+
+
+class ImportJobQueue:
+    def __init__(self, max_workers=None):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or IMPORT_WORKERS,
+            thread_name_prefix="import-job",
+        )
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, broker, fn, *args, idempotency_key=None, **kwargs):
+        """
+        Queue fn(*args, **kwargs) as the import for (user_id, broker,
+        idempotency_key), or today's import when no key is given.
+
+        Returns (job, created). When a non-failed job already exists for the
+        same key it is returned unchanged and fn is not called.
+        """
+        day = datetime.utcnow().date().isoformat()
+        job_id = job_id_for(user_id, broker, idempotency_key or day)
+
+        with self._lock:
+            self._prune()
+            existing = self._jobs.get(job_id) or self._published(job_id)
+            if existing is not None and existing.status != FAILED:
+                return existing, False
+            job = ImportJob(job_id, user_id, broker, day)
+            self._jobs[job_id] = job
+        self._publish(job)
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job, True
+
+    def get(self, job_id):
+        """The job, from this worker or as published by another one; or None."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job or self._published(job_id)
+
+    def _published(self, job_id):
+        try:
+            data = token_store.get_store().get(_status_key(job_id))
+        except Exception as e:
+            logger.warning("⚠️ Could not read import job %s: %s", job_id, e)
+            return None
+        return ImportJob.from_dict(data) if data else None
+
+    def _publish(self, job):
+        try:
+            token_store.get_store().set(
+                _status_key(job.id), job.to_dict(), JOB_RETENTION.total_seconds())
+        except Exception as e:
+            logger.warning("⚠️ Could not publish import job %s: %s", job.id, e)
+
+    def _run(self, job, fn, args, kwargs):
+        job.started_at = datetime.utcnow()
+        job.status = RUNNING
+        self._publish(job)
+        start = time.monotonic()
+        try:
+            job.counts = fn(*args, **kwargs)
+            job.status = DONE
+            logger.info("✅ Import job %s done in %.0f ms", job.id, (time.monotonic() - start) * 1000)
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+            logger.exception("❌ Import job %s failed: %s", job.id, e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._publish(job)
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - JOB_RETENTION
+        stale = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at and job.finished_at < cutoff
+        ]
+        for job_id in stale:
+            del self._jobs[job_id]
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the process-wide ImportJobQueue, creating it on first use."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = ImportJobQueue()
+    return _queue
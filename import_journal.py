@@ -0,0 +1,353 @@
+"""
+Local write-ahead journal for broker imports.
+
+The HDFC callback used to hand the fetched holdings to an in-memory job;
+if Supabase was slow or down the import failed, the holdings were gone and
+the user had to redo the OTP login. Now the callback appends the
+normalized batch to an SQLite journal (WAL, synchronous=FULL) and
+redirects as soon as that commit is on disk. A background JournalFlusher
+in every worker replays pending batches into Supabase:
+
+  - in order per (kind, user): a batch waits while an earlier one for the
+    same user is queued or running
+  - a queued batch is superseded by a newer one for the same (kind, user),
+    since every batch is a full holdings snapshot
+  - failures retry with exponential backoff up to JOURNAL_MAX_ATTEMPTS,
+    then the batch is marked failed and keeps its payload for inspection
+  - a batch left "running" by a dead worker is re-queued after
+    JOURNAL_CLAIM_TIMEOUT
+
+Workers claim batches with a conditional UPDATE inside BEGIN IMMEDIATE, so
+each batch is replayed by one worker at a time. Batch ids are import job
+ids (import_jobs.job_id_for), so /api/hdfc/import/<job_id> reports the
+journal status, and appending an id that already exists returns the
+existing batch unless it failed.
+
+The journal lives at IMPORT_JOURNAL_PATH (data/ next to the app by
+default; point it at a persistent disk in production, never /tmp) and
+survives worker restarts; IMPORT_JOURNAL=0 falls back to in-memory import
+jobs. Nothing is opened at import time: the file and the flusher are
+created by the first journaled import, and gunicorn's post_worker_init
+hook calls resume() so batches pending from before a restart replay
+without waiting for one.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from import_jobs import DONE, FAILED, JOB_RETENTION, QUEUED, RUNNING
+
+logger = logging.getLogger(__name__)
+
+SUPERSEDED = "superseded"
+
+IMPORT_JOURNAL_ENABLED = os.getenv("IMPORT_JOURNAL", "1") != "0"
+IMPORT_JOURNAL_PATH = os.getenv(
+    "IMPORT_JOURNAL_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "import_journal.sqlite3"),
+)
+
+JOURNAL_POLL_INTERVAL = float(os.getenv("JOURNAL_POLL_INTERVAL", "2"))
+JOURNAL_MAX_ATTEMPTS = int(os.getenv("JOURNAL_MAX_ATTEMPTS", "12"))
+JOURNAL_RETRY_BACKOFF = float(os.getenv("JOURNAL_RETRY_BACKOFF", "2"))
+JOURNAL_RETRY_MAX_DELAY = float(os.getenv("JOURNAL_RETRY_MAX_DELAY", "300"))
+# A running batch older than this is assumed orphaned by a dead worker
+JOURNAL_CLAIM_TIMEOUT = float(os.getenv("JOURNAL_CLAIM_TIMEOUT", "900"))
+
+# Seconds between sweeps of finished batches older than JOB_RETENTION
+PRUNE_INTERVAL = 3600
+
+
+# -----------------------------
+# Replay handlers
+# -----------------------------
+
+def _replay_hdfc(payload):
+    from hdfc_investright import import_records
+    return import_records(payload["user_id"], payload["member_ids"], payload["equity"],
+                          payload["mutualFunds"], payload["import_date"])
+
+
+# kind -> fn(payload) -> JSON-serializable import summary
+JOURNAL_HANDLERS = {
+    "hdfc": _replay_hdfc,
+}
+
+
+# -----------------------------
+# Journal
+# -----------------------------
+
+def _iso(ts):
+    return datetime.utcfromtimestamp(ts).isoformat() if ts else None
+
+
+class ImportJournal:
+    """Append-only SQLite journal of import batches; one connection per thread."""
+
+    def __init__(self, path=None):
+        self.path = path or IMPORT_JOURNAL_PATH
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._tx() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " job_id TEXT NOT NULL UNIQUE,"
+                " kind TEXT NOT NULL,"
+                " broker TEXT NOT NULL,"
+                " user_id TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt_at REAL NOT NULL,"
+                " claimed_at REAL,"
+                " result TEXT,"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS batches_status ON batches (status, seq)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # A commit returns only once it is on disk
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _tx(self):
+        """Write transaction holding the database write lock from the start."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def append(self, job_id, kind, broker, user_id, payload):
+        """
+        Durably record a batch; returns (job, created). An existing batch
+        with the same job_id is returned as is unless it failed.
+        """
+        now = time.time()
+        body = json.dumps(payload, separators=(",", ":"), default=str)
+        with self._tx() as conn:
+            row = conn.execute("SELECT status FROM batches WHERE job_id = ?", (job_id,)).fetchone()
+            created = row is None or row[0] == FAILED
+            if created:
+                conn.execute("DELETE FROM batches WHERE job_id = ?", (job_id,))
+                conn.execute(
+                    "INSERT INTO batches (job_id, kind, broker, user_id, payload, status,"
+                    " next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, broker, user_id, body, QUEUED, now, now),
+                )
+        if created:
+            logger.info("📝 Journaled %s import %s for %s (%d bytes)", kind, job_id, user_id, len(body))
+            wake_flusher()
+        return self.get(job_id), created
+
+    def claim(self):
+        """Next replayable batch as (seq, job_id, kind, payload), marked running; or None."""
+        now = time.time()
+        with self._tx() as conn:
+            conn.execute(
+                "UPDATE batches SET status = ?, claimed_at = NULL WHERE status = ? AND claimed_at < ?",
+                (QUEUED, RUNNING, now - JOURNAL_CLAIM_TIMEOUT),
+            )
+            conn.execute(
+                "UPDATE batches SET status = ?, payload = '', finished_at = ?"
+                " WHERE status = ? AND EXISTS (SELECT 1 FROM batches n WHERE n.kind = batches.kind"
+                " AND n.user_id = batches.user_id AND n.seq > batches.seq AND n.status = ?)",
+                (SUPERSEDED, now, QUEUED, QUEUED),
+            )
+            row = conn.execute(
+                "SELECT seq, job_id, kind, payload FROM batches b"
+                " WHERE status = ? AND next_attempt_at <= ? AND NOT EXISTS ("
+                "  SELECT 1 FROM batches p WHERE p.kind = b.kind AND p.user_id = b.user_id"
+                "  AND p.seq < b.seq AND p.status IN (?, ?))"
+                " ORDER BY seq LIMIT 1",
+                (QUEUED, now, QUEUED, RUNNING),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE batches SET status = ?, claimed_at = ?, attempts = attempts + 1 WHERE seq = ?",
+                (RUNNING, now, row[0]),
+            )
+        return row[0], row[1], row[2], json.loads(row[3])
+
+    def complete(self, seq, result):
+        with self._tx() as conn:
+            conn.execute(
+                "UPDATE batches SET status = ?, payload = '', result = ?, error = NULL,"
+                " finished_at = ? WHERE seq = ?",
+                (DONE, json.dumps(result, default=str), time.time(), seq),
+            )
+
+    def fail(self, seq, error, retry=True):
+        """Record a failed replay; re-queue with backoff until JOURNAL_MAX_ATTEMPTS."""
+        now = time.time()
+        with self._tx() as conn:
+            attempts = conn.execute("SELECT attempts FROM batches WHERE seq = ?", (seq,)).fetchone()[0]
+            if retry and attempts < JOURNAL_MAX_ATTEMPTS:
+                delay = min(JOURNAL_RETRY_MAX_DELAY, JOURNAL_RETRY_BACKOFF * (2 ** (attempts - 1)))
+                conn.execute(
+                    "UPDATE batches SET status = ?, error = ?, claimed_at = NULL,"
+                    " next_attempt_at = ? WHERE seq = ?",
+                    (QUEUED, error, now + delay, seq),
+                )
+                return delay
+            conn.execute(
+                "UPDATE batches SET status = ?, error = ?, finished_at = ? WHERE seq = ?",
+                (FAILED, error, now, seq),
+            )
+            return None
+
+    def get(self, job_id):
+        """Batch status in the shape of ImportJob.to_dict(), or None."""
+        row = self._conn().execute(
+            "SELECT job_id, broker, status, attempts, result, error, created_at, claimed_at,"
+            " finished_at, next_attempt_at FROM batches WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job_id, broker, status, attempts, result, error, created, claimed, finished, next_at = row
+
+        def ms(start, end):
+            return round((end - start) * 1000, 1) if start and end else None
+
+        return {
+            "job_id": job_id,
+            "broker": broker,
+            "day": _iso(created)[:10],
+            "status": status,
+            "counts": json.loads(result) if result else None,
+            "error": error,
+            "attempts": attempts,
+            "next_attempt_at": _iso(next_at) if status == QUEUED and attempts else None,
+            "queued_at": _iso(created),
+            "started_at": _iso(claimed),
+            "finished_at": _iso(finished),
+            "timings": {
+                "queue_ms": ms(created, claimed),
+                "run_ms": ms(claimed, finished),
+            },
+        }
+
+    def stats(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM batches GROUP BY status").fetchall()
+        return dict(rows)
+
+    def prune(self):
+        """Drop finished batches older than JOB_RETENTION; failed ones are kept."""
+        cutoff = time.time() - JOB_RETENTION.total_seconds()
+        with self._tx() as conn:
+            conn.execute(
+                "DELETE FROM batches WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, SUPERSEDED, cutoff),
+            )
+
+
+# -----------------------------
+# Background flusher
+# -----------------------------
+
+class JournalFlusher(threading.Thread):
+    """Replays journaled batches into Supabase, oldest first."""
+
+    def __init__(self, journal):
+        super().__init__(name="import-journal-flusher", daemon=True)
+        self.journal = journal
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._last_prune = 0.0
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                batch = self.journal.claim()
+            except sqlite3.Error as e:
+                logger.warning("⚠️ Import journal claim failed: %s", e)
+                batch = None
+            if batch is not None:
+                self._replay(*batch)
+                continue
+            if time.time() - self._last_prune > PRUNE_INTERVAL:
+                self._last_prune = time.time()
+                try:
+                    self.journal.prune()
+                except sqlite3.Error as e:
+                    logger.warning("⚠️ Import journal prune failed: %s", e)
+            self._wake.wait(JOURNAL_POLL_INTERVAL)
+            self._wake.clear()
+
+    def _replay(self, seq, job_id, kind, payload):
+        handler = JOURNAL_HANDLERS.get(kind)
+        if handler is None:
+            self.journal.fail(seq, f"No journal handler for {kind}", retry=False)
+            return
+        start = time.monotonic()
+        try:
+            result = handler(payload)
+        except Exception as e:
+            delay = self.journal.fail(seq, str(e))
+            if delay is None:
+                logger.exception("❌ Journaled import %s failed for good: %s", job_id, e)
+            else:
+                logger.warning("🔁 Journaled import %s failed (%s); retrying in %.1fs", job_id, e, delay)
+            return
+        self.journal.complete(seq, result)
+        logger.info("✅ Journaled import %s replayed in %.0f ms", job_id, (time.monotonic() - start) * 1000)
+
+
+_journal = None
+_flusher = None
+_journal_lock = threading.Lock()
+
+
+def get_journal(create=True):
+    """
+    Return the process-wide ImportJournal, starting its flusher on first
+    use. With create=False, None while no journal file exists yet.
+    """
+    global _journal, _flusher
+    if _journal is None:
+        if not create and not os.path.exists(IMPORT_JOURNAL_PATH):
+            return None
+        with _journal_lock:
+            if _journal is None:
+                journal = ImportJournal()
+                _flusher = JournalFlusher(journal)
+                _flusher.start()
+                _journal = journal
+    return _journal
+
+
+def resume():
+    """Start replaying an existing journal in this worker; never creates one."""
+    if IMPORT_JOURNAL_ENABLED:
+        get_journal(create=False)
+
+
+def wake_flusher():
+    if _flusher is not None:
+        _flusher.wake()
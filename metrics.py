@@ -0,0 +1,238 @@
+"""
+Lightweight timing spans, Prometheus metrics and safe payload logging.
+
+    with metrics.span(metrics.HDFC_REQUEST_SECONDS, endpoint="login", method="GET") as s:
+        resp = ...
+        s["outcome"] = str(resp.status_code)
+
+A span records its duration in a latency histogram and counts errors;
+render() returns every metric in Prometheus text format for /api/metrics.
+
+Payloads (URLs, params, bodies) go through log_payload(), which samples
+PAYLOAD_LOG_SAMPLE of calls, masks secrets (tokens, passwords, OTPs, API
+keys), caps the text at PAYLOAD_LOG_MAX_CHARS and hands it to a queue so
+the request thread never waits on log I/O.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+PAYLOAD_LOG_SAMPLE = float(os.getenv("PAYLOAD_LOG_SAMPLE", "0.05"))
+PAYLOAD_LOG_MAX_CHARS = int(os.getenv("PAYLOAD_LOG_MAX_CHARS", "512"))
+
+# Seconds; covers fast cache hits through the 30s HDFC read timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# -----------------------------
+# Metric types
+# -----------------------------
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _label_str(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        names = self.labelnames + ("le",)
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_label_str(names, key + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_label_str(names, key + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def _register(metric):
+    with _registry_lock:
+        _registry.append(metric)
+    return metric
+
+
+def counter(name, help, labelnames=()):
+    return _register(Counter(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(name, help, labelnames, buckets))
+
+
+def render():
+    """Every registered metric in Prometheus text exposition format."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for m in metrics:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        lines.extend(m.samples())
+    return "\n".join(lines) + "\n"
+
+
+# -----------------------------
+# Metrics used across the app
+# -----------------------------
+
+HDFC_REQUEST_SECONDS = histogram(
+    "hdfc_request_seconds", "HDFC InvestRight API call latency",
+    ("endpoint", "method", "outcome"))
+HDFC_CIRCUIT_REJECTED = counter(
+    "hdfc_circuit_rejected_total", "HDFC calls refused by an open circuit breaker",
+    ("endpoint",))
+ZERODHA_REQUEST_SECONDS = histogram(
+    "zerodha_request_seconds", "Kite Connect API call latency", ("endpoint", "method", "outcome"))
+SUPABASE_OP_SECONDS = histogram(
+    "supabase_op_seconds", "Supabase operation latency", ("table", "op", "outcome"))
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_seconds", "Flask route latency", ("route", "method", "status"))
+SPAN_ERRORS = counter(
+    "span_errors_total", "Spans that ended with an exception", ("metric", "error"))
+
+
+@contextmanager
+def span(metric, **labels):
+    """
+    Time the block into `metric`. The yielded dict holds the labels; set
+    labels["outcome"] (or any other label) inside the block. On an
+    exception the outcome defaults to the exception class name.
+    """
+    labels.setdefault("outcome", "ok")
+    start = time.perf_counter()
+    try:
+        yield labels
+    except BaseException as e:
+        if labels["outcome"] == "ok":
+            labels["outcome"] = type(e).__name__
+        SPAN_ERRORS.inc(metric=metric.name, error=type(e).__name__)
+        raise
+    finally:
+        metric.observe(time.perf_counter() - start, **labels)
+
+
+# -----------------------------
+# Sampled, redacted payload logging
+# -----------------------------
+
+SECRET_KEYS = re.compile(
+    r"(pass(word)?|secret|token|authori[sz]ation|api[_-]?key|otp|answer|cookie)", re.I)
+_SECRET_IN_TEXT = re.compile(
+    r"""(?ix)
+    (bearer\s+)[\w\-.~+/=]+                                   # Authorization: Bearer <token>
+    | ((?:pass(?:word)?|secret|token(?:_?id)?|request_?token|access_?token|api_?key|otp|answer)
+       ["']?\s*[:=]\s*["']?)[^"'&,\s}]+                       # key=value / "key": "value"
+    """)
+MASK = "***"
+
+_payload_logger = logging.getLogger("payloads")
+_payload_logger.propagate = False
+_payload_queue = queue.SimpleQueue()
+_payload_logger.addHandler(logging.handlers.QueueHandler(_payload_queue))
+_payload_logger.setLevel(logging.INFO)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def redact(value):
+    """Copy of value with secret-looking dict keys and inline tokens masked."""
+    if isinstance(value, dict):
+        return {
+            k: (MASK if isinstance(k, str) and SECRET_KEYS.search(k) and v else redact(v))
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str):
+        return _SECRET_IN_TEXT.sub(lambda m: (m.group(1) or m.group(2)) + MASK, value)
+    return value
+
+
+def _start_listener():
+    global _listener
+    if _listener is None:
+        with _listener_lock:
+            if _listener is None:
+                handler = logging.StreamHandler()
+                handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+                _listener = logging.handlers.QueueListener(_payload_queue, handler)
+                _listener.start()
+
+
+def log_payload(label, payload=None, sample=None):
+    """Log a redacted, size-capped payload for a sampled fraction of calls."""
+    rate = PAYLOAD_LOG_SAMPLE if sample is None else sample
+    if rate <= 0 or random.random() >= rate:
+        return
+    _start_listener()
+    if isinstance(payload, (dict, list, tuple)):
+        text = json.dumps(redact(payload), default=str)
+    else:
+        text = redact("" if payload is None else str(payload))
+    if len(text) > PAYLOAD_LOG_MAX_CHARS:
+        text = f"{text[:PAYLOAD_LOG_MAX_CHARS]}... [{len(text)} chars]"
+    _payload_logger.info("%s %s", label, text)
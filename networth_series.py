@@ -0,0 +1,200 @@
+"""
+Net worth time series per family member and asset table.
+
+Every import ends with record_snapshot(), which re-totals only the tables
+the import touched and copies the other tables forward from the previous
+snapshot, so each snapshot_date in net_worth_snapshots is a complete picture
+of that day. History is never rescanned: a chart reads the snapshot rows in
+its range and downsamples them (daily / weekly / monthly) in one pass.
+
+    record_snapshot(user_id, tables=("equity_holdings",))
+    get_series(user_id, "2024-01-01", "2025-12-31", interval="monthly")
+"""
+import calendar
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+from portfolio_summary import ASSET_VALUE_COLUMNS, member_table_totals
+from result_cache import ResultCache
+from supabase_client import get_supabase
+from supabase_writer import SUPABASE_BATCH_SIZE, BulkWriter
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TABLE = "net_worth_snapshots"
+SNAPSHOT_CONFLICT = "user_id,member_id,asset_table,snapshot_date"
+INTERVALS = ("daily", "weekly", "monthly")
+
+NETWORTH_SERIES_TTL = float(os.getenv("NETWORTH_SERIES_TTL", "300"))
+NETWORTH_SERIES_MAX = int(os.getenv("NETWORTH_SERIES_MAX", "128"))
+
+_cache = ResultCache(NETWORTH_SERIES_TTL, NETWORTH_SERIES_MAX, tables=(SNAPSHOT_TABLE,))
+
+
+def invalidate():
+    _cache.invalidate()
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+# -----------------------------
+# Writing snapshots
+# -----------------------------
+
+def _latest_snapshot_date(user_id, on_or_before):
+    resp = (get_supabase().table(SNAPSHOT_TABLE).select("snapshot_date")
+            .eq("user_id", user_id).lte("snapshot_date", on_or_before.isoformat())
+            .order("snapshot_date", desc=True).limit(1).execute())
+    rows = resp.data or []
+    return _as_date(rows[0]["snapshot_date"]) if rows else None
+
+
+def _snapshot_rows(user_id, start, end, member_id=None,
+                   columns="snapshot_date,member_id,asset_table,invested,current_value,holdings"):
+    """Paged read of snapshot rows with start <= snapshot_date <= end."""
+    offset = 0
+    while True:
+        query = (get_supabase().table(SNAPSHOT_TABLE).select(columns).eq("user_id", user_id)
+                 .gte("snapshot_date", start.isoformat()).lte("snapshot_date", end.isoformat()))
+        if member_id:
+            query = query.eq("member_id", member_id)
+        page = (query.order("snapshot_date").order("id")
+                .range(offset, offset + SUPABASE_BATCH_SIZE - 1).execute().data or [])
+        yield from page
+        if len(page) < SUPABASE_BATCH_SIZE:
+            return
+        offset += SUPABASE_BATCH_SIZE
+
+
+def record_snapshot(user_id, tables=None, day=None):
+    """
+    Upsert day's (default today, UTC) snapshot for user_id.
+
+    Only `tables` are re-totalled from the asset tables; every other table is
+    carried forward from the latest earlier snapshot. The first snapshot for a
+    user totals every table. Returns the WriteReport dict.
+    """
+    day = _as_date(day) if day else datetime.utcnow().date()
+    previous_day = _latest_snapshot_date(user_id, day)
+    tables = tuple(tables or ASSET_VALUE_COLUMNS) if previous_day else tuple(ASSET_VALUE_COLUMNS)
+
+    previous = list(_snapshot_rows(user_id, previous_day, previous_day)) if previous_day else []
+    fresh = member_table_totals(user_id, tables)
+
+    values = {}
+    for row in previous:
+        key = (row["member_id"], row["asset_table"])
+        if row["asset_table"] in tables:
+            # Overwritten below if the member still holds anything there
+            values[key] = (0.0, 0.0, 0)
+        else:
+            values[key] = (row["invested"], row["current_value"], row["holdings"])
+    for key, bucket in fresh.items():
+        values[key] = (bucket["invested"], bucket["current_value"], bucket["holdings"])
+
+    records = [
+        {
+            "user_id": user_id,
+            "member_id": member_id,
+            "asset_table": table,
+            "snapshot_date": day.isoformat(),
+            "invested": round(float(invested or 0), 2),
+            "current_value": round(float(current or 0), 2),
+            "holdings": int(holdings or 0),
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        for (member_id, table), (invested, current, holdings) in values.items()
+        if member_id
+    ]
+    report = BulkWriter(get_supabase()).upsert(SNAPSHOT_TABLE, records, on_conflict=SNAPSHOT_CONFLICT)
+    logger.info("📈 Net worth snapshot %s for %s: %d rows (recomputed %s)",
+                day, user_id, len(records), ", ".join(tables))
+    return report.to_dict()
+
+
+# -----------------------------
+# Range queries
+# -----------------------------
+
+def _period_end(day, interval):
+    if interval == "weekly":
+        return day + timedelta(days=6 - day.weekday())
+    if interval == "monthly":
+        return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+    return day
+
+
+def _sample_dates(start, end, interval):
+    """Last day of every period overlapping [start, end], capped at end."""
+    dates = []
+    day = start
+    while day <= end:
+        period_end = _period_end(day, interval)
+        dates.append(min(period_end, end))
+        day = period_end + timedelta(days=1)
+    return dates
+
+
+def _point(day, tables):
+    invested = sum(t["invested"] for t in tables.values())
+    current = sum(t["current_value"] for t in tables.values())
+    return {
+        "date": day.isoformat(),
+        "invested": round(invested, 2),
+        "current_value": round(current, 2),
+        "gain": round(current - invested, 2),
+        "by_asset_table": {
+            table: {"invested": round(t["invested"], 2), "current_value": round(t["current_value"], 2)}
+            for table, t in sorted(tables.items())
+        },
+    }
+
+
+def compute_series(user_id, start, end, interval="daily", member_id=None):
+    """Downsampled net worth points between start and end (uncached)."""
+    start, end = _as_date(start), _as_date(end)
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    if start > end:
+        raise ValueError("start must not be after end")
+
+    # The snapshot in force on `start` may be older than start
+    first = _latest_snapshot_date(user_id, start) or start
+
+    # snapshot_date -> asset_table -> totals (summed over members)
+    by_day = {}
+    for row in _snapshot_rows(user_id, first, end, member_id):
+        tables = by_day.setdefault(_as_date(row["snapshot_date"]), {})
+        t = tables.setdefault(row["asset_table"], {"invested": 0.0, "current_value": 0.0})
+        t["invested"] += float(row.get("invested") or 0)
+        t["current_value"] += float(row.get("current_value") or 0)
+
+    snapshot_days = sorted(by_day)
+    points, i, in_force = [], 0, None
+    for sample in _sample_dates(start, end, interval):
+        while i < len(snapshot_days) and snapshot_days[i] <= sample:
+            in_force = snapshot_days[i]
+            i += 1
+        if in_force is not None:
+            points.append(_point(sample, by_day[in_force]))
+
+    return {
+        "user_id": user_id,
+        "member_id": member_id,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "interval": interval,
+        "snapshots": len(snapshot_days),
+        "points": points,
+    }
+
+
+def get_series(user_id, start, end, interval="daily", member_id=None):
+    """Cached compute_series; returns (series, cached)."""
+    key = (user_id, str(start), str(end), interval, member_id)
+    return _cache.get(key, lambda: compute_series(user_id, start, end, interval, member_id))
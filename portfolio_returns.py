@@ -0,0 +1,280 @@
+"""
+XIRR, CAGR and absolute returns per holding, member and asset class.
+
+The asset tables keep no transaction history, so each holding is modelled
+as two cash flows: its invested_amount going out on the day it was first
+seen (created_at, else import_date) and its current_value coming back on
+the as-of date. Only current values are stored, so the as-of date is
+always today: valuing today's current_value over a shortened past period
+would inflate every rate. A member / asset class / family series is the
+union of its holdings' flows, summed per day. A group's CAGR runs over its oldest
+holding's period; XIRR is the time-weighted figure.
+
+Every series of a request is solved together: flows are packed into
+padded (series x flows) NumPy matrices and xirr_batch runs Newton's method
+on all rows at once, falling back to a vectorized bisection (on log(1+r))
+for rows Newton did not settle. A few thousand holdings solve in
+milliseconds.
+
+Results are memoized per (user, member, day) and dropped whenever
+an importer or revaluation writes one of the tables (add_write_listener).
+
+NumPy is imported inside the functions that use it, as in revaluation, so
+importing this module from app keeps it off worker boot.
+"""
+import math
+import os
+import time
+from datetime import date, datetime
+
+from holdings_export import iter_rows
+from result_cache import ResultCache, to_float
+
+RETURNS_CACHE_TTL = float(os.getenv("RETURNS_CACHE_TTL", "900"))
+RETURNS_CACHE_MAX = int(os.getenv("RETURNS_CACHE_MAX", "256"))
+
+# Asset tables with both a cost and a market value:
+# table -> (invested column, current value column, name column, broker column)
+RETURN_TABLES = {
+    "equity_holdings": ("invested_amount", "current_value", "symbol", "broker_platform"),
+    "mutual_fund_holdings": ("invested_amount", "current_value", "scheme_name", "broker_platform"),
+    "gold_holdings": ("invested_amount", "current_value", "gold_type", "platform"),
+    "other_assets": ("invested_amount", "current_value", "asset_name", None),
+}
+
+DAYS_PER_YEAR = 365.0
+
+# Solver settings; rates are annual, bisection brackets -99.99% .. +999,900 %
+NEWTON_ITERATIONS = 50
+BISECTION_ITERATIONS = 200
+TOLERANCE = 1e-9
+_LOG_LO, _LOG_HI = math.log(1e-4), math.log(1e4)
+
+
+# -----------------------------
+# Batch solver
+# -----------------------------
+
+def _npv(amounts, years, rate):
+    """Value at the as-of date of every row's flows at its rate, and d/d rate."""
+    base = 1.0 + rate[:, None]
+    grown = amounts * base ** years
+    return grown.sum(axis=1), (grown * years / base).sum(axis=1)
+
+
+def xirr_batch(amounts, years, guess=0.1):
+    """
+    Annual internal rate of return of each row of cash flows.
+
+    amounts: (series, flows) array, negative = money in, positive = money
+    out, zero padding allowed. years: same shape, time from each flow to
+    the as-of date in years (>= 0). Returns a (series,) array, NaN where a
+    row has no sign change or no root in range.
+    """
+    import numpy as np
+
+    amounts = np.asarray(amounts, dtype=np.float64)
+    years = np.asarray(years, dtype=np.float64)
+    n = amounts.shape[0]
+    result = np.full(n, np.nan)
+    solvable = (amounts > 0).any(axis=1) & (amounts < 0).any(axis=1)
+    if not solvable.any():
+        return result
+
+    a, y = amounts[solvable], years[solvable]
+    scale = np.abs(a).sum(axis=1)
+    rate = np.full(len(a), guess)
+    done = np.zeros(len(a), dtype=bool)
+
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        for _ in range(NEWTON_ITERATIONS):
+            f, df = _npv(a, y, rate)
+            step = np.where(df != 0, f / df, np.nan)
+            new_rate = rate - step
+            ok = np.isfinite(new_rate) & (new_rate > -1.0)
+            converged = ok & (np.abs(step) <= TOLERANCE * np.maximum(1.0, np.abs(new_rate)))
+            rate = np.where(ok & ~done, new_rate, rate)
+            # Rows that step out of range keep their rate and go to bisection
+            done |= converged
+            if done.all():
+                break
+
+        f, _ = _npv(a, y, rate)
+        settled = done & np.isfinite(rate) & (np.abs(f) <= 1e-6 * np.maximum(scale, 1.0))
+
+        if not settled.all():
+            rest = ~settled
+            ar, yr = a[rest], y[rest]
+            lo = np.full(len(ar), _LOG_LO)
+            hi = np.full(len(ar), _LOG_HI)
+            f_lo, _ = _npv(ar, yr, np.expm1(lo))
+            f_hi, _ = _npv(ar, yr, np.expm1(hi))
+            bracketed = np.isfinite(f_lo) & np.isfinite(f_hi) & (np.sign(f_lo) != np.sign(f_hi))
+            for _ in range(BISECTION_ITERATIONS):
+                mid = (lo + hi) / 2
+                f_mid, _ = _npv(ar, yr, np.expm1(mid))
+                same = np.sign(f_mid) == np.sign(f_lo)
+                lo = np.where(same, mid, lo)
+                f_lo = np.where(same, f_mid, f_lo)
+                hi = np.where(same, hi, mid)
+            rate[rest] = np.where(bracketed, np.expm1((lo + hi) / 2), np.nan)
+
+    result[solvable] = rate
+    return result
+
+
+def _pack(series):
+    """[(amounts, years)] of varying length -> zero-padded (series x flows) arrays."""
+    import numpy as np
+
+    width = max((len(a) for a, _ in series), default=0)
+    amounts = np.zeros((len(series), width))
+    years = np.zeros((len(series), width))
+    for i, (a, y) in enumerate(series):
+        amounts[i, :len(a)] = a
+        years[i, :len(y)] = y
+    return amounts, years
+
+
+# -----------------------------
+# Holdings -> series
+# -----------------------------
+
+def _parse_day(value):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def load_positions(user_id, as_of, member_id=None, tables=None):
+    """
+    Rows of the return tables held on as_of, as
+    (table, id, member_id, name, broker, start_day, invested, current).
+    """
+    positions = []
+    for table in tables or RETURN_TABLES:
+        invested_col, current_col, name_col, broker_col = RETURN_TABLES[table]
+        columns = ["id", "member_id", invested_col, current_col, name_col, "import_date", "created_at"]
+        if broker_col:
+            columns.append(broker_col)
+        for page in iter_rows(table, user_id, member_id=member_id,
+                              columns=",".join(dict.fromkeys(columns))):
+            for row in page:
+                start = _parse_day(row.get("created_at")) or _parse_day(row.get("import_date"))
+                if start is None or start > as_of:
+                    continue
+                positions.append((
+                    table, row.get("id"), row.get("member_id"), row.get(name_col) or "",
+                    (row.get(broker_col) if broker_col else None) or "N/A", start,
+                    to_float(row.get(invested_col)), to_float(row.get(current_col)),
+                ))
+    return positions
+
+
+def _metrics(invested, current, days, rate):
+    gain = current - invested
+    years = days / DAYS_PER_YEAR
+    cagr = None
+    if invested > 0 and current > 0 and years >= 1:
+        cagr = round(((current / invested) ** (1 / years) - 1) * 100, 2)
+    return {
+        "invested": round(invested, 2),
+        "current_value": round(current, 2),
+        "absolute_return": round(gain, 2),
+        "absolute_return_percent": round(gain / invested * 100, 2) if invested else 0.0,
+        "days": int(days),
+        "cagr": cagr,
+        "xirr": round(float(rate) * 100, 2) if math.isfinite(rate) and days > 0 else None,
+    }
+
+
+def compute_returns(user_id, as_of=None, member_id=None, include_holdings=True):
+    """Returns for user_id's holdings (optionally one member) valued today (uncached)."""
+    import numpy as np
+
+    today = datetime.utcnow().date()
+    as_of = as_of or today
+    if as_of != today:
+        raise ValueError("Returns can only be computed as of today; past values are not stored")
+    start = time.perf_counter()
+    positions = load_positions(user_id, as_of, member_id)
+
+    days = np.array([(as_of - p[5]).days for p in positions], dtype=np.float64)
+    invested = np.array([p[6] for p in positions], dtype=np.float64)
+    current = np.array([p[7] for p in positions], dtype=np.float64)
+
+    # Holdings: -invested at start, +current on as_of
+    holding_rates = xirr_batch(
+        np.column_stack([-invested, current]) if positions else np.zeros((0, 2)),
+        np.column_stack([days / DAYS_PER_YEAR, np.zeros(len(positions))])
+        if positions else np.zeros((0, 2)),
+    )
+
+    # Groups: every holding's outflow summed per start day, one inflow on as_of
+    groups = {}
+    for i, (table, _, mid, *_rest) in enumerate(positions):
+        for key in (("total",), ("member", mid), ("asset_class", table), ("member_asset_class", mid, table)):
+            groups.setdefault(key, []).append(i)
+
+    group_keys = list(groups)
+    series = []
+    for key in group_keys:
+        idx = np.array(groups[key])
+        flow_days, inverse = np.unique(days[idx], return_inverse=True)
+        outflows = np.zeros(len(flow_days))
+        np.add.at(outflows, inverse, -invested[idx])
+        series.append((np.append(outflows, current[idx].sum()),
+                       np.append(flow_days / DAYS_PER_YEAR, 0.0)))
+    group_rates = xirr_batch(*_pack(series)) if series else np.zeros(0)
+
+    def group_metrics(key, rate):
+        idx = np.array(groups[key])
+        return _metrics(invested[idx].sum(), current[idx].sum(), days[idx].max(), rate)
+
+    results = {key: group_metrics(key, rate) for key, rate in zip(group_keys, group_rates)}
+    report = {
+        "user_id": user_id,
+        "member_id": member_id,
+        "as_of": as_of.isoformat(),
+        "computed_at": time.time(),
+        "total": results.get(("total",)) or _metrics(0.0, 0.0, 0, math.nan),
+        "by_member": [dict(m, member_id=k[1]) for k, m in results.items() if k[0] == "member"],
+        "by_asset_class": [dict(m, table=k[1]) for k, m in results.items() if k[0] == "asset_class"],
+        "by_member_asset_class": [
+            dict(m, member_id=k[1], table=k[2])
+            for k, m in results.items() if k[0] == "member_asset_class"
+        ],
+    }
+    if include_holdings:
+        report["holdings"] = [
+            dict(_metrics(p[6], p[7], d, r), table=p[0], id=p[1], member_id=p[2],
+                 name=p[3], broker=p[4], since=p[5].isoformat())
+            for p, d, r in zip(positions, days.tolist(), holding_rates.tolist())
+        ]
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return report
+
+
+# -----------------------------
+# Memoization per (user, member, day)
+# -----------------------------
+
+_cache = ResultCache(RETURNS_CACHE_TTL, RETURNS_CACHE_MAX, tables=RETURN_TABLES)
+
+
+def invalidate(user_id=None):
+    _cache.invalidate(user_id)
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def get_returns(user_id, as_of=None, member_id=None, include_holdings=True):
+    """Memoized compute_returns; returns (report, cached)."""
+    as_of = as_of or datetime.utcnow().date()
+    key = (user_id, member_id, as_of.isoformat(), include_holdings)
+    return _cache.get(key, lambda: compute_returns(user_id, as_of, member_id, include_holdings))
@@ -0,0 +1,144 @@
+"""
+Server-side portfolio rollups for /api/portfolio/summary.
+
+Reads only the value columns of each asset table (paged) and sums invested,
+current value and gain per family member, asset table and broker/platform,
+so a dashboard load is one small JSON response instead of full-table reads
+in the browser. Results are cached per user and dropped whenever an
+importer writes through supabase_writer (see add_write_listener);
+PORTFOLIO_SUMMARY_TTL bounds staleness for writes made by other workers.
+
+insurance_policies is left out: sum assured / premiums are not a holding
+value.
+"""
+import os
+import time
+
+from result_cache import ResultCache, to_float
+from supabase_client import get_supabase
+from supabase_writer import SUPABASE_BATCH_SIZE
+
+PORTFOLIO_SUMMARY_TTL = float(os.getenv("PORTFOLIO_SUMMARY_TTL", "300"))
+
+# table -> (invested column, current value column, broker/platform column)
+ASSET_VALUE_COLUMNS = {
+    "equity_holdings": ("invested_amount", "current_value", "broker_platform"),
+    "mutual_fund_holdings": ("invested_amount", "current_value", "broker_platform"),
+    "fixed_deposits": ("principal_amount", "principal_amount", "bank_name"),
+    "gold_holdings": ("invested_amount", "current_value", "platform"),
+    "bank_accounts": ("balance", "balance", "bank_name"),
+    "other_assets": ("invested_amount", "current_value", None),
+}
+
+_cache = ResultCache(PORTFOLIO_SUMMARY_TTL, tables=ASSET_VALUE_COLUMNS)
+
+
+def invalidate(user_id=None):
+    """Drop cached rollups for one user, or for everyone."""
+    _cache.invalidate(user_id)
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def _select_paged(table, columns, user_id):
+    start = 0
+    while True:
+        resp = (get_supabase().table(table).select(columns).eq("user_id", user_id)
+                .order("id").range(start, start + SUPABASE_BATCH_SIZE - 1).execute())
+        page = resp.data or []
+        yield from page
+        if len(page) < SUPABASE_BATCH_SIZE:
+            return
+        start += SUPABASE_BATCH_SIZE
+
+
+def _bucket():
+    return {"invested": 0.0, "current_value": 0.0, "gain": 0.0, "holdings": 0}
+
+
+def _add(bucket, invested, current):
+    bucket["invested"] += invested
+    bucket["current_value"] += current
+    bucket["gain"] += current - invested
+    bucket["holdings"] += 1
+
+
+def _finish(bucket):
+    for field in ("invested", "current_value", "gain"):
+        bucket[field] = round(bucket[field], 2)
+    bucket["gain_percent"] = (
+        round(bucket["gain"] / bucket["invested"] * 100, 2) if bucket["invested"] else 0.0
+    )
+    return bucket
+
+
+def iter_asset_values(user_id, tables=None):
+    """
+    Yield (table, member_id, broker, invested, current_value) for every row
+    of the given asset tables (default: all of ASSET_VALUE_COLUMNS).
+    """
+    for table in tables or ASSET_VALUE_COLUMNS:
+        invested_col, current_col, broker_col = ASSET_VALUE_COLUMNS[table]
+        columns = {"member_id", invested_col, current_col}
+        if broker_col:
+            columns.add(broker_col)
+
+        for row in _select_paged(table, ",".join(sorted(columns)), user_id):
+            yield (
+                table,
+                row.get("member_id"),
+                (row.get(broker_col) if broker_col else None) or "N/A",
+                to_float(row.get(invested_col)),
+                to_float(row.get(current_col)),
+            )
+
+
+def member_table_totals(user_id, tables=None):
+    """{(member_id, table): {"invested", "current_value", "gain", "holdings"}}"""
+    totals = {}
+    for table, member_id, _, invested, current in iter_asset_values(user_id, tables):
+        _add(totals.setdefault((member_id, table), _bucket()), invested, current)
+    return totals
+
+
+def compute_summary(user_id):
+    """Aggregate every asset table for user_id (uncached)."""
+    members = {
+        m["id"]: m.get("name") or "Unknown"
+        for m in get_supabase().table("family_members").select("id,name")
+        .eq("user_id", user_id).execute().data or []
+    }
+
+    total = _bucket()
+    by_member, by_table, by_broker, rows = {}, {}, {}, {}
+
+    for table, member_id, broker, invested, current in iter_asset_values(user_id):
+        _add(total, invested, current)
+        _add(by_member.setdefault(member_id, _bucket()), invested, current)
+        _add(by_table.setdefault(table, _bucket()), invested, current)
+        _add(by_broker.setdefault(broker, _bucket()), invested, current)
+        _add(rows.setdefault((member_id, table, broker), _bucket()), invested, current)
+
+    return {
+        "user_id": user_id,
+        "computed_at": time.time(),
+        "total": _finish(total),
+        "by_member": [
+            dict(_finish(b), member_id=m, member_name=members.get(m, "Unknown"))
+            for m, b in by_member.items()
+        ],
+        "by_asset_table": [dict(_finish(b), table=t) for t, b in by_table.items()],
+        "by_broker": [dict(_finish(b), broker_platform=k) for k, b in by_broker.items()],
+        "rollups": [
+            dict(_finish(b), member_id=m, member_name=members.get(m, "Unknown"),
+                 table=t, broker_platform=k)
+            for (m, t, k), b in rows.items()
+        ],
+    }
+
+
+def get_summary(user_id):
+    """Cached rollups for user_id; recomputed after a write or the TTL."""
+    return _cache.get(user_id, lambda: compute_summary(user_id))
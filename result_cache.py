@@ -0,0 +1,80 @@
+"""
+Per-user memo of computed portfolio results, plus the numeric helper the
+rollups share.
+
+Every cache drops its entries whenever an importer or revaluation writes
+one of its tables through supabase_writer (add_write_listener); the TTL
+bounds staleness for writes made by other workers. Keys are a user id or a
+tuple starting with one, so invalidate(user_id) drops all of that user's
+entries.
+
+    _cache = ResultCache(PORTFOLIO_SUMMARY_TTL, tables=ASSET_VALUE_COLUMNS)
+    summary, cached = _cache.get(user_id, lambda: compute_summary(user_id))
+"""
+import threading
+import time
+
+from supabase_writer import add_write_listener
+
+
+def to_float(value):
+    """value as a float; missing or unparseable values count as 0."""
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ResultCache:
+    def __init__(self, ttl, max_entries=None, tables=()):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.tables = frozenset(tables)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        # Bumped on every invalidation so a result computed across a write is not cached
+        self._generation = 0
+        if self.tables:
+            add_write_listener(self._on_write)
+
+    def _on_write(self, table):
+        if table in self.tables:
+            self.invalidate()
+
+    def invalidate(self, user_id=None):
+        """Drop the cached results of one user, or of everyone."""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries
+                            if k == user_id or (isinstance(k, tuple) and k[0] == user_id)]:
+                    del self._entries[key]
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    def get(self, key, compute):
+        """The cached result for key, else compute(); returns (result, cached)."""
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                self._stats["hits"] += 1
+                return cached[1], True
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        result = compute()
+        with self._lock:
+            if generation == self._generation:
+                full = self.max_entries and len(self._entries) >= self.max_entries
+                if full and key not in self._entries:
+                    # Oldest insertion first
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = (now, result)
+        return result, False
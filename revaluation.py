@@ -0,0 +1,215 @@
+"""
+Intraday revaluation of equity / mutual fund holdings from a price source.
+
+Refreshing current_price / current_value used to need the whole broker
+login + import. revalue() instead reads only the columns it needs for all of
+a user's holdings (every member, every broker), looks up each distinct
+security once in a PriceProvider, recomputes prices and values as NumPy
+vector operations and upserts just the rows whose numbers moved, in
+SUPABASE_BATCH_SIZE chunks through BulkWriter.
+
+    report = revalue(user_id)                              # equity, default provider
+    report = revalue(user_id, kind=MUTUAL_FUND, provider=FilePriceProvider("navs.csv"))
+
+Providers are looked up by name in PRICE_PROVIDERS (REVALUE_PRICE_PROVIDER,
+default "file"; REVALUE_MF_PRICE_PROVIDER for mutual funds, default "amfi",
+see amfi_nav). FilePriceProvider reads REVALUE_PRICE_FILE, a CSV with
+symbol,price columns or a JSON {symbol: price} object, and re-reads it when
+the file changes; it stands in for a market data feed locally.
+"""
+import csv
+import json
+import logging
+import os
+import threading
+import time
+
+from holdings_columns import EQUITY, MUTUAL_FUND, consolidation_key
+from holdings_export import iter_rows
+from holdings_sync import record_networth_snapshot
+from supabase_client import get_supabase
+from supabase_writer import BulkWriter
+
+logger = logging.getLogger(__name__)
+
+REVALUE_PRICE_PROVIDER = os.getenv("REVALUE_PRICE_PROVIDER", "file")
+# Mutual funds default to the AMFI NAV file (amfi_nav)
+REVALUE_MF_PRICE_PROVIDER = os.getenv("REVALUE_MF_PRICE_PROVIDER", "amfi")
+REVALUE_PRICE_FILE = os.getenv("REVALUE_PRICE_FILE", "prices.csv")
+
+# kind -> (table, key column, name column, units column, price column).
+# Upserted rows carry the table's NOT NULL identity columns along with the
+# price columns, so the insert half of the upsert never trips a constraint;
+# values are the ones just read, so only price / value actually change.
+REVALUE_TABLES = {
+    EQUITY: ("equity_holdings", "symbol", "symbol", "quantity", "current_price"),
+    MUTUAL_FUND: ("mutual_fund_holdings", "scheme_code", "scheme_name", "units", "current_nav"),
+}
+_IDENTITY_COLUMNS = ("id", "user_id", "member_id", "broker_platform")
+
+
+# -----------------------------
+# Price providers
+# -----------------------------
+
+class PriceProvider:
+    """Source of latest prices: get_prices(kind, keys) -> {key: price} for keys it knows."""
+
+    name = "base"
+
+    def get_prices(self, kind, keys):
+        raise NotImplementedError
+
+
+class FilePriceProvider(PriceProvider):
+    """Prices from a local CSV (symbol,price) or JSON ({symbol: price}) file."""
+
+    name = "file"
+
+    def __init__(self, path=None):
+        self.path = path or REVALUE_PRICE_FILE
+        self._mtime = None
+        self._raw = {}
+        self._by_kind = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return
+        if self.path.endswith(".json"):
+            with open(self.path) as f:
+                raw = json.load(f)
+        else:
+            with open(self.path, newline="") as f:
+                raw = {
+                    row.get("symbol") or row.get("key") or row.get("scheme_code"): row.get("price")
+                    for row in csv.DictReader(f)
+                }
+        prices = {}
+        for key, price in raw.items():
+            try:
+                prices[key] = float(price)
+            except (TypeError, ValueError):
+                continue
+        self._raw = prices
+        self._by_kind = {}
+        self._mtime = mtime
+
+    def get_prices(self, kind, keys):
+        with self._lock:
+            self._load()
+            by_key = self._by_kind.get(kind)
+            if by_key is None:
+                by_key = self._by_kind[kind] = {
+                    consolidation_key(kind, k): p for k, p in self._raw.items() if k
+                }
+        return {k: by_key[k] for k in keys if k in by_key}
+
+
+def _amfi_provider():
+    from amfi_nav import AmfiNavProvider
+    return AmfiNavProvider()
+
+
+PRICE_PROVIDERS = {
+    "file": FilePriceProvider,
+    "amfi": _amfi_provider,
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name=None, kind=EQUITY):
+    """Return the process-wide provider registered under name, or the kind's default."""
+    name = name or (REVALUE_MF_PRICE_PROVIDER if kind == MUTUAL_FUND else REVALUE_PRICE_PROVIDER)
+    if name not in PRICE_PROVIDERS:
+        raise ValueError(f"Unknown price provider: {name}")
+    provider = _providers.get(name)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = _providers[name] = PRICE_PROVIDERS[name]()
+    return provider
+
+
+# -----------------------------
+# Revaluation
+# -----------------------------
+
+def _read_positions(kind, user_id):
+    """All rows of the kind's table for user_id, as columns."""
+    table, key_col, name_col, units_col, price_col = REVALUE_TABLES[kind]
+    columns = list(dict.fromkeys(_IDENTITY_COLUMNS + (key_col, name_col, units_col, price_col,
+                                                      "current_value")))
+    rows = []
+    for page in iter_rows(table, user_id, columns=",".join(columns)):
+        rows.extend(page)
+    return rows
+
+
+def revalue(user_id, kind=EQUITY, provider=None, record_snapshot=True):
+    """
+    Reprice every holding of one kind for user_id; returns a report with
+    rows read, rows priced, rows written and keys the provider did not know.
+    """
+    import numpy as np
+
+    provider = provider or get_provider(kind=kind)
+    table, key_col, name_col, units_col, price_col = REVALUE_TABLES[kind]
+    start = time.perf_counter()
+
+    rows = _read_positions(kind, user_id)
+    report = {"kind": kind, "table": table, "provider": provider.name, "rows": len(rows),
+              "priced": 0, "changed": 0, "unpriced": [], "writes": None}
+    if not rows:
+        report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return report
+
+    def num(column):
+        return np.array([r.get(column) or 0 for r in rows], dtype=np.float64)
+
+    keys = [consolidation_key(kind, r.get(key_col), r.get(name_col)) for r in rows]
+    # One provider lookup per distinct security, gathered back onto rows
+    unique_keys, inverse = np.unique(np.array(keys, dtype=object), return_inverse=True)
+    quotes = provider.get_prices(kind, unique_keys.tolist())
+    unique_prices = np.array([quotes.get(k, np.nan) for k in unique_keys], dtype=np.float64)
+    price = unique_prices[inverse]
+
+    units = num(units_col)
+    old_price = num(price_col)
+    old_value = num("current_value")
+
+    priced = ~np.isnan(price)
+    new_price = np.where(priced, price, old_price)
+    new_value = units * new_price
+    changed = priced & ~(
+        np.isclose(new_price, old_price, rtol=1e-9, atol=1e-6)
+        & np.isclose(new_value, old_value, rtol=1e-9, atol=1e-6)
+    )
+
+    report["priced"] = int(priced.sum())
+    report["changed"] = int(changed.sum())
+    report["unpriced"] = sorted(k for k, p in zip(unique_keys.tolist(), unique_prices) if np.isnan(p))
+
+    changed_rows = np.flatnonzero(changed)
+    if len(changed_rows):
+        identity = _IDENTITY_COLUMNS + (name_col,) + ((key_col,) if key_col != name_col else ())
+        prices_out = new_price[changed_rows].tolist()
+        values_out = new_value[changed_rows].tolist()
+        updates = [
+            dict({c: rows[i].get(c) for c in identity}, **{price_col: p, "current_value": v})
+            for i, p, v in zip(changed_rows.tolist(), prices_out, values_out)
+        ]
+        report["writes"] = BulkWriter(get_supabase()).upsert(table, updates).to_dict()
+        if record_snapshot:
+            record_networth_snapshot(user_id, tables=(table,))
+
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    logger.info("💹 Revalued %s for %s: %d/%d priced, %d changed, %d unknown securities in %s ms",
+                table, user_id, report["priced"], report["rows"], report["changed"],
+                len(report["unpriced"]), report["elapsed_ms"])
+    return report
+
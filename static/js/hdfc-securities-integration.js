@@ -83,9 +83,6 @@ async function testHDFCConnection() {
             if (lastSyncElement && data.lastSync) {
                 lastSyncElement.textContent = `Last sync: ${new Date(data.lastSync).toLocaleString()}`;
             }
-            if (data.accessToken) {
-                localStorage.setItem('hdfcaccesstoken', data.accessToken);
-            }
         } else {
             if (statusElement) {
                 statusElement.textContent = 'Not connected';
@@ -0,0 +1,49 @@
+/*
+  # Net worth snapshots
+
+  Daily totals per family member and asset table, written by the Python
+  importers at the end of each import (networth_series.record_snapshot).
+  Net worth history is read from here instead of rescanning every asset
+  table's import_date history.
+
+  One row per (user_id, member_id, asset_table, snapshot_date); a later
+  import on the same day overwrites that day's row.
+*/
+
+CREATE TABLE IF NOT EXISTS net_worth_snapshots (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id uuid REFERENCES auth.users(id) ON DELETE CASCADE NOT NULL,
+  member_id uuid REFERENCES family_members(id) ON DELETE CASCADE NOT NULL,
+  asset_table text NOT NULL,
+  snapshot_date date NOT NULL DEFAULT CURRENT_DATE,
+  invested numeric NOT NULL DEFAULT 0,
+  current_value numeric NOT NULL DEFAULT 0,
+  holdings integer NOT NULL DEFAULT 0,
+  updated_at timestamptz DEFAULT now(),
+  CONSTRAINT net_worth_snapshots_unique UNIQUE (user_id, member_id, asset_table, snapshot_date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_networth_user_date ON net_worth_snapshots(user_id, snapshot_date);
+
+ALTER TABLE net_worth_snapshots ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own net worth snapshots"
+  ON net_worth_snapshots FOR SELECT
+  TO authenticated
+  USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own net worth snapshots"
+  ON net_worth_snapshots FOR INSERT
+  TO authenticated
+  WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own net worth snapshots"
+  ON net_worth_snapshots FOR UPDATE
+  TO authenticated
+  USING (auth.uid() = user_id)
+  WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own net worth snapshots"
+  ON net_worth_snapshots FOR DELETE
+  TO authenticated
+  USING (auth.uid() = user_id);
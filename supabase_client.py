@@ -0,0 +1,22 @@
+"""
+Process-wide Supabase client.
+
+Created on first use so importing the app (every gunicorn worker boot)
+doesn't pay for the supabase SDK import or need SUPABASE_URL/SUPABASE_KEY.
+"""
+import os
+import threading
+
+_supabase = None
+_supabase_lock = threading.Lock()
+
+
+def get_supabase():
+    """Return the process-wide Supabase client, creating it on first use."""
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return _supabase
@@ -0,0 +1,194 @@
+"""
+Chunked, concurrent bulk writes to Supabase.
+
+BulkWriter splits a record list into chunks of SUPABASE_BATCH_SIZE rows,
+sends at most SUPABASE_WRITE_CONCURRENCY chunks at a time, retries a failed
+idempotent chunk (upserts on a conflict key, deletes by id) with
+exponential backoff plus jitter, and returns a WriteReport with per-chunk
+latency. Plain inserts are never retried: a request that timed out may
+still have committed, and sending it again would duplicate its rows. Registered write listeners are told which table changed.
+It works for any of the asset tables:
+
+    writer = BulkWriter(get_supabase())
+    report = writer.insert("fixed_deposits", records)
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ASSET_TABLES = (
+    "equity_holdings",
+    "mutual_fund_holdings",
+    "fixed_deposits",
+    "insurance_policies",
+    "gold_holdings",
+    "bank_accounts",
+    "other_assets",
+)
+
+SUPABASE_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "500"))
+SUPABASE_WRITE_CONCURRENCY = int(os.getenv("SUPABASE_WRITE_CONCURRENCY", "4"))
+SUPABASE_WRITE_RETRIES = int(os.getenv("SUPABASE_WRITE_RETRIES", "3"))
+SUPABASE_WRITE_BACKOFF = float(os.getenv("SUPABASE_WRITE_BACKOFF", "0.5"))
+
+
+_write_listeners = []
+
+
+def add_write_listener(fn):
+    """Call fn(table) after every write to a table, e.g. to drop caches."""
+    _write_listeners.append(fn)
+
+
+def notify_write(table):
+    """Tell listeners `table` changed; for writes made outside BulkWriter."""
+    for fn in list(_write_listeners):
+        try:
+            fn(table)
+        except Exception as e:
+            logger.warning("⚠️ Write listener %r failed for %s: %s", fn, table, e)
+
+
+class BulkWriteError(RuntimeError):
+    """Raised once every chunk has been tried, if any chunk still failed."""
+
+    def __init__(self, report):
+        failed = [c for c in report.chunks if c["error"]]
+        super().__init__(
+            f"{len(failed)}/{len(report.chunks)} chunks failed writing {report.table} "
+            f"({report.op}): {failed[0]['error']}"
+        )
+        self.report = report
+
+
+class WriteReport:
+    def __init__(self, table, op, rows):
+        self.table = table
+        self.op = op
+        self.rows = rows
+        self.chunks = []
+        self.elapsed_ms = 0.0
+
+    @property
+    def ok(self):
+        return all(not c["error"] for c in self.chunks)
+
+    def to_dict(self):
+        latencies = sorted(c["ms"] for c in self.chunks)
+        return {
+            "table": self.table,
+            "op": self.op,
+            "rows": self.rows,
+            "chunks": len(self.chunks),
+            "retries": sum(c["attempts"] - 1 for c in self.chunks),
+            "failed_chunks": sum(1 for c in self.chunks if c["error"]),
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "chunk_ms": [round(ms, 1) for ms in latencies],
+            "max_chunk_ms": round(latencies[-1], 1) if latencies else None,
+        }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=SUPABASE_WRITE_CONCURRENCY,
+                    thread_name_prefix="supabase-write",
+                )
+    return _executor
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BulkWriter:
+    def __init__(self, client, chunk_size=None, retries=None, backoff=None):
+        self.client = client
+        self.chunk_size = chunk_size or SUPABASE_BATCH_SIZE
+        self.retries = SUPABASE_WRITE_RETRIES if retries is None else retries
+        self.backoff = SUPABASE_WRITE_BACKOFF if backoff is None else backoff
+
+    def insert(self, table, records):
+        """Insert records; a failed chunk is not retried (see module docstring)."""
+        return self._write(table, "insert", records,
+                           lambda chunk: self.client.table(table).insert(chunk).execute(),
+                           retry=False)
+
+    def upsert(self, table, records, on_conflict=None):
+        """
+        Upsert by primary key (records carry "id"), or by on_conflict columns.
+        Retried only when every chunk is keyed that way; otherwise it is an
+        insert in disguise.
+        """
+        kwargs = {"on_conflict": on_conflict} if on_conflict else {}
+        keyed = bool(on_conflict) or all("id" in r for r in records)
+        return self._write(table, "upsert", records,
+                           lambda chunk: self.client.table(table).upsert(chunk, **kwargs).execute(),
+                           retry=keyed)
+
+    def delete_ids(self, table, ids):
+        return self._write(table, "delete", ids,
+                           lambda chunk: self.client.table(table).delete().in_("id", chunk).execute())
+
+    def _write(self, table, op, items, send, retry=True):
+        report = WriteReport(table, op, len(items))
+        if not items:
+            return report
+
+        start = time.monotonic()
+        futures = [
+            _get_executor().submit(self._send_chunk, send, index, chunk, table, op,
+                                   self.retries if retry else 0)
+            for index, chunk in enumerate(_chunks(items, self.chunk_size))
+        ]
+        report.chunks = [f.result() for f in futures]
+        report.elapsed_ms = (time.monotonic() - start) * 1000
+        notify_write(table)
+
+        summary = report.to_dict()
+        logger.info("📥 %s %s: %d rows in %d chunks, %s ms (slowest chunk %s ms, %d retries)",
+                    op, table, summary["rows"], summary["chunks"], summary["elapsed_ms"],
+                    summary["max_chunk_ms"], summary["retries"])
+        if not report.ok:
+            raise BulkWriteError(report)
+        return report
+
+    def _send_chunk(self, send, index, chunk, table, op, retries):
+        attempt = 0
+        start = time.monotonic()
+        while True:
+            attempt += 1
+            try:
+                with metrics.span(metrics.SUPABASE_OP_SECONDS, table=table, op=op):
+                    send(chunk)
+                error = None
+                break
+            except Exception as e:
+                error = str(e)
+                if attempt > retries:
+                    logger.error("❌ Chunk %d failed after %d attempts: %s", index, attempt, e)
+                    break
+                delay = self.backoff * (2 ** (attempt - 1))
+                time.sleep(delay + random.uniform(0, delay))
+        return {
+            "index": index,
+            "rows": len(chunk),
+            "attempts": attempt,
+            "ms": (time.monotonic() - start) * 1000,
+            "error": error,
+        }
@@ -0,0 +1,288 @@
+"""
+Scheduled background sync of broker holdings for every connected user.
+
+Runs as its own process (see the Procfile "scheduler" entry):
+
+    python sync_scheduler.py            # run every SYNC_INTERVAL seconds
+    python sync_scheduler.py --once     # one run, print the report, exit
+
+Each run finds browser sessions holding a live HDFC or Zerodha access
+token in token_store and refreshes, once per (broker, user) the tokens
+import for, that user's holdings through the broker module
+(hdfc_investright / zerodha_integration) with the newest token, falling
+back to older sessions' tokens on a 401/403. Jobs run on a bounded pool,
+start at a random offset within SYNC_JITTER seconds so users don't all hit
+the broker at once, pass through a per-broker token-bucket rate limit and
+are abandoned after SYNC_JOB_DEADLINE seconds. Each run reports throughput and failures.
+
+The scheduler reads the same token store as the web process, so with the
+sqlite backend both must share TOKEN_STORE_PATH (same instance or a shared
+disk). It refuses to start when the store can't be shared (memory backend,
+or TOKEN_STORE_PATH left at its temp-dir default) rather than run forever
+seeing zero users. Point HDFC_BASE_URL at a local stub to exercise it
+offline.
+"""
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import token_store
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", str(6 * 3600)))
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "4"))
+SYNC_JITTER = float(os.getenv("SYNC_JITTER", "60"))
+SYNC_JOB_DEADLINE = float(os.getenv("SYNC_JOB_DEADLINE", "120"))
+
+# Broker calls per second, and burst size, allowed across all workers
+SYNC_HDFC_RATE = float(os.getenv("SYNC_HDFC_RATE", "1"))
+SYNC_HDFC_BURST = int(os.getenv("SYNC_HDFC_BURST", "2"))
+SYNC_ZERODHA_RATE = float(os.getenv("SYNC_ZERODHA_RATE", "2"))
+SYNC_ZERODHA_BURST = int(os.getenv("SYNC_ZERODHA_BURST", "2"))
+
+# Same key and TTL the web process uses for /api/hdfc/status
+LAST_SYNC_TTL = 30 * 24 * 3600
+
+HDFC_BROKER = "HDFC Securities"
+HDFC_TOKEN_NAME = "hdfc_access_token"
+ZERODHA_BROKER = "Zerodha"
+ZERODHA_TOKEN_NAME = "zerodha_access_token"
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class RateLimiter:
+    """Token bucket shared by every worker syncing the same broker."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Block until a call is allowed; raise DeadlineExceeded if that is past deadline."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait_for > deadline:
+                raise DeadlineExceeded("rate limit wait exceeds job deadline")
+            time.sleep(wait_for)
+
+
+def _check_deadline(deadline, stage):
+    if time.monotonic() > deadline:
+        raise DeadlineExceeded(f"deadline passed before {stage}")
+
+
+# -----------------------------
+# Per-broker sync jobs
+# -----------------------------
+
+def hdfc_users():
+    """[(user_id, [(sid, token), ...] newest first)] for users with a live HDFC token."""
+    return list(token_store.user_session_tokens(HDFC_TOKEN_NAME).items())
+
+
+def zerodha_users():
+    """[(user_id, [(sid, token), ...] newest first)] for users with a live Zerodha token."""
+    return list(token_store.user_session_tokens(ZERODHA_TOKEN_NAME).items())
+
+
+def _fetch_with_sessions(sessions, token_name, fetch, deadline):
+    """
+    fetch(token) with the newest session token, moving on to the next one
+    when a token is rejected (401/403); rejected tokens are deleted so
+    later runs stop trying them.
+    """
+    error = None
+    for sid, access_token in sessions:
+        _check_deadline(deadline, "fetch")
+        try:
+            return fetch(access_token)
+        except Exception as e:
+            status = getattr(getattr(e, "response", None), "status_code", None)
+            if status not in (401, 403):
+                raise
+            token_store.delete_session_token(sid, token_name)
+            error = e
+    raise error
+
+
+def sync_hdfc_user(user_id, sessions, limiter, deadline):
+    """Fetch and import user_id's HDFC holdings; returns the import counts."""
+    import hdfc_investright
+
+    def fetch(access_token):
+        limiter.acquire(deadline)
+        return hdfc_investright.get_holdings(access_token)
+
+    holdings = _fetch_with_sessions(sessions, HDFC_TOKEN_NAME, fetch, deadline)
+    if not isinstance(holdings, dict) or not isinstance(holdings.get("data"), list):
+        raise RuntimeError("unexpected holdings payload")
+
+    _check_deadline(deadline, "import")
+    counts = hdfc_investright.process_holdings_success(
+        holdings["data"], user_id, hdfc_investright.MEMBERS)
+    token_store.get_store().set(token_store.user_key(user_id, "hdfc_last_sync"),
+                                datetime.utcnow().isoformat(), LAST_SYNC_TTL)
+    return counts
+
+
+def sync_zerodha_user(user_id, sessions, limiter, deadline):
+    """Fetch (equity + MF, concurrently) and import user_id's Zerodha holdings."""
+    import zerodha_integration
+
+    def fetch(access_token):
+        # One permit per Kite call; both go out together
+        limiter.acquire(deadline)
+        limiter.acquire(deadline)
+        return zerodha_integration.fetch_holdings(access_token)
+
+    equity, mf_holdings = _fetch_with_sessions(sessions, ZERODHA_TOKEN_NAME, fetch, deadline)
+    _check_deadline(deadline, "import")
+    counts = zerodha_integration.process_holdings_success(equity, mf_holdings, user_id)
+    token_store.get_store().set(token_store.user_key(user_id, "zerodha_last_sync"),
+                                datetime.utcnow().isoformat(), LAST_SYNC_TTL)
+    return counts
+
+
+# broker -> (users to sync, sync function, limiter)
+BROKERS = {
+    HDFC_BROKER: (hdfc_users, sync_hdfc_user, RateLimiter(SYNC_HDFC_RATE, SYNC_HDFC_BURST)),
+    ZERODHA_BROKER: (zerodha_users, sync_zerodha_user,
+                     RateLimiter(SYNC_ZERODHA_RATE, SYNC_ZERODHA_BURST)),
+}
+
+
+# -----------------------------
+# Runs
+# -----------------------------
+
+def _run_job(broker, user, sync, limiter, start_at, job_deadline):
+    delay = start_at - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+    started = time.monotonic()
+    deadline = started + job_deadline
+    user_id, sessions = user
+    # Reports name the user only; session ids are credentials
+    result = {"broker": broker, "user_id": user_id, "ok": False, "error": None}
+    try:
+        result["counts"] = sync(user_id, sessions, limiter, deadline)
+        result["ok"] = True
+    except DeadlineExceeded as e:
+        result["error"] = f"deadline: {e}"
+    except Exception as e:
+        result["error"] = str(e)
+    result["ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+def run_once(workers=None, jitter=None, job_deadline=None, brokers=None):
+    """Sync every connected user once; returns the run report."""
+    workers = workers or SYNC_WORKERS
+    jitter = SYNC_JITTER if jitter is None else jitter
+    job_deadline = job_deadline or SYNC_JOB_DEADLINE
+    brokers = brokers or BROKERS
+
+    started_at = datetime.utcnow().isoformat()
+    run_start = time.monotonic()
+    # One job per (broker, user), however many sessions connected it: two
+    # imports of the same rows at once could both insert a new holding.
+    # Submitted in start-time order, so a worker sleeping until its job's
+    # jittered start never holds up a job due earlier
+    jobs = sorted(
+        ((run_start + random.uniform(0, jitter), broker, user, sync, limiter)
+         for broker, (users, sync, limiter) in brokers.items()
+         for user in users()),
+        key=lambda job: job[0],
+    )
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync")
+    try:
+        futures = {
+            pool.submit(_run_job, broker, user, sync, limiter, start_at, job_deadline):
+                (broker, user[0])
+            for start_at, broker, user, sync, limiter in jobs
+        }
+        # A job that overruns its deadline in a blocking call can't be
+        # killed; stop waiting for it once every job's budget is used up.
+        budget = jitter + job_deadline * (len(jobs) / workers + 1)
+        done, not_done = wait(futures, timeout=budget)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    results = [f.result() for f in done]
+    for f in not_done:
+        broker, user_id = futures[f]
+        results.append({"broker": broker, "user_id": user_id, "ok": False,
+                        "error": "deadline: still running at end of run", "ms": None})
+
+    elapsed = time.monotonic() - run_start
+    failures = [r for r in results if not r["ok"]]
+    report = {
+        "started_at": started_at,
+        "jobs": len(results),
+        "ok": len(results) - len(failures),
+        "failed": len(failures),
+        "timed_out": sum(1 for r in failures if r["error"].startswith("deadline")),
+        "elapsed_s": round(elapsed, 2),
+        "jobs_per_min": round(len(results) / elapsed * 60, 1) if elapsed else None,
+        "by_broker": {
+            broker: {
+                "jobs": sum(1 for r in results if r["broker"] == broker),
+                "failed": sum(1 for r in failures if r["broker"] == broker),
+            }
+            for broker in brokers
+        },
+        "failures": [{k: r[k] for k in ("broker", "user_id", "error")} for r in failures],
+    }
+    logger.info("🔁 Sync run: %d/%d ok, %d failed (%d timed out) in %s s, %s jobs/min",
+                report["ok"], report["jobs"], report["failed"], report["timed_out"],
+                report["elapsed_s"], report["jobs_per_min"])
+    for failure in report["failures"]:
+        logger.warning("  ❌ %s %s: %s", failure["broker"], failure["user_id"], failure["error"])
+    return report
+
+
+def run_forever(interval=None):
+    interval = interval or SYNC_INTERVAL
+    logger.info("⏰ Sync scheduler started: every %.0f s, %d workers", interval, SYNC_WORKERS)
+    while True:
+        started = time.monotonic()
+        try:
+            run_once()
+        except Exception as e:
+            logger.exception("❌ Sync run failed: %s", e)
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background holdings sync")
+    parser.add_argument("--once", action="store_true", help="run once and exit")
+    args = parser.parse_args()
+    reason = token_store.unshared_reason()
+    if reason:
+        raise SystemExit(f"❌ Sync scheduler needs the web process's token store: {reason}. "
+                         f"Set TOKEN_STORE=sqlite and TOKEN_STORE_PATH to a file both processes use.")
+    logging.basicConfig(level=logging.INFO)
+    if args.once:
+        run_once()
+    else:
+        run_forever()
@@ -0,0 +1,12 @@
+"""
+Test setup: the app is a flat set of modules in the repository root.
+
+    python -m pytest -q
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tests never touch a real token store file
+os.environ.setdefault("TOKEN_STORE", "memory")
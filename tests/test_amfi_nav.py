@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pytest
+
+import amfi_nav
+from amfi_nav import AmfiNavProvider, NavIndex, get_index, load_index, parse_nav_file
+from holdings_columns import EQUITY, MUTUAL_FUND
+
+NAV_FILE = (
+    "Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date\r\n"
+    "\r\n"
+    "Open Ended Schemes(Debt Scheme - Banking and PSU Fund)\r\n"
+    "\r\n"
+    "Aditya Birla Sun Life Mutual Fund\r\n"
+    "\r\n"
+    "119551;INF209KA12Z1;INF209KA13Z9;ABSL Banking & PSU Debt Fund - DIRECT - IDCW;105.8453;17-Oct-2025\r\n"
+    "119552;INF209K01YM2;-;ABSL Banking & PSU Debt Fund - Growth;342.1;17-Oct-2025\r\n"
+    "119553;INF209K01YN0;;Suspended scheme;N.A.;01-Jan-2020\r\n"
+    "100027;inf200k01rj1;;Lower-case ISIN;12.5;16-Oct-2025\n"
+    "not;a;data;line\n"
+)
+
+
+@pytest.fixture
+def nav_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(amfi_nav, "_indexes", {})
+    path = tmp_path / "NAVAll.txt"
+    path.write_text(NAV_FILE)
+    return str(path)
+
+
+def test_parse_indexes_code_and_both_isins(nav_path):
+    index = parse_nav_file(nav_path)
+
+    # Headings, blanks, "-", empty ISINs and N.A. NAVs are skipped
+    assert len(index) == 3 + 2 + 2
+    assert list(index.keys) == sorted(index.keys)
+    navs = index.lookup(["119551", "INF209KA12Z1", "INF209KA13Z9", "119552", "INF209K01YM2"])
+    assert navs.tolist() == [105.8453, 105.8453, 105.8453, 342.1, 342.1]
+
+
+def test_lookup_misses_are_nan(nav_path):
+    index = parse_nav_file(nav_path)
+    navs = index.lookup([" inf200k01rj1 ", "119553", "INF209K01YN0", "999999",
+                         "NOT-AN-ISIN-AT-ALL", ""])
+
+    assert navs[0] == 12.5
+    assert np.isnan(navs[1:]).all()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "NAVAll.txt"
+    path.write_text("")
+    index = parse_nav_file(str(path))
+
+    assert len(index) == 0
+    assert np.isnan(index.lookup(["119551"])).all()
+
+
+def test_index_is_persisted_and_rebuilt_when_file_changes(nav_path, monkeypatch):
+    load_index(nav_path)
+    assert os.path.exists(nav_path + ".idx.npz")
+
+    parses = []
+    monkeypatch.setattr(amfi_nav, "parse_nav_file",
+                        lambda path: parses.append(path) or parse_nav_file(path))
+    assert load_index(nav_path).lookup(["119552"]).tolist() == [342.1]
+    assert parses == []
+
+    with open(nav_path, "w") as f:
+        f.write(NAV_FILE.replace(";342.1;17-Oct-2025", ";350.25;18-Oct-2025"))
+    assert load_index(nav_path).lookup(["119552"]).tolist() == [350.25]
+    assert parses == [nav_path]
+
+
+def test_save_and_load_round_trip(nav_path, tmp_path):
+    index = parse_nav_file(nav_path)
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = NavIndex.load(path)
+
+    assert loaded.matches(os.stat(nav_path))
+    assert loaded.keys.tolist() == index.keys.tolist()
+    assert loaded.navs.tolist() == index.navs.tolist()
+
+
+def test_provider_prices_mutual_funds_only(nav_path):
+    provider = AmfiNavProvider(nav_path)
+
+    assert provider.get_prices(MUTUAL_FUND, ["119551", "unknown"]) == {"119551": 105.8453}
+    assert provider.get_prices(EQUITY, ["119551"]) == {}
+    assert get_index(nav_path) is get_index(nav_path)
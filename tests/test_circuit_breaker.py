@@ -0,0 +1,213 @@
+import pytest
+import requests
+
+import circuit_breaker
+import hdfc_investright
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_failure("HTTP 503")
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("t", failure_threshold=3, reset_timeout=30)
+    fail(breaker, 2)
+    breaker.before_call()
+    breaker.record_success()
+    fail(breaker, 2)
+    # A success in between resets the count
+    assert breaker.snapshot()["state"] == CLOSED
+
+    breaker.before_call()
+    breaker.record_failure("HTTP 503")
+    assert breaker.snapshot()["state"] == OPEN
+    with pytest.raises(CircuitOpenError) as exc:
+        breaker.before_call()
+    assert exc.value.retry_after == pytest.approx(30)
+    assert breaker.snapshot()["trips"] == 1
+
+
+def test_half_open_admits_one_probe(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=30)
+    fail(breaker, 1)
+
+    clock.now += 30
+    breaker.before_call()
+    assert breaker.snapshot()["state"] == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.snapshot()["state"] == CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=30)
+    fail(breaker, 1)
+    clock.now += 31
+    fail(breaker, 1)
+
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == OPEN and snapshot["trips"] == 2
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+# -----------------------------
+# HdfcClient retries
+# -----------------------------
+
+class Response:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(hdfc_investright, "HDFC_RETRIES", 2)
+    monkeypatch.setattr(hdfc_investright.HdfcClient, "_retry_delay", staticmethod(lambda *a: 0))
+    client = hdfc_investright.HdfcClient(base="http://hdfc.test")
+    client.sent = []
+
+    def respond(outcomes):
+        def request(method, url, **kwargs):
+            client.sent.append((method, url))
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return Response(outcome)
+        client.session.request = request
+
+    client.respond = respond
+    return client
+
+
+def test_get_retries_retryable_status(client):
+    client.respond([503, 429, 200])
+    assert client.get("portfolio/holdings").status_code == 200
+    assert len(client.sent) == 3
+
+
+def test_get_gives_up_after_retries(client):
+    client.respond([requests.ConnectionError()] * 3)
+    with pytest.raises(requests.ConnectionError):
+        client.get("portfolio/holdings")
+    assert len(client.sent) == 3
+
+
+def test_get_does_not_retry_read_timeout(client):
+    # The read budget is already spent; retrying would triple the wait
+    client.respond([requests.ReadTimeout()])
+    with pytest.raises(requests.ReadTimeout):
+        client.get("portfolio/holdings")
+    assert len(client.sent) == 1
+
+
+def test_post_is_not_retried_once_sent(client):
+    client.respond([503])
+    assert client.post("twofa/validate").status_code == 503
+
+    client.respond([requests.ReadTimeout()])
+    with pytest.raises(requests.ReadTimeout):
+        client.post("twofa/validate")
+    assert len(client.sent) == 2
+
+
+def test_post_retries_connect_timeout(client):
+    # The request never reached HDFC, so an OTP can't be sent twice
+    client.respond([requests.ConnectTimeout(), 200])
+    assert client.post("twofa/validate").status_code == 200
+    assert len(client.sent) == 2
+
+
+def test_open_breaker_skips_the_network(client, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    client.respond([500] * 3)
+    assert client.get("portfolio/holdings").status_code == 500
+
+    with pytest.raises(CircuitOpenError):
+        client.get("portfolio/holdings")
+    assert len(client.sent) == 3
+    # Other endpoints have their own breaker
+    client.respond([200])
+    assert client.get("login").status_code == 200
+
+
+# -----------------------------
+# KiteClient (same PooledClient base)
+# -----------------------------
+
+class KiteResponse(Response):
+    def __init__(self, status_code, data=None):
+        super().__init__(status_code)
+        self.data = data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+    def json(self):
+        return {"data": self.data}
+
+
+@pytest.fixture
+def kite(monkeypatch):
+    import zerodha_integration
+
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    client = zerodha_integration.KiteClient(base="http://kite.test", api_key="key")
+    monkeypatch.setattr(client, "_retry_delay", lambda *a: 0)
+    client.sent = []
+
+    def respond(outcomes):
+        def request(method, url, **kwargs):
+            client.sent.append((method, url, kwargs["headers"]["Authorization"]))
+            return outcomes.pop(0)
+        client.session.request = request
+
+    client.respond = respond
+    return client
+
+
+def test_kite_get_data_retries_then_returns_data(kite):
+    kite.respond([KiteResponse(503), KiteResponse(200, [{"tradingsymbol": "INFY"}])])
+    assert kite.get_data("portfolio/holdings", "tok") == [{"tradingsymbol": "INFY"}]
+    assert [s[2] for s in kite.sent] == ["token key:tok"] * 2
+
+
+def test_kite_get_data_raises_on_rejected_token(kite):
+    kite.respond([KiteResponse(403)])
+    with pytest.raises(requests.HTTPError):
+        kite.get_data("mf/holdings", "tok")
+    assert len(kite.sent) == 1
+
+
+def test_retry_delay_is_capped():
+    import zerodha_integration
+
+    client = zerodha_integration.KiteClient(base="http://kite.test", api_key="key")
+    client.backoff, client.max_delay = 1.0, 2.5
+    assert client._retry_delay(10) == 2.5
+    assert client._retry_delay(1, retry_after="60") == 2.5
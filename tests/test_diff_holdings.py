@@ -0,0 +1,68 @@
+from holdings_sync import EQUITY_KEY_FIELDS, MF_KEY_FIELDS, diff_holdings
+
+
+def equity(symbol, quantity, price="100.0", **extra):
+    return {"member_id": "m1", "broker_platform": "HDFC Securities", "symbol": symbol,
+            "quantity": quantity, "current_price": price, "import_date": "2025-01-02", **extra}
+
+
+def test_new_changed_removed_and_unchanged():
+    existing = [
+        dict(equity("INFY", 10), id=1, import_date="2025-01-01"),
+        dict(equity("TCS", 5), id=2),
+        dict(equity("WIPRO", 7), id=3),
+    ]
+    records = [equity("INFY", 10), equity("TCS", 6), equity("HDFC", 1)]
+
+    inserts, updates, delete_ids, unchanged = diff_holdings(existing, records, EQUITY_KEY_FIELDS)
+
+    assert inserts == [equity("HDFC", 1)]
+    assert updates == [dict(equity("TCS", 6), id=2)]
+    assert delete_ids == [3]
+    # import_date alone does not make a row changed
+    assert unchanged == 1
+
+
+def test_numeric_strings_compare_as_numbers():
+    existing = [dict(equity("INFY", 10.0, "1500"), id=1)]
+    records = [equity("INFY", "10", "1500.0000000001")]
+
+    assert diff_holdings(existing, records, EQUITY_KEY_FIELDS) == ([], [], [], 1)
+
+
+def test_duplicate_keys():
+    existing = [dict(equity("INFY", 10), id=1), dict(equity("INFY", 10), id=2)]
+    records = [equity("INFY", 3), equity("INFY", 10)]
+
+    inserts, updates, delete_ids, unchanged = diff_holdings(existing, records, EQUITY_KEY_FIELDS)
+
+    # The last record for a key wins; the extra existing row is deleted
+    assert (inserts, updates, delete_ids, unchanged) == ([], [], [2], 1)
+
+
+def test_missing_key_fields_match_empty_strings():
+    existing = [{"id": 1, "scheme_code": None, "folio_number": "F1", "units": 4}]
+    records = [{"scheme_code": "", "folio_number": "F1", "units": 4}]
+
+    assert diff_holdings(existing, records, MF_KEY_FIELDS) == ([], [], [], 1)
+
+
+def test_empty_payload_deletes_everything():
+    existing = [dict(equity("INFY", 10), id=1), dict(equity("TCS", 5), id=2)]
+
+    assert diff_holdings(existing, [], EQUITY_KEY_FIELDS) == ([], [], [1, 2], 0)
+
+
+def test_codeless_schemes_key_on_scheme_name():
+    def mf(name, units, code=""):
+        return {"scheme_code": code, "scheme_name": name, "folio_number": "F1", "units": units}
+
+    existing = [dict(mf("Axis Bluechip Fund", 4), id=1), dict(mf("HDFC Top 100", 2), id=2)]
+    records = [mf("Axis Bluechip Fund", 4), mf("HDFC Top 100", 3), mf("SBI Small Cap", 1)]
+
+    inserts, updates, delete_ids, unchanged = diff_holdings(existing, records, MF_KEY_FIELDS)
+
+    # Same folio, no codes: each scheme is still its own holding
+    assert inserts == [mf("SBI Small Cap", 1)]
+    assert updates == [dict(mf("HDFC Top 100", 3), id=2)]
+    assert (delete_ids, unchanged) == ([], 1)
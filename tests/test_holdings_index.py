@@ -0,0 +1,27 @@
+from holdings_columns import EQUITY, Holding
+from holdings_index import ConsolidationIndex
+
+
+def leg(member_id, broker, symbol, invested, current):
+    return Holding.from_row(EQUITY, {
+        "member_id": member_id, "broker_platform": broker, "symbol": symbol,
+        "quantity": 1, "invested_amount": invested, "current_value": current})
+
+
+def test_member_filter_narrows_legs_and_totals():
+    index = ConsolidationIndex([
+        leg("m1", "HDFC Securities", "INFY", 100, 150),
+        leg("m2", "Zerodha", "NSE:INFY", 200, 300),
+        leg("m2", "Zerodha", "TCS", 50, 40),
+    ])
+
+    family = index.totals(EQUITY)
+    assert (family["positions"], family["current_value"], family["multi_member"]) == (2, 490.0, 1)
+
+    positions = index.positions(EQUITY, member_id="m1")
+    assert [(p.key, p.current_value, p.members) for p in positions] == [("INFY", 150.0, ["m1"])]
+    assert index.totals(EQUITY, member_id="m1") == {
+        "positions": 1, "invested": 100.0, "current_value": 150.0, "gain": 50.0,
+        "multi_broker": 0, "multi_member": 0,
+    }
+    assert index.totals(member_id="nobody")["positions"] == 0
@@ -0,0 +1,128 @@
+import pytest
+
+import import_journal
+from import_jobs import DONE, FAILED, QUEUED, RUNNING
+from import_journal import SUPERSEDED, ImportJournal, JournalFlusher
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    # append() wakes the process-wide flusher; keep it out of these tests
+    monkeypatch.setattr(import_journal, "_flusher", None)
+    return ImportJournal(str(tmp_path / "journal.sqlite3"))
+
+
+def append(journal, job_id, user="u1", payload=None):
+    return journal.append(job_id, "hdfc", "HDFC Securities", user, payload or {"n": job_id})
+
+
+def test_append_is_idempotent_per_job_id(journal):
+    job, created = append(journal, "j1")
+    assert created and job["status"] == QUEUED
+
+    again, created = append(journal, "j1", payload={"n": "other"})
+    assert not created and again["job_id"] == "j1"
+    assert journal.claim()[3] == {"n": "j1"}
+
+
+def test_claim_replays_in_order_per_user(journal):
+    append(journal, "a1", user="a")
+    append(journal, "b1", user="b")
+
+    first = journal.claim()
+    assert first[1] == "a1"
+    # b's batch does not wait for a's
+    assert journal.claim()[1] == "b1"
+    assert journal.claim() is None
+
+    journal.complete(first[0], {"equity": 3})
+    job = journal.get("a1")
+    assert job["status"] == DONE and job["counts"] == {"equity": 3}
+
+
+def test_newer_snapshot_supersedes_queued_one(journal):
+    append(journal, "old")
+    append(journal, "new")
+
+    assert journal.claim()[1] == "new"
+    assert journal.get("old")["status"] == SUPERSEDED
+
+
+def test_running_batch_blocks_the_next_for_that_user(journal):
+    append(journal, "first")
+    journal.claim()
+    append(journal, "second")
+
+    assert journal.claim() is None
+    assert journal.get("second")["status"] == QUEUED
+
+
+def test_failures_back_off_then_fail_for_good(journal, monkeypatch):
+    monkeypatch.setattr(import_journal, "JOURNAL_MAX_ATTEMPTS", 2)
+    append(journal, "j1")
+
+    seq = journal.claim()[0]
+    assert journal.fail(seq, "supabase down") == import_journal.JOURNAL_RETRY_BACKOFF
+    job = journal.get("j1")
+    assert job["status"] == QUEUED and job["next_attempt_at"]
+    # Not replayable until the backoff has passed
+    assert journal.claim() is None
+
+    journal._conn().execute("UPDATE batches SET next_attempt_at = 0")
+    seq = journal.claim()[0]
+    assert journal.fail(seq, "supabase down") is None
+    assert journal.get("j1")["status"] == FAILED
+
+    # A failed batch can be appended again
+    _, created = append(journal, "j1")
+    assert created
+
+
+def test_orphaned_running_batch_is_reclaimed(journal, monkeypatch):
+    append(journal, "j1")
+    journal.claim()
+    assert journal.get("j1")["status"] == RUNNING
+
+    monkeypatch.setattr(import_journal, "JOURNAL_CLAIM_TIMEOUT", -1)
+    assert journal.claim()[1] == "j1"
+    assert journal.get("j1")["attempts"] == 2
+
+
+def test_journal_survives_reopening(journal):
+    append(journal, "j1")
+    reopened = ImportJournal(journal.path)
+    assert reopened.claim()[1] == "j1"
+
+
+def test_flusher_replays_through_handler(journal, monkeypatch):
+    replayed = []
+    monkeypatch.setitem(import_journal.JOURNAL_HANDLERS, "hdfc",
+                        lambda payload: replayed.append(payload) or {"rows": 1})
+    append(journal, "j1")
+
+    flusher = JournalFlusher(journal)
+    flusher.start()
+    try:
+        for _ in range(500):
+            if journal.get("j1")["status"] == DONE:
+                break
+            flusher.wake()
+            flusher.join(0.01)
+    finally:
+        flusher.stop()
+        flusher.join(5)
+
+    assert not flusher.is_alive()
+    assert replayed == [{"n": "j1"}]
+    assert journal.get("j1")["counts"] == {"rows": 1}
+
+
+def test_get_journal_does_not_create_file_on_read(tmp_path, monkeypatch):
+    path = tmp_path / "missing" / "journal.sqlite3"
+    monkeypatch.setattr(import_journal, "IMPORT_JOURNAL_PATH", str(path))
+    monkeypatch.setattr(import_journal, "_journal", None)
+    monkeypatch.setattr(import_journal, "_flusher", None)
+
+    assert import_journal.get_journal(create=False) is None
+    import_journal.resume()
+    assert not path.exists()
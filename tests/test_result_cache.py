@@ -0,0 +1,45 @@
+from result_cache import ResultCache, to_float
+
+
+def test_hit_then_invalidate_one_user():
+    cache = ResultCache(ttl=60)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value
+
+    assert cache.get("u1", lambda: compute(1)) == (1, False)
+    assert cache.get("u1", lambda: compute(2)) == (1, True)
+    assert cache.get(("u2", "m1"), lambda: compute(3)) == (3, False)
+
+    cache.invalidate("u1")
+    assert cache.get("u1", lambda: compute(4)) == (4, False)
+    assert cache.get(("u2", "m1"), lambda: compute(5)) == (3, True)
+    assert calls == [1, 3, 4]
+    assert cache.stats() == {"hits": 2, "misses": 3, "invalidations": 1, "entries": 2}
+
+
+def test_result_computed_across_a_write_is_not_cached():
+    cache = ResultCache(ttl=60)
+
+    def compute():
+        cache.invalidate()
+        return "stale"
+
+    assert cache.get("u1", compute) == ("stale", False)
+    assert cache.get("u1", lambda: "fresh") == ("fresh", False)
+
+
+def test_max_entries_evicts_oldest():
+    cache = ResultCache(ttl=60, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.get(key, lambda: key)
+    assert cache.get("a", lambda: "a2") == ("a2", False)
+    assert cache.get("c", lambda: "c2") == ("c", True)
+
+
+def test_to_float():
+    assert to_float("1.5") == 1.5
+    assert to_float(None) == 0.0
+    assert to_float("n/a") == 0.0
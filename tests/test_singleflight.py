@@ -0,0 +1,110 @@
+import threading
+import time
+
+import pytest
+
+import hdfc_investright
+from hdfc_investright import SingleFlight
+
+
+def _run_concurrently(n, target):
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return {"data": []}
+
+    threads = _run_concurrently(8, lambda: results.append(flight.do("k", fn)))
+    # Every follower has joined the leader's flight before it returns
+    while flight.stats()["calls"] < 8:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(r is results[0] for r in results)
+    assert flight.stats() == {"calls": 8, "coalesced": 7, "in_flight": 0}
+
+
+def test_followers_get_the_leaders_exception():
+    flight = SingleFlight()
+    release = threading.Event()
+    errors = []
+
+    def fn():
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    def call():
+        try:
+            flight.do("k", fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = _run_concurrently(4, call)
+    while flight.stats()["calls"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(errors) == 4 and all(e is errors[0] for e in errors)
+
+
+def test_sequential_calls_are_not_cached():
+    flight = SingleFlight()
+    calls = []
+    flight.do("k", lambda: calls.append(1))
+    flight.do("k", lambda: calls.append(1))
+    with pytest.raises(KeyError):
+        flight.do("other", lambda: {}["missing"])
+
+    assert len(calls) == 2
+    assert flight.stats()["coalesced"] == 0
+
+
+def test_login_is_never_coalesced(monkeypatch):
+    release = threading.Event()
+    issued = []
+
+    class Response:
+        status_code = 200
+        text = "{}"
+
+        def __init__(self, token_id):
+            self.token_id = token_id
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"tokenId": self.token_id}
+
+    class Client:
+        def get(self, endpoint, **kwargs):
+            issued.append(endpoint)
+            token_id = f"token-{len(issued)}"
+            release.wait(1)
+            return Response(token_id)
+
+    monkeypatch.setattr(hdfc_investright, "get_client", lambda: Client())
+    token_ids = []
+    threads = _run_concurrently(3, lambda: token_ids.append(hdfc_investright.get_token_id()))
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert issued == ["login"] * 3
+    assert len(set(token_ids)) == 3
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+import sync_scheduler
+import token_store
+
+TOKEN = sync_scheduler.HDFC_TOKEN_NAME
+
+
+class Rejected(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.response = type("Response", (), {"status_code": status})()
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    store = token_store.MemoryTokenStore()
+    monkeypatch.setattr(token_store, "_store", store)
+    return store
+
+
+def save(sid, user_id, token):
+    token_store.save_session_token(sid, TOKEN, token, user_id, 60)
+    # saved_at orders the sessions; keep each save distinct
+    time.sleep(0.002)
+
+
+def test_one_job_per_user_newest_token_first():
+    save("s1", "u1", "old")
+    save("s2", "u1", "new")
+    save("s3", "u2", "other")
+
+    assert dict(sync_scheduler.hdfc_users()) == {
+        "u1": [("s2", "new"), ("s1", "old")],
+        "u2": [("s3", "other")],
+    }
+
+
+def test_rejected_token_falls_back_to_older_session():
+    save("s1", "u1", "old")
+    save("s2", "u1", "new")
+    tried = []
+
+    def fetch(token):
+        tried.append(token)
+        if token == "new":
+            raise Rejected(401)
+        return {"data": []}
+
+    sessions = dict(sync_scheduler.hdfc_users())["u1"]
+    result = sync_scheduler._fetch_with_sessions(sessions, TOKEN, fetch, time.monotonic() + 5)
+
+    assert result == {"data": []} and tried == ["new", "old"]
+    # The rejected token is dropped for later runs
+    assert dict(sync_scheduler.hdfc_users()) == {"u1": [("s1", "old")]}
+
+
+def test_other_errors_do_not_fall_back():
+    save("s1", "u1", "old")
+    save("s2", "u1", "new")
+    tried = []
+
+    def fetch(token):
+        tried.append(token)
+        raise Rejected(503)
+
+    sessions = dict(sync_scheduler.hdfc_users())["u1"]
+    with pytest.raises(Rejected):
+        sync_scheduler._fetch_with_sessions(sessions, TOKEN, fetch, time.monotonic() + 5)
+    assert tried == ["new"]
+
+
+def test_run_once_syncs_each_user_once():
+    save("s1", "u1", "a")
+    save("s2", "u1", "b")
+    calls = []
+
+    def sync(user_id, sessions, limiter, deadline):
+        calls.append((user_id, [sid for sid, _ in sessions]))
+        return {}
+
+    brokers = {"HDFC": (sync_scheduler.hdfc_users, sync, sync_scheduler.RateLimiter(100, 10))}
+    report = sync_scheduler.run_once(workers=2, jitter=0, job_deadline=5, brokers=brokers)
+
+    assert calls == [("u1", ["s2", "s1"])]
+    assert report["jobs"] == 1 and report["ok"] == 1
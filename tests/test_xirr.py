@@ -0,0 +1,76 @@
+import math
+from datetime import date
+
+import numpy as np
+import pytest
+
+from portfolio_returns import _metrics, _pack, compute_returns, xirr_batch
+
+
+def test_two_flow_rows_match_closed_form():
+    # -invested a year ago (and two years ago), +current today
+    rates = xirr_batch([[-100, 110], [-100, 121], [-200, 150]],
+                       [[1, 0], [2, 0], [1, 0]])
+    assert rates == pytest.approx([0.10, 0.10, -0.25], abs=1e-9)
+
+
+def test_multiple_flows_zero_npv():
+    amounts = np.array([[-1000, -500, 300, 1400]], dtype=float)
+    years = np.array([[2.0, 1.5, 0.5, 0.0]])
+    rate = xirr_batch(amounts, years)[0]
+
+    npv = (amounts * (1 + rate) ** years).sum()
+    assert abs(npv) < 1e-6
+
+
+def test_no_sign_change_is_nan():
+    rates = xirr_batch([[-100, -50], [100, 50], [0, 0]], [[1, 0], [1, 0], [1, 0]])
+    assert np.isnan(rates).all()
+
+
+def test_extreme_rates():
+    # Doubling in 0.1 year, a near-total loss over ten years, 1000x in a month
+    rates = xirr_batch([[-1, 2], [-100, 0.5], [-1, 1000]], [[0.1, 0], [10, 0], [1 / 12, 0]])
+    assert rates[0] == pytest.approx(2 ** 10 - 1, rel=1e-6)
+    assert rates[1] == pytest.approx(0.005 ** 0.1 - 1, abs=1e-6)
+    assert rates[2] == pytest.approx(1000 ** 12 - 1, rel=1e-6)
+
+
+def test_padding_does_not_change_the_result():
+    series = [(np.array([-100.0, 110.0]), np.array([1.0, 0.0])),
+              (np.array([-50.0, -50.0, 0.0, 115.0]), np.array([2.0, 1.0, 0.5, 0.0]))]
+    amounts, years = _pack(series)
+    assert amounts.shape == (2, 4)
+
+    batched = xirr_batch(amounts, years)
+    alone = [xirr_batch(a[None, :], y[None, :])[0] for a, y in series]
+    assert batched == pytest.approx(alone, abs=1e-9)
+
+
+def test_metrics():
+    m = _metrics(1000.0, 1210.0, 730, 0.1)
+    assert m["absolute_return"] == 210.0
+    assert m["absolute_return_percent"] == 21.0
+    assert m["cagr"] == pytest.approx(10.0, abs=0.01)
+    assert m["xirr"] == 10.0
+
+    # Under a year: no CAGR; no rate: no XIRR
+    empty = _metrics(0.0, 0.0, 0, math.nan)
+    assert empty["cagr"] is None and empty["xirr"] is None
+    assert _metrics(100.0, 105.0, 100, 0.2)["cagr"] is None
+
+
+def test_bisection_agrees_with_newton(monkeypatch):
+    amounts = [[-100, 110, 0, 0], [-1000, -500, 300, 1400]]
+    years = [[1, 0, 0, 0], [2.0, 1.5, 0.5, 0.0]]
+    newton = xirr_batch(amounts, years)
+
+    monkeypatch.setattr("portfolio_returns.NEWTON_ITERATIONS", 0)
+    assert xirr_batch(amounts, years) == pytest.approx(newton, abs=1e-9)
+
+
+def test_past_as_of_is_rejected():
+    # Holdings only carry today's value; a past as-of would shorten the
+    # period without rolling the value back
+    with pytest.raises(ValueError):
+        compute_returns("user", as_of=date(2023, 7, 1))
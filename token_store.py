@@ -0,0 +1,214 @@
+"""
+Server-side store for HDFC tokens and login-flow state.
+
+The Flask cookie only carries an opaque session id; token_id,
+request_token, username and broker access tokens live here with an
+expiry. Access tokens belong to the browser session that completed the
+broker login (save_session_token), never to a shared user id, and carry
+the user their imports are written for. Two backends:
+
+    TOKEN_STORE=sqlite  (default) one SQLite file shared by every gunicorn
+                        worker on the instance, at TOKEN_STORE_PATH
+    TOKEN_STORE=memory  per-process dict; fine for a single worker / dev
+
+Processes outside gunicorn (sync_scheduler) only see the same tokens when
+TOKEN_STORE_PATH is set explicitly to a file they share; see
+unshared_reason.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+TOKEN_STORE = os.getenv("TOKEN_STORE", "sqlite")
+_DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "hdfc_tokens.sqlite3")
+TOKEN_STORE_PATH = os.getenv("TOKEN_STORE_PATH", _DEFAULT_PATH)
+
+# Seconds between sweeps of expired entries
+PURGE_INTERVAL = 300
+
+
+def session_key(sid, name):
+    """Key for login-flow state tied to one browser session."""
+    return f"session:{sid}:{name}"
+
+
+def user_key(user_id, name):
+    """Key for non-secret state tied to a dashboard user, e.g. their last sync time."""
+    return f"user:{user_id}:{name}"
+
+
+class MemoryTokenStore:
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.time()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= time.time():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            if time.time() - self._last_purge > PURGE_INTERVAL:
+                self._purge()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def keys(self, prefix):
+        """Live keys starting with prefix."""
+        now = time.time()
+        with self._lock:
+            return [k for k, (_, exp) in self._data.items() if k.startswith(prefix) and exp > now]
+
+    def _purge(self):
+        now = time.time()
+        for key in [k for k, (_, exp) in self._data.items() if exp <= now]:
+            del self._data[key]
+        self._last_purge = now
+
+
+class SqliteTokenStore:
+    """Values are JSON-encoded; one connection per thread, WAL journal."""
+
+    def __init__(self, path=None):
+        self.path = path or TOKEN_STORE_PATH
+        self._local = threading.local()
+        self._last_purge = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value FROM tokens WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tokens (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now + ttl),
+            )
+            if now - self._last_purge > PURGE_INTERVAL:
+                conn.execute("DELETE FROM tokens WHERE expires_at <= ?", (now,))
+                self._last_purge = now
+
+    def delete(self, key):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM tokens WHERE key = ?", (key,))
+
+    def keys(self, prefix):
+        """Live keys starting with prefix."""
+        rows = self._conn().execute(
+            "SELECT key FROM tokens WHERE key >= ? AND key < ? AND expires_at > ?",
+            (prefix, prefix + "\uffff", time.time()),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def unshared_reason():
+    """
+    Why another process (the sync scheduler) can't see the web workers'
+    tokens through this configuration, or None when it can: the memory
+    backend is per process, and the default path lives in this instance's
+    temp dir.
+    """
+    if TOKEN_STORE == "memory":
+        return "TOKEN_STORE=memory keeps tokens inside one process"
+    if TOKEN_STORE == "sqlite" and "TOKEN_STORE_PATH" not in os.environ:
+        return (f"TOKEN_STORE_PATH is not set; the default {_DEFAULT_PATH} is private to "
+                f"this instance's temp dir")
+    return None
+
+
+def get_store():
+    """Return the process-wide token store selected by TOKEN_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if TOKEN_STORE == "memory":
+                    _store = MemoryTokenStore()
+                elif TOKEN_STORE == "sqlite":
+                    _store = SqliteTokenStore()
+                else:
+                    raise RuntimeError(f"Unknown TOKEN_STORE: {TOKEN_STORE}")
+    return _store
+
+
+# -----------------------------
+# Broker access tokens
+# -----------------------------
+
+def save_session_token(sid, name, token, user_id, ttl):
+    """Store a broker access token for one browser session, with the user it imports for."""
+    get_store().set(session_key(sid, name),
+                    {"token": token, "user_id": user_id, "saved_at": time.time()}, ttl)
+
+
+def get_session_token(sid, name):
+    entry = get_store().get(session_key(sid, name))
+    return entry.get("token") if isinstance(entry, dict) else None
+
+
+def delete_session_token(sid, name):
+    get_store().delete(session_key(sid, name))
+
+
+def session_tokens(name):
+    """
+    (sid, user_id, token) for every session holding a live token called
+    name, newest first.
+    """
+    store = get_store()
+    suffix = ":" + name
+    found = []
+    for key in store.keys("session:"):
+        if not key.endswith(suffix):
+            continue
+        entry = store.get(key)
+        if isinstance(entry, dict) and entry.get("token"):
+            found.append((entry.get("saved_at") or 0,
+                          key[len("session:"):-len(suffix)], entry.get("user_id"), entry["token"]))
+    found.sort(key=lambda item: item[0], reverse=True)
+    return [item[1:] for item in found]
+
+
+def user_session_tokens(name):
+    """{user_id: [(sid, token), ...] newest first} for live tokens called name."""
+    by_user = {}
+    for sid, user_id, token in session_tokens(name):
+        by_user.setdefault(user_id, []).append((sid, token))
+    return by_user
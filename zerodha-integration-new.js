@@ -262,7 +262,7 @@ async function zerodhaImportAll() {
                     member_id: memberId,
                     broker_platform: 'Zerodha',
                     scheme_name: mf.fund || mf.tradingsymbol,
-                    scheme_code: mf.instrument_token ? mf.instrument_token.toString() : '',
+                    scheme_code: mf.tradingsymbol || '',  // scheme ISIN, as the server importer writes
                     folio_number: mf.folio,
                     fund_house: mf.fund_house || 'Unknown',
                     units: mf.quantity,
@@ -419,7 +419,7 @@ async function zerodhaImportMF() {
                 member_id: memberId,
                 broker_platform: 'Zerodha',
                 scheme_name: mf.fund || mf.tradingsymbol,
-                scheme_code: mf.instrument_token ? mf.instrument_token.toString() : '',
+                scheme_code: mf.tradingsymbol || '',  // scheme ISIN, as the server importer writes
                 folio_number: mf.folio,
                 fund_house: mf.fund_house || 'Unknown',
                 units: mf.quantity,
@@ -293,7 +293,7 @@ async function zerodhaImportAll() {
                     member_id: memberId,
                     broker_platform: 'Zerodha',
                     scheme_name: mf.fund || mf.tradingsymbol,
-                    scheme_code: mf.instrument_token ? mf.instrument_token.toString() : '',
+                    scheme_code: mf.tradingsymbol || '',  // scheme ISIN, as the server importer writes
                     folio_number: mf.folio,
                     fund_house: mf.fund_house || 'Unknown',
                     units: mf.quantity,
@@ -440,7 +440,7 @@ async function zerodhaImportMF() {
                         zerodha_data: mf,
                         fund_name: mf.fund,
                         folio_number: mf.folio,
-                        scheme_code: mf.instrument_token ? mf.instrument_token.toString() : '',
+                        scheme_code: mf.tradingsymbol || '',  // scheme ISIN, as the server importer writes
                         fund_house: mf.fund_house || 'Unknown',
                         mf_quantity: mf.quantity,
                         mf_nav: mf.last_price,
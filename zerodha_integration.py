@@ -0,0 +1,301 @@
+"""
+Server-side Zerodha (Kite Connect) holdings import.
+
+The equity (/portfolio/holdings) and mutual fund (/mf/holdings) lists are
+fetched concurrently over one pooled keep-alive session, so an import
+waits for the slower of the two calls rather than their sum. Both lists
+are normalized in one columnar pass (holdings_columns.zerodha_records) and
+written through the same incremental diff + BulkWriter path as the HDFC
+import.
+
+    equity, mfs = fetch_holdings(access_token)
+    process_holdings_success(equity, mfs, user_id)
+
+The access token comes from the Kite login flow (api/zerodha/session.js)
+and is kept per browser session in token_store under "zerodha_access_token".
+
+MF rows are keyed on the scheme ISIN (Kite's tradingsymbol), which AMFI
+revaluation also understands. Rows written before that by the frontend
+importer carried Kite's instrument_token instead (absent from MF holdings,
+so usually empty); migrate_mf_scheme_codes rewrites them in place once
+per member.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+from broker_client import PooledClient
+from holdings_sync import (EQUITY_KEY_FIELDS, MF_KEY_FIELDS, record_networth_snapshot, select_all,
+                           sync_holdings_incremental)
+from supabase_client import get_supabase
+from supabase_writer import BulkWriter, notify_write
+
+logger = logging.getLogger(__name__)
+
+# ============================================================
+# Config
+# ============================================================
+BASE = os.getenv("ZERODHA_BASE_URL", "https://api.kite.trade")
+API_KEY = os.getenv("ZERODHA_API_KEY")
+KITE_VERSION = "3"
+
+# Two calls per import, so two connections per concurrent request
+ZERODHA_POOL_SIZE = int(os.getenv("ZERODHA_POOL_SIZE") or max(4, 2 * int(os.getenv("GUNICORN_THREADS", "1"))))
+DEFAULT_TIMEOUT = (5, 20)
+
+# Holdings reads are idempotent: retried on connection errors and
+# retryable statuses (see broker_client.PooledClient)
+ZERODHA_RETRIES = int(os.getenv("ZERODHA_RETRIES", "2"))
+ZERODHA_RETRY_BACKOFF = float(os.getenv("ZERODHA_RETRY_BACKOFF", "0.3"))
+ZERODHA_RETRY_MAX_DELAY = float(os.getenv("ZERODHA_RETRY_MAX_DELAY", "5"))
+
+# "incremental" diffs against existing rows; "replace" deletes and re-inserts
+IMPORT_MODE = os.getenv("ZERODHA_IMPORT_MODE", "incremental")
+
+BROKER = "Zerodha"
+TOKEN_NAME = "zerodha_access_token"
+# Kite tokens die at 6 AM IST the next day; an earlier 403 drops them too
+ACCESS_TOKEN_TTL = int(os.getenv("ZERODHA_ACCESS_TOKEN_TTL", str(8 * 3600)))
+
+# token_store flag marking a member's MF rows as migrated to ISIN scheme codes
+MF_ISIN_MIGRATION_TTL = 365 * 24 * 3600
+
+# Zerodha demat belongs to Pradeep, Zerodha MF to Saanvi
+MEMBERS = {
+    "equity": "bef9db5e-2f21-4038-8f3f-f78ce1bbfb49",
+    "mutualFunds": "c2f4b3d8-bb69-4516-b107-dffbde92c77c"
+}
+
+# -----------------------------
+# Pooled HTTP client
+# -----------------------------
+
+class KiteClient(PooledClient):
+    """
+    Keep-alive HTTP client for the Kite Connect API, shared by every thread
+    in the process. Each endpoint has its own circuit breaker
+    ("zerodha:<endpoint>").
+    """
+
+    def __init__(self, base=None, pool_size=None, api_key=None):
+        super().__init__(
+            base or BASE, "zerodha", metrics.ZERODHA_REQUEST_SECONDS,
+            pool_size=pool_size or ZERODHA_POOL_SIZE,
+            default_timeout=DEFAULT_TIMEOUT,
+            retries=ZERODHA_RETRIES, backoff=ZERODHA_RETRY_BACKOFF,
+            max_delay=ZERODHA_RETRY_MAX_DELAY,
+        )
+        self.api_key = api_key or API_KEY
+
+    def get_data(self, endpoint, access_token, api_key=None):
+        """GET a Kite endpoint; returns the response "data", raises on HTTP errors."""
+        api_key = api_key or self.api_key
+        if not api_key:
+            raise RuntimeError("ZERODHA_API_KEY not found in environment")
+        headers = {
+            "X-Kite-Version": KITE_VERSION,
+            "Authorization": f"token {api_key}:{access_token}",
+        }
+        resp = self.get(endpoint, headers=headers)
+        resp.raise_for_status()
+        return resp.json().get("data") or []
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide KiteClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = KiteClient()
+    return _client
+
+
+# -----------------------------
+# Concurrent fetch
+# -----------------------------
+
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+
+def _get_fetch_executor():
+    global _fetch_executor
+    if _fetch_executor is None:
+        with _fetch_executor_lock:
+            if _fetch_executor is None:
+                _fetch_executor = ThreadPoolExecutor(
+                    max_workers=max(2, int(os.getenv("GUNICORN_THREADS", "1"))),
+                    thread_name_prefix="kite-fetch",
+                )
+    return _fetch_executor
+
+
+def fetch_holdings(access_token, api_key=None):
+    """
+    Fetch (equity_holdings, mf_holdings) from Kite at the same time: the MF
+    call runs on the fetch pool while the calling thread does the equity one.
+    """
+    client = get_client()
+    start = time.perf_counter()
+    mf_future = _get_fetch_executor().submit(client.get_data, "mf/holdings", access_token, api_key)
+    try:
+        equity = client.get_data("portfolio/holdings", access_token, api_key)
+    except BaseException:
+        mf_future.cancel()
+        raise
+    mf_holdings = mf_future.result()
+    logger.info("📦 Kite holdings: %d equity, %d MF in %.0f ms",
+                len(equity), len(mf_holdings), (time.perf_counter() - start) * 1000)
+    return equity, mf_holdings
+
+
+def get_holdings(user_id, access_token):
+    """Normalized holdings for the frontend, fetched with access_token."""
+    from holdings_columns import zerodha_records
+
+    if not access_token:
+        raise PermissionError("No Zerodha access token; connect Zerodha first")
+    equity, mf_holdings = fetch_holdings(access_token)
+    equity_records, mf_records = zerodha_records(
+        equity, mf_holdings, user_id, MEMBERS, datetime.utcnow().date().isoformat())
+    return {"equity": equity_records, "mutualFunds": mf_records}
+
+
+# -----------------------------
+# Token storage
+# -----------------------------
+
+def get_access_token(sid):
+    import token_store
+    return token_store.get_session_token(sid, TOKEN_NAME)
+
+
+def save_access_token(sid, user_id, access_token):
+    import token_store
+    token_store.save_session_token(sid, TOKEN_NAME, access_token, user_id, ACCESS_TOKEN_TTL)
+
+
+def delete_access_token(sid):
+    import token_store
+    token_store.delete_session_token(sid, TOKEN_NAME)
+
+
+# -----------------------------
+# Import
+# -----------------------------
+
+def process_holdings_success(equity_holdings, mf_holdings, user_id, member_ids=None, mode=None):
+    """
+    Write Kite equity / MF holdings into equity_holdings and
+    mutual_fund_holdings for the Zerodha members.
+
+    mode "incremental" (default, see ZERODHA_IMPORT_MODE) writes only
+    inserted, changed and removed rows; "replace" deletes and re-inserts.
+    """
+    from holdings_columns import zerodha_records
+
+    member_ids = member_ids or MEMBERS
+    import_date = datetime.utcnow().date().isoformat()
+    logger.info("🔄 Processing %d equity + %d MF Zerodha holdings for user %s",
+                len(equity_holdings), len(mf_holdings), user_id)
+
+    equity_records, mf_records = zerodha_records(
+        equity_holdings, mf_holdings, user_id, member_ids, import_date)
+
+    equity_match = {"user_id": user_id, "broker_platform": BROKER, "member_id": member_ids["equity"]}
+    mf_match = {"user_id": user_id, "broker_platform": BROKER, "member_id": member_ids["mutualFunds"]}
+
+    mode = (mode or IMPORT_MODE).lower()
+    if mode == "incremental":
+        migrate_mf_scheme_codes(user_id, mf_match, mf_records)
+        changes = {
+            "equity": sync_holdings_incremental(
+                "equity_holdings", equity_records, equity_match, EQUITY_KEY_FIELDS),
+            "mutualFunds": sync_holdings_incremental(
+                "mutual_fund_holdings", mf_records, mf_match, MF_KEY_FIELDS),
+        }
+        logger.info("✅ Zerodha holdings synced incrementally: %s", changes)
+        result = {"equity": len(equity_records), "mutualFunds": len(mf_records), "changes": changes}
+    else:
+        logger.info("🗑️ Deleting old Zerodha holdings...")
+        with metrics.span(metrics.SUPABASE_OP_SECONDS, table="equity_holdings", op="delete"):
+            get_supabase().table("equity_holdings").delete().match(equity_match).execute()
+        with metrics.span(metrics.SUPABASE_OP_SECONDS, table="mutual_fund_holdings", op="delete"):
+            get_supabase().table("mutual_fund_holdings").delete().match(mf_match).execute()
+        notify_write("equity_holdings")
+        notify_write("mutual_fund_holdings")
+
+        writer = BulkWriter(get_supabase())
+        writes = [
+            writer.insert("equity_holdings", equity_records).to_dict(),
+            writer.insert("mutual_fund_holdings", mf_records).to_dict(),
+        ]
+        logger.info("✅ Zerodha holdings imported successfully")
+        result = {"equity": len(equity_records), "mutualFunds": len(mf_records), "writes": writes}
+
+    record_networth_snapshot(user_id, import_date)
+    return result
+
+
+def migrate_mf_scheme_codes(user_id, mf_match, mf_records):
+    """
+    One-time rewrite of legacy (instrument_token) scheme codes of the rows
+    matching mf_match to the ISINs in mf_records, matched on (folio,
+    scheme name). Updating in place keeps each row's id and created_at
+    (the start date portfolio_returns uses) instead of the incremental
+    sync deleting and re-inserting it. Returns the number of rows rewritten.
+    """
+    import token_store
+
+    flag = token_store.user_key(user_id, f"zerodha_mf_isin:{mf_match['member_id']}")
+    store = token_store.get_store()
+    if store.get(flag):
+        return 0
+
+    isin_by_key = {}
+    for r in mf_records:
+        key = (r["folio_number"], r["scheme_name"])
+        # A folio / name pair seen twice is ambiguous; leave it to the sync
+        isin_by_key[key] = None if key in isin_by_key else r["scheme_code"]
+
+    rewritten = 0
+    table = get_supabase().table("mutual_fund_holdings")
+    for row in select_all("mutual_fund_holdings", mf_match, "id,scheme_code,scheme_name,folio_number"):
+        isin = isin_by_key.get((row.get("folio_number") or "", row.get("scheme_name") or ""))
+        if not isin or row.get("scheme_code") == isin:
+            continue
+        with metrics.span(metrics.SUPABASE_OP_SECONDS, table="mutual_fund_holdings", op="update"):
+            table.update({"scheme_code": isin}).eq("id", row["id"]).execute()
+        rewritten += 1
+
+    if rewritten:
+        notify_write("mutual_fund_holdings")
+        logger.info("🔑 Rewrote %d Zerodha MF scheme codes to ISINs for %s", rewritten, user_id)
+    store.set(flag, True, MF_ISIN_MIGRATION_TTL)
+    return rewritten
+
+
+def import_holdings(user_id, access_token, api_key=None, mode=None):
+    """Fetch both Kite lists concurrently and import them; returns counts and timings."""
+    if not access_token:
+        raise PermissionError("No Zerodha access token; connect Zerodha first")
+
+    start = time.perf_counter()
+    equity, mf_holdings = fetch_holdings(access_token, api_key)
+    fetched = time.perf_counter()
+    result = process_holdings_success(equity, mf_holdings, user_id, mode=mode)
+    result["timings"] = {
+        "fetch_ms": round((fetched - start) * 1000, 1),
+        "import_ms": round((time.perf_counter() - fetched) * 1000, 1),
+    }
+    return result
+